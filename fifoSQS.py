@@ -1,8 +1,22 @@
-import boto3
 from botocore.exceptions import ClientError
 
-# Initialize a session using Amazon SQS
-sqs = boto3.client("sqs")
+from sqs_tools import (
+    DedupWindow,
+    LazyClient,
+    decode_message,
+    deduplication_id_for,
+    default_metrics,
+    group_id_for,
+    instrument,
+    reconcile_batch,
+    run_consumer,
+)
+
+# Initialize a session using Amazon SQS; every call is counted in default_metrics
+sqs = instrument(LazyClient("sqs"))
+
+# Deduplication IDs sent in the last 5 minutes, checked before calling SQS
+dedup_window = DedupWindow()
 
 
 def create_queue(queue_name):
@@ -25,7 +39,7 @@ def create_queue(queue_name):
         return None
 
 
-def send_message(queue_url, message):
+def send_message(queue_url, message, group_key="1", partitions=None, dedup_key=None):
     """
     The `send_message` function sends a message to an Amazon Simple Queue Service (SQS) queue with
     specified attributes.
@@ -34,12 +48,22 @@ def send_message(queue_url, message):
     the message
     :param message: The `message` parameter is the body of the message that you want to send to the
     queue. It can be a string or any other data type that can be serialized into a string
+    :param group_key: The business key (e.g. document or case ID) that decides the message group.
+    Messages with the same key are consumed in order; different keys are consumed in parallel
+    :param partitions: Optional number of groups to hash keys into, to bound the group count
+    :param dedup_key: Optional caller key (e.g. a job or row ID) to deduplicate on instead of the
+    message content. Duplicates seen in the last 5 minutes are dropped without calling SQS
     """
+    dedup_id = deduplication_id_for(message, dedup_key)
+    if not dedup_window.check_and_add(dedup_id):
+        print(f"Skipping duplicate message {dedup_id[:12]}")
+        return
     try:
         response = sqs.send_message(
             QueueUrl=queue_url,
             MessageBody=message,
-            MessageGroupId="1",  # You can change this as per your use case
+            MessageGroupId=group_id_for(group_key, partitions),
+            MessageDeduplicationId=dedup_id,
             MessageAttributes={
                 "Attribute1": {"StringValue": "Value1", "DataType": "String"},
                 "Attribute2": {"StringValue": "Value2", "DataType": "String"},
@@ -47,6 +71,8 @@ def send_message(queue_url, message):
         )
         print(f'Message ID: {response["MessageId"]}')
     except ClientError as e:
+        # Let a retry of the same message through the local window
+        dedup_window.forget(dedup_id)
         print(f"An error occurred: {e}")
 
 
@@ -91,9 +117,15 @@ def delete_messages(queue_url, messages):
         for msg in messages
     ]
     try:
-        response = sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
-        for result in response.get("Successful", []):
-            print(f'Message {result["Id"]} deleted successfully')
+        # Only entries SQS reports under "Failed" are retried
+        results = reconcile_batch(sqs.delete_message_batch, queue_url, entries)
+        for result in results.values():
+            if result.ok:
+                print(f"Message {result.id} deleted successfully")
+            else:
+                print(
+                    f"Message {result.id} was not deleted: {result.code} {result.message}"
+                )
     except ClientError as e:
         print(f"An error occurred: {e}")
 
@@ -105,7 +137,7 @@ def process_message(message):
     :param message: The `message` parameter is a dictionary that represents a message. It has the
     following structure:
     """
-    print(f'Processing message: {message["Body"]}')
+    print(f"Processing message: {decode_message(message)}")
     attributes = message.get("MessageAttributes", {})
     for name, value in attributes.items():
         print(f' - {name}: {value["StringValue"]}')
@@ -115,12 +147,8 @@ if __name__ == "__main__":
     queue_name = "testFifo"
     queue_url = create_queue(queue_name)
     if queue_url:
-        message = "My baby!"
-        send_message(queue_url, message)
-        while True:
-            messages = receive_messages(queue_url)
-            if messages:
-                print(messages, 123)
-                for message in messages:
-                    process_message(message)
-                delete_messages(queue_url, messages)
+        for document_id in range(5):
+            send_message(queue_url, f"Document {document_id}", group_key=document_id)
+        # Groups are processed in parallel, each one strictly in order.
+        run_consumer(sqs, queue_url, default_metrics.timed(process_message), pollers=4)
+        print(default_metrics.prometheus())
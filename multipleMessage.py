@@ -1,8 +1,30 @@
-import boto3
+import os
+import sys
+
 from botocore.exceptions import ClientError
 
-# Initialize a session using Amazon SQS
-sqs = boto3.client("sqs")
+from sqs_tools import (
+    AckBatcher,
+    ClaimCheck,
+    LazyClient,
+    PrefetchBuffer,
+    decode_message,
+    default_metrics,
+    delete_batch,
+    get_client,
+    instrument,
+    receive_batch,
+    run_consumer,
+    send_batch_with_retry,
+)
+
+# Initialize a session using Amazon SQS; every call is counted in default_metrics
+sqs = instrument(LazyClient("sqs"))
+
+# Bodies sendMessage.py offloaded to this bucket are fetched before processing
+# and their S3 objects removed once the message is deleted
+payload_bucket = os.environ.get("SQS_PAYLOAD_BUCKET")
+claim_check = ClaimCheck(get_client("s3"), payload_bucket) if payload_bucket else None
 
 
 def create_queue(queue_name):
@@ -16,70 +38,104 @@ def create_queue(queue_name):
 
 
 def send_messages(queue_url, messages):
-    entries = [
-        {
-            "Id": str(i),
-            "MessageBody": msg,
-            "MessageAttributes": {
-                "Attribute1": {"StringValue": "Value1", "DataType": "String"},
-                "Attribute2": {"StringValue": "Value2", "DataType": "String"},
-            },
-        }
-        for i, msg in enumerate(messages)
-    ]
+    attributes = {
+        "Attribute1": {"StringValue": "Value1", "DataType": "String"},
+        "Attribute2": {"StringValue": "Value2", "DataType": "String"},
+    }
     try:
-        response = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
-        for result in response.get("Successful", []):
-            print(f'Message {result["Id"]} sent successfully: {result["MessageId"]}')
+        results = send_batch_with_retry(
+            sqs, queue_url, messages, message_attributes=attributes
+        )
+        for result in results.values():
+            if result.ok:
+                print(
+                    f'Message {result.id} sent successfully: {result.result["MessageId"]}'
+                )
+            else:
+                print(
+                    f"Message {result.id} was not sent: {result.code} {result.message}"
+                )
     except ClientError as e:
         print(f"An error occurred: {e}")
 
 
-def receive_messages(queue_url):
+def receive_messages(queue_url, visibility_timeout=30):
     try:
-        response = sqs.receive_message(
-            QueueUrl=queue_url,
-            MaxNumberOfMessages=10,
-            WaitTimeSeconds=10,
-            MessageAttributeNames=["All"],  # Retrieve all message attributes
-        )
-        messages = response.get("Messages", [])
-        return messages
+        # Retrieves all message attributes
+        return receive_batch(sqs, queue_url, visibility_timeout=visibility_timeout)
     except ClientError as e:
         print(f"An error occurred: {e}")
         return None
 
 
 def delete_messages(queue_url, messages):
-    entries = [
-        {"Id": msg["MessageId"], "ReceiptHandle": msg["ReceiptHandle"]}
-        for msg in messages
-    ]
     try:
-        response = sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
-        for result in response.get("Successful", []):
-            print(f'Message {result["Id"]} deleted successfully')
+        # Only entries SQS reports under "Failed" are retried
+        results = delete_batch(sqs, queue_url, messages)
+        for result in results.values():
+            if result.ok:
+                print(f"Message {result.id} deleted successfully")
+            else:
+                print(
+                    f"Message {result.id} was not deleted: {result.code} {result.message}"
+                )
     except ClientError as e:
         print(f"An error occurred: {e}")
 
 
 def process_message(message):
-    print(f'Processing message: {message["Body"]}')
+    print(f"Processing message: {decode_message(message)}")
     attributes = message.get("MessageAttributes", {})
     for name, value in attributes.items():
         print(f' - {name}: {value["StringValue"]}')
 
 
+def message_handler():
+    if claim_check is None:
+        return process_message
+    return claim_check.wrap_handler(process_message)
+
+
+def consume_pipelined(queue_url, visibility_timeout=30):
+    # The next long poll runs in the background while this batch is processed,
+    # and deletes go out in full batches of 10 without holding up the loop
+    handle = message_handler()
+    with AckBatcher(
+        sqs,
+        queue_url,
+        visibility_timeout=visibility_timeout,
+        on_deleted=claim_check.cleanup if claim_check else None,
+    ) as acks, PrefetchBuffer(
+        lambda: receive_messages(queue_url, visibility_timeout),
+        visibility_timeout=visibility_timeout,
+    ) as buffer:
+        while True:
+            batch = buffer.get()
+            if batch is None:
+                return
+            for message in batch:
+                handle(message)
+                acks.ack(message, deadline=batch.received_at + visibility_timeout)
+            buffer.task_done(batch)
+
+
 if __name__ == "__main__":
     queue_name = "first"
     queue_url = create_queue(queue_name)
     if queue_url:
         messages = [f"Message {i}" for i in range(10)]
         send_messages(queue_url, messages)
-        while True:
-            messages = receive_messages(queue_url)
-            if messages:
-                print(len(messages))
-                for message in messages:
-                    process_message(message)
-                delete_messages(queue_url, messages)
+        if "--pipelined" in sys.argv[1:]:
+            # One worker, with the next receive already under way.
+            consume_pipelined(queue_url)
+        else:
+            # Pollers, handlers and deletes run concurrently instead of taking turns.
+            run_consumer(
+                sqs,
+                queue_url,
+                default_metrics.timed(message_handler()),
+                pollers=4,
+                max_in_flight=100,
+                on_deleted=claim_check.cleanup if claim_check else None,
+            )
+        print(default_metrics.prometheus())
@@ -1,8 +1,20 @@
-import boto3
 from botocore.exceptions import ClientError
 
-# Initialize a session using Amazon SQS
-sqs = boto3.client("sqs")
+from sqs_tools import (
+    LazyClient,
+    SQLiteIdempotencyStore,
+    TieredIdempotencyStore,
+    decode_message,
+    default_metrics,
+    delete_batch,
+    instrument,
+    receive_batch,
+    run_consumer,
+    sqs_batch_handler,
+)
+
+# Initialize a session using Amazon SQS; every call is counted in default_metrics
+sqs = instrument(LazyClient("sqs"))
 
 
 def create_queue(queue_name):
@@ -32,49 +44,49 @@ def send_message(queue_url, message):
 
 def receive_messages(queue_url):
     try:
-        response = sqs.receive_message(
-            QueueUrl=queue_url,
-            MaxNumberOfMessages=10,
-            WaitTimeSeconds=5,
-            MessageAttributeNames=["All"],  # Retrieve all message attributes
-        )
-        messages = response.get("Messages", [])
-        return messages
+        # Retrieves all message attributes
+        return receive_batch(sqs, queue_url, wait_time_seconds=5)
     except ClientError as e:
         print(f"An error occurred: {e}")
         return None
 
 
 def delete_messages(queue_url, messages):
-    entries = [
-        {"Id": msg["MessageId"], "ReceiptHandle": msg["ReceiptHandle"]}
-        for msg in messages
-    ]
     try:
-        response = sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
-        for result in response.get("Successful", []):
-            print(f'Message {result["Id"]} deleted successfully')
+        # Only entries SQS reports under "Failed" are retried
+        results = delete_batch(sqs, queue_url, messages)
+        for result in results.values():
+            if result.ok:
+                print(f"Message {result.id} deleted successfully")
+            else:
+                print(
+                    f"Message {result.id} was not deleted: {result.code} {result.message}"
+                )
     except ClientError as e:
         print(f"An error occurred: {e}")
 
 
 def process_message(message):
-    print(f'Processing message: {message["Body"]}')
+    print(f"Processing message: {decode_message(message)}")
     attributes = message.get("MessageAttributes", {})
     for name, value in attributes.items():
         print(f' - {name}: {value["StringValue"]}')
 
 
+# Entry point when deployed behind an SQS event source mapping with
+# ReportBatchItemFailures enabled: only the records that fail are retried.
+lambda_handler = sqs_batch_handler(process_message)
+
+
 if __name__ == "__main__":
     queue_name = "test"
     queue_url = create_queue(queue_name)
     if queue_url:
         message = "Hello, World!"
         send_message(queue_url, message)
-        while True:
-            messages = receive_messages(queue_url)
-            if messages:
-                print(messages, 123)
-                for message in messages:
-                    process_message(message)
-                # delete_messages(queue_url, messages)
+        # Handled message IDs survive restarts, so redeliveries are acked without reprocessing
+        store = TieredIdempotencyStore(SQLiteIdempotencyStore("processed_messages.db"))
+        run_consumer(
+            sqs, queue_url, default_metrics.timed(process_message), idempotency=store
+        )
+        print(default_metrics.prometheus())
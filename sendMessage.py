@@ -1,6 +1,9 @@
-import boto3
+import os
+
 from botocore.exceptions import ClientError
 
+from sqs_tools import ClaimCheck, LazyClient, MessageCodec, get_client, instrument
+
 message_to_send = """{
   _id: ObjectId("5235cce586af6e000b000007"),
   attempts: 0,
@@ -233,8 +236,8 @@ message_to_send = """{
   updated_at: ISODate("2013-09-15T15:06:13Z")
 }"""
 
-# Initialize a session using Amazon SQS
-sqs = boto3.client("sqs")
+# Initialize a session using Amazon SQS; every call is counted in default_metrics
+sqs = instrument(LazyClient("sqs"))
 
 
 def create_queue(queue_name):
@@ -247,16 +250,26 @@ def create_queue(queue_name):
         return None
 
 
-def send_message(queue_url, message):
+def send_message(queue_url, message, claim_check=None, codec=None):
+    params = {
+        "QueueUrl": queue_url,
+        "MessageBody": message,
+        "MessageAttributes": {
+            "Attribute1": {"StringValue": "Value1", "DataType": "String"},
+            "Attribute2": {"StringValue": "Value2", "DataType": "String"},
+        },
+    }
+    if codec is not None:
+        encoded = codec.encode_entry(message, **params)
+        # Only bodies that stay inline are tagged with the codec; offloaded ones
+        # go to S3 as plain text, readable by any SQS Extended Client consumer
+        if claim_check is None or claim_check.fits(encoded):
+            params = encoded
+    # Bodies over the SQS limit go to S3; the queue only carries a pointer
+    if claim_check is not None:
+        params = claim_check.offload(params)
     try:
-        response = sqs.send_message(
-            QueueUrl=queue_url,
-            MessageBody=message,
-            MessageAttributes={
-                "Attribute1": {"StringValue": "Value1", "DataType": "String"},
-                "Attribute2": {"StringValue": "Value2", "DataType": "String"},
-            },
-        )
+        response = sqs.send_message(**params)
         print(f'Message ID: {response["MessageId"]}')
     except ClientError as e:
         print(f"An error occurred: {e}")
@@ -267,5 +280,8 @@ if __name__ == "__main__":
     queue_url = create_queue(queue_name)
     print(queue_url)
     if queue_url:
-        message = "Hello, World!"
-        send_message(queue_url, message_to_send)
+        # Without a bucket, bodies over the SQS limit are sent (and rejected) as is
+        bucket = os.environ.get("SQS_PAYLOAD_BUCKET")
+        claim_check = ClaimCheck(get_client("s3"), bucket) if bucket else None
+        codec = MessageCodec("text", compression="zlib")
+        send_message(queue_url, message_to_send, claim_check, codec)
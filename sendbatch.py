@@ -1,68 +1,160 @@
-import boto3
 import pandas as pd
 import concurrent.futures
 import time
-import random
-from botocore.exceptions import ClientError
-from itertools import zip_longest
-
-
-# Function to divide data into chunks
-def chunk_data(data, size):
-    return (data[pos : pos + size] for pos in range(0, len(data), size))
-
-
-# Function to send a single batch with retry logic
-def send_batch_with_retry(sqs_client, queue_url, batch, max_retries=5, base_delay=0.1):
-    retries = 0
-    while retries < max_retries:
-        try:
-            entries = [
-                {"Id": str(index), "MessageBody": record}
-                for index, record in enumerate(batch)
-            ]
-            response = sqs_client.send_message_batch(
-                QueueUrl=queue_url, Entries=entries
-            )
-            return response
-        except ClientError as e:
-            error_code = e.response["Error"]["Code"]
-            if error_code in ["Throttling", "ThrottlingException"]:
-                retries += 1
-                delay = min(base_delay * 2**retries, 20) + (random.random() - 0.5)
-                time.sleep(delay)
-            else:
-                raise e
-    raise Exception("Max retries exceeded for batch send.")
-
-
-def main(csv_file_path, sqs_queue_url):
-    # Initialize the SQS client
-    sqs = boto3.client("sqs", region_name="your-region-here")
-
-    # Read the CSV file using pandas
-    df = pd.read_csv(csv_file_path)
-
-    # Assuming you want to send each row as a message; adjust as necessary
-    records = df.to_json(orient="records", lines=True).splitlines()
-
-    # Chunk the records into batches of 10
-    record_batches = list(chunk_data(records, 10))
-
-    # Use ThreadPoolExecutor to send batches in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=200) as executor:
-        futures = [
-            executor.submit(send_batch_with_retry, sqs, sqs_queue_url, batch)
-            for batch in record_batches
-        ]
-        for future in concurrent.futures.as_completed(futures):
+
+from sqs_tools import operations
+from sqs_tools.batch_reconciler import batch_response
+from sqs_tools.clients import get_client
+from sqs_tools.rate_controller import AdaptiveRateController
+from sqs_tools.send_buffer import iter_batches
+
+
+# Read the CSV a chunk of rows at a time and yield each row as a JSON line
+def iter_csv_records(csv_file_path, chunk_rows=10_000):
+    for chunk in pd.read_csv(csv_file_path, chunksize=chunk_rows):
+        yield from chunk.to_json(orient="records", lines=True).splitlines()
+
+
+# Function to send a single batch with retry logic; only failed entries are resent
+def send_batch_with_retry(
+    sqs_client,
+    queue_url,
+    batch,
+    max_retries=5,
+    base_delay=0.1,
+    rate_controller=None,
+    codec=None,
+):
+    # Compressed bodies (with a codec) let more rows fit under the batch payload limit
+    results = operations.send_batch_with_retry(
+        sqs_client,
+        queue_url,
+        batch,
+        max_attempts=max_retries,
+        base_delay=base_delay,
+        rate_controller=rate_controller,
+        codec=codec,
+    )
+    return batch_response(results)
+
+
+class ProgressReporter:
+    """Prints sent/failed counts and throughput at most every `interval` seconds."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.records = 0
+        self.batches = 0
+        self.failed_records = 0
+        self.failed_batches = 0
+
+    def update(self, records, failed=0, ok=True):
+        self.records += records
+        self.failed_records += failed
+        if ok:
+            self.batches += 1
+        else:
+            self.failed_batches += 1
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        print(
+            f"{self.records} records in {self.batches} batches sent "
+            f"({self.records / elapsed:.0f} records/s), "
+            f"{self.failed_records} records and {self.failed_batches} batches failed, "
+            f"{elapsed:.1f}s elapsed"
+        )
+
+
+def send_batches(
+    sqs_client,
+    queue_url,
+    batches,
+    max_workers=200,
+    max_pending=None,
+    progress=None,
+    rate_controller=None,
+    codec=None,
+):
+    """
+    Send batches on a thread pool while keeping at most `max_pending` batches
+    submitted but unfinished, so memory stays flat however many batches the
+    iterator produces. All workers share one `rate_controller` so throttling
+    slows the whole pool down together instead of each thread on its own.
+    """
+    max_pending = max_pending or max_workers * 2
+    progress = progress or ProgressReporter()
+    rate_controller = rate_controller or AdaptiveRateController()
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            size = pending.pop(future)
             try:
                 response = future.result()
-                # Handle successful response
-                print(f"Batch sent successfully. {response}")
             except Exception as e:
-                # Handle failure after max retries
-                print(f"Failed to send batch after retries: {e}")
+                # The whole request was rejected (not throttling); nothing was sent
+                print(f"Failed to send batch: {e}")
+                progress.update(0, failed=size, ok=False)
+                continue
+            for failure in response["Failed"]:
+                print(
+                    f'Entry {failure["Id"]} failed: {failure["Code"]} {failure["Message"]}'
+                )
+            progress.update(len(response["Successful"]), failed=len(response["Failed"]))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batches:
+            if len(pending) >= max_pending:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                collect(done)
+            future = executor.submit(
+                send_batch_with_retry,
+                sqs_client,
+                queue_url,
+                batch,
+                rate_controller=rate_controller,
+                codec=codec,
+            )
+            pending[future] = len(batch)
+        collect(concurrent.futures.as_completed(list(pending)))
+    progress.report()
+    print(f"Settled send rate: {rate_controller.rate:.0f} messages/s")
+    return progress
+
+
+def main(
+    csv_file_path,
+    sqs_queue_url,
+    chunk_rows=10_000,
+    max_workers=200,
+    max_pending=None,
+    codec=None,
+):
+    # One shared client whose connection pool fits every worker thread; throttles
+    # are retried by the shared rate controller, not by botocore in each thread
+    sqs = get_client(
+        "sqs", region_name="your-region-here", max_workers=max_workers, max_attempts=1
+    )
+
+    # Stream the CSV a chunk at a time; each row becomes one JSON message
+    records = iter_csv_records(csv_file_path, chunk_rows)
+
+    # Group the records lazily into batches of 10
+    record_batches = iter_batches(records, 10)
+
+    # Send batches in parallel with a bounded number in flight
+    return send_batches(
+        sqs, sqs_queue_url, record_batches, max_workers, max_pending, codec=codec
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+from .ack_batcher import AckBatcher, AckStats
+from .autoscale import BacklogAutoscaler, ScalingDecision
+from .batch_consumer import (
+    BatchConsumer,
+    BatchResult,
+    SQSMessage,
+    run_batch_consumer,
+)
+from .batch_reconciler import EntryResult, batch_response, reconcile_batch
+from .benchmark import BenchmarkConfig, FaultInjectingClient, run_benchmark
+from .capture import (
+    CaptureLog,
+    RecordingClient,
+    Replayer,
+    ReplayStats,
+    read_capture,
+    replay,
+)
+from .clients import ClientFactory, LazyClient, client_config, get_client
+from .codec import (
+    CODEC_ATTRIBUTE,
+    CodecError,
+    MessageCodec,
+    decode_body,
+    decode_message,
+)
+from .consumer import AsyncConsumer, ConsumerStats, InFlightBudget, run_consumer
+from .dedup import SQS_DEDUP_INTERVAL, DedupWindow, deduplication_id_for
+from .fifo_groups import GroupBlockedError, GroupedExecutor, group_id_for
+from .heartbeat import MAX_VISIBILITY_SECONDS, VisibilityHeartbeat
+from .idempotency import (
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    SQLiteIdempotencyStore,
+    TieredIdempotencyStore,
+    body_hash_key,
+    idempotency_key,
+)
+from .lambda_batch import (
+    DeadlineExceeded,
+    message_from_record,
+    process_batch,
+    sqs_batch_handler,
+)
+from .large_payload import ClaimCheck, Payload
+from .local_sqs import LocalSQS
+from .metrics import InstrumentedClient, SQSMetrics, default_metrics, instrument
+from .multi_queue import (
+    MultiQueueConsumer,
+    QueueSpec,
+    WeightedQueueScheduler,
+    run_multi_queue_consumer,
+)
+from .operations import (
+    consume_loop,
+    delete_batch,
+    receive_batch,
+    send_batch_with_retry,
+    send_message_with_retry,
+)
+from .prefetch import (
+    Batch,
+    PipelinedConsumer,
+    PrefetchBuffer,
+    PrefetchStats,
+    run_pipelined,
+)
+from .rate_controller import THROTTLE_ERROR_CODES, AdaptiveRateController
+from .redrive import DLQRedriver, RedriveStats, message_filter, redrive
+from .router import (
+    RouteFailure,
+    RouteResult,
+    RoutingTable,
+    StatusRouter,
+    route_status_changes,
+)
+from .send_buffer import (
+    BatchEntryError,
+    SendBuffer,
+    SendBufferStats,
+    entry_size,
+    iter_batches,
+)
+from .supervisor import ConsumerSupervisor, available_cpus, run_supervised
+
+__all__ = [
+    "AckBatcher",
+    "AckStats",
+    "BacklogAutoscaler",
+    "ScalingDecision",
+    "BatchConsumer",
+    "BatchResult",
+    "SQSMessage",
+    "run_batch_consumer",
+    "EntryResult",
+    "batch_response",
+    "reconcile_batch",
+    "BenchmarkConfig",
+    "FaultInjectingClient",
+    "run_benchmark",
+    "CaptureLog",
+    "RecordingClient",
+    "Replayer",
+    "ReplayStats",
+    "read_capture",
+    "replay",
+    "ClientFactory",
+    "LazyClient",
+    "client_config",
+    "get_client",
+    "CODEC_ATTRIBUTE",
+    "CodecError",
+    "MessageCodec",
+    "decode_body",
+    "decode_message",
+    "AsyncConsumer",
+    "ConsumerStats",
+    "InFlightBudget",
+    "run_consumer",
+    "SQS_DEDUP_INTERVAL",
+    "DedupWindow",
+    "deduplication_id_for",
+    "GroupBlockedError",
+    "GroupedExecutor",
+    "group_id_for",
+    "MAX_VISIBILITY_SECONDS",
+    "VisibilityHeartbeat",
+    "IdempotencyStore",
+    "MemoryIdempotencyStore",
+    "SQLiteIdempotencyStore",
+    "TieredIdempotencyStore",
+    "body_hash_key",
+    "idempotency_key",
+    "DeadlineExceeded",
+    "message_from_record",
+    "process_batch",
+    "sqs_batch_handler",
+    "ClaimCheck",
+    "Payload",
+    "LocalSQS",
+    "InstrumentedClient",
+    "SQSMetrics",
+    "default_metrics",
+    "instrument",
+    "MultiQueueConsumer",
+    "QueueSpec",
+    "WeightedQueueScheduler",
+    "run_multi_queue_consumer",
+    "consume_loop",
+    "delete_batch",
+    "receive_batch",
+    "send_batch_with_retry",
+    "send_message_with_retry",
+    "Batch",
+    "PipelinedConsumer",
+    "PrefetchBuffer",
+    "PrefetchStats",
+    "run_pipelined",
+    "THROTTLE_ERROR_CODES",
+    "AdaptiveRateController",
+    "DLQRedriver",
+    "RedriveStats",
+    "message_filter",
+    "redrive",
+    "RouteFailure",
+    "RouteResult",
+    "RoutingTable",
+    "StatusRouter",
+    "route_status_changes",
+    "BatchEntryError",
+    "SendBuffer",
+    "SendBufferStats",
+    "entry_size",
+    "iter_batches",
+    "ConsumerSupervisor",
+    "available_cpus",
+    "run_supervised",
+]
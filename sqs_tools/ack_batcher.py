@@ -0,0 +1,241 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import reconcile_batch
+from .consumer import MAX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Pending ack: visibility deadline, tie-breaker, time acked, message.
+_Pending = Tuple[float, int, float, Dict[str, Any]]
+
+
+@dataclass
+class AckStats:
+    acked: int = 0
+    deleted: int = 0
+    failed: int = 0
+    batches: int = 0
+
+
+class AckBatcher:
+    """
+    Collects acks from any number of worker threads and deletes them in the
+    background, so :meth:`ack` never waits on the network.
+
+    A queue's pending acks are flushed in ``delete_message_batch`` calls of
+    10 as soon as 10 have gathered, and otherwise once the oldest has waited
+    ``linger`` seconds or the nearest visibility deadline is less than
+    ``urgency`` seconds away. Each call takes the handles closest to their
+    deadline first, so under a backlog of acks the messages about to become
+    visible again are deleted before they are redelivered. ``deadline`` is a
+    ``clock`` time, by default ``visibility_timeout`` after the ack.
+
+    Up to ``max_concurrent`` delete calls run at once. ``on_deleted``, if
+    given, is called on the delete thread with the messages whose delete
+    succeeded. :meth:`flush` waits for everything acked so far; :meth:`close`
+    flushes and stops.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: Optional[str] = None,
+        linger: float = 0.05,
+        urgency: float = 2.0,
+        visibility_timeout: float = 30,
+        max_concurrent: int = 4,
+        on_deleted: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        rate_controller=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.linger = linger
+        self.urgency = urgency
+        self.visibility_timeout = visibility_timeout
+        self.max_concurrent = max_concurrent
+        self.on_deleted = on_deleted
+        self.rate_controller = rate_controller
+        self.stats = AckStats()
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._pending: Dict[str, List[_Pending]] = {}
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._draining = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        """Acks not yet handed to a delete call."""
+        with self._cond:
+            return sum(len(heap) for heap in self._pending.values())
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._closed = False
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_concurrent, thread_name_prefix="ack-delete"
+            )
+            self._thread = threading.Thread(
+                target=self._flush_loop, name="ack-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def ack(
+        self,
+        message: Dict[str, Any],
+        queue_url: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> None:
+        """Queue ``message`` for deletion from ``queue_url`` and return at once."""
+        queue_url = queue_url or self.queue_url
+        if queue_url is None:
+            raise ValueError("ack needs a queue_url")
+        now = self._clock()
+        if deadline is None:
+            deadline = now + self.visibility_timeout
+        with self._cond:
+            if self._thread is None or self._closed:
+                raise RuntimeError("AckBatcher is not running")
+            heap = self._pending.setdefault(queue_url, [])
+            heapq.heappush(heap, (deadline, next(self._sequence), now, message))
+            self.stats.acked += 1
+            # The flush thread only needs waking when its next wake-up moves.
+            if (
+                len(heap) == 1
+                or len(heap) >= MAX_BATCH_SIZE
+                or deadline - self.urgency <= now
+            ):
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Delete everything acked so far now, without waiting for full batches.
+        Returns ``False`` if ``timeout`` ran out first.
+        """
+        with self._cond:
+            self._draining += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._pending and not self._in_flight, timeout
+                )
+            finally:
+                self._draining -= 1
+
+    def close(self) -> None:
+        """Delete whatever is still pending, wait for it, and stop."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+        self._thread = None
+        self._pool = None
+
+    def _due(self, heap: List[_Pending], now: float) -> bool:
+        if self._draining or self._closed or len(heap) >= MAX_BATCH_SIZE:
+            return True
+        if heap[0][0] - self.urgency <= now:
+            return True
+        return min(entry[2] for entry in heap) + self.linger <= now
+
+    def _take(self, now: float) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        batches = []
+        for queue_url in list(self._pending):
+            heap = self._pending[queue_url]
+            while heap and self._due(heap, now):
+                entries = [
+                    heapq.heappop(heap) for _ in range(min(MAX_BATCH_SIZE, len(heap)))
+                ]
+                batches.append((queue_url, [entry[3] for entry in entries]))
+            if not heap:
+                del self._pending[queue_url]
+        return batches
+
+    def _next_wake(self, now: float) -> Optional[float]:
+        wake = None
+        for heap in self._pending.values():
+            due = min(
+                heap[0][0] - self.urgency,
+                min(entry[2] for entry in heap) + self.linger,
+            )
+            wake = due if wake is None else min(wake, due)
+        return None if wake is None else max(0.0, wake - now)
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = self._clock()
+                    batches = self._take(now)
+                    if batches or self._closed:
+                        break
+                    self._cond.wait(self._next_wake(now))
+                self._in_flight += len(batches)
+            for queue_url, messages in batches:
+                self._pool.submit(self._delete, queue_url, messages)
+            if not batches:
+                return
+
+    def _delete(self, queue_url: str, messages: List[Dict[str, Any]]) -> None:
+        deleted: List[Dict[str, Any]] = []
+        try:
+            entries = [
+                {"Id": str(i), "ReceiptHandle": m["ReceiptHandle"]}
+                for i, m in enumerate(messages)
+            ]
+            try:
+                results = reconcile_batch(
+                    self.sqs.delete_message_batch,
+                    queue_url,
+                    entries,
+                    rate_controller=self.rate_controller,
+                )
+            except (ClientError, BotoCoreError) as e:
+                logger.error("Delete batch on %s failed: %s", queue_url, e)
+                results = {}
+            for result in results.values():
+                if result.ok:
+                    deleted.append(messages[int(result.id)])
+                else:
+                    logger.warning(
+                        "Delete failed for entry %s: %s %s",
+                        result.id,
+                        result.code,
+                        result.message,
+                    )
+            if deleted and self.on_deleted is not None:
+                try:
+                    self.on_deleted(deleted)
+                except Exception:
+                    logger.exception("on_deleted hook failed")
+        finally:
+            with self._cond:
+                self.stats.batches += 1
+                self.stats.deleted += len(deleted)
+                self.stats.failed += len(messages) - len(deleted)
+                self._in_flight -= 1
+                self._cond.notify_all()
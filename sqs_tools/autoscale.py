@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+BACKLOG_ATTRIBUTES = [
+    "ApproximateNumberOfMessages",
+    "ApproximateNumberOfMessagesNotVisible",
+]
+
+
+@dataclass
+class ScalingDecision:
+    pollers: int
+    max_in_flight: int
+    wait_time_seconds: int
+    idle: bool = False
+
+
+class BacklogAutoscaler:
+    """
+    Control loop that sizes an :class:`AsyncConsumer` from its queue's backlog.
+
+    Every ``sample_interval`` seconds it reads ``ApproximateNumberOfMessages``
+    and ``ApproximateNumberOfMessagesNotVisible`` and works out the share of
+    the consumer's receives since the last sample that came back empty. It
+    then asks for one poller per ``backlog_per_poller`` visible messages and
+    ``slots_per_poller`` handler slots per poller, within ``min_pollers`` ..
+    ``max_pollers`` and ``min_in_flight`` .. ``max_in_flight``. Growth is
+    applied at once; shrinking is at most by half per sample so a momentary
+    dip does not throw away capacity.
+
+    When nothing is visible and at least ``idle_empty_ratio`` of the receives
+    were empty, the queue is treated as idle: the consumer drops to
+    ``min_pollers`` and they park on ``idle_wait`` second long polls, which
+    costs one request per poller per ``idle_wait`` instead of one per
+    ``active_wait``.
+    """
+
+    def __init__(
+        self,
+        queue_url: Optional[str] = None,
+        sqs_client=None,
+        min_pollers: int = 1,
+        max_pollers: int = 16,
+        backlog_per_poller: int = 100,
+        slots_per_poller: int = 25,
+        min_in_flight: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        sample_interval: float = 15.0,
+        active_wait: int = 5,
+        idle_wait: int = 20,
+        idle_empty_ratio: float = 0.9,
+    ):
+        if not 1 <= min_pollers <= max_pollers:
+            raise ValueError("expected 1 <= min_pollers <= max_pollers")
+        self.queue_url = queue_url
+        self.sqs = sqs_client
+        self.min_pollers = min_pollers
+        self.max_pollers = max_pollers
+        self.backlog_per_poller = backlog_per_poller
+        self.slots_per_poller = slots_per_poller
+        self.min_in_flight = min_in_flight or min_pollers * slots_per_poller
+        self.max_in_flight = max_in_flight or max_pollers * slots_per_poller
+        if self.min_in_flight > self.max_in_flight:
+            raise ValueError("min_in_flight is larger than max_in_flight")
+        self.sample_interval = sample_interval
+        self.active_wait = active_wait
+        self.idle_wait = idle_wait
+        self.idle_empty_ratio = idle_empty_ratio
+        self.last: Optional[ScalingDecision] = None
+
+    def decide(
+        self,
+        visible: int,
+        not_visible: int,
+        receives: int,
+        empty_receives: int,
+        current_pollers: int,
+    ) -> ScalingDecision:
+        """Target sizes for a backlog sample and the receives since the last one."""
+        empty_ratio = empty_receives / receives if receives else 1.0
+        if visible == 0 and empty_ratio >= self.idle_empty_ratio:
+            return ScalingDecision(
+                self.min_pollers, self.min_in_flight, self.idle_wait, idle=True
+            )
+        wanted = max(1, math.ceil(visible / self.backlog_per_poller))
+        if wanted < current_pollers:
+            wanted = max(wanted, current_pollers // 2)
+        pollers = max(self.min_pollers, min(self.max_pollers, wanted))
+        # Messages already being worked on still need their slots.
+        in_flight = max(pollers * self.slots_per_poller, not_visible)
+        in_flight = max(self.min_in_flight, min(self.max_in_flight, in_flight))
+        return ScalingDecision(pollers, in_flight, self.active_wait)
+
+    def _sample(self, sqs, queue_url: str):
+        attributes = sqs.get_queue_attributes(
+            QueueUrl=queue_url, AttributeNames=BACKLOG_ATTRIBUTES
+        )["Attributes"]
+        return (
+            int(attributes.get("ApproximateNumberOfMessages", 0)),
+            int(attributes.get("ApproximateNumberOfMessagesNotVisible", 0)),
+        )
+
+    async def run(self, consumer) -> None:
+        """Adjust ``consumer`` until it stops; started by ``AsyncConsumer.run``."""
+        sqs = self.sqs or consumer.sqs
+        queue_url = self.queue_url or consumer.queue_url
+        stop = consumer._stop
+        receives = consumer.stats.receives
+        empty = consumer.stats.empty_receives
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.sample_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                visible, not_visible = await consumer._call(
+                    self._sample, sqs, queue_url
+                )
+            except (ClientError, BotoCoreError, KeyError, ValueError) as e:
+                logger.error("Backlog sample for %s failed: %s", queue_url, e)
+                continue
+            stats = consumer.stats
+            decision = self.decide(
+                visible,
+                not_visible,
+                stats.receives - receives,
+                stats.empty_receives - empty,
+                consumer.active_pollers,
+            )
+            receives, empty = stats.receives, stats.empty_receives
+            if decision != self.last:
+                logger.info(
+                    "Scaling %s to %d pollers, %d in flight, %ds waits "
+                    "(%d visible, %d in flight)",
+                    queue_url,
+                    decision.pollers,
+                    decision.max_in_flight,
+                    decision.wait_time_seconds,
+                    visible,
+                    not_visible,
+                )
+            self.last = decision
+            await consumer.scale(
+                pollers=decision.pollers,
+                max_in_flight=decision.max_in_flight,
+                wait_time_seconds=decision.wait_time_seconds,
+            )
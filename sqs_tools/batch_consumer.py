@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, TypedDict
+
+from .consumer import AsyncConsumer, ConsumerStats
+
+logger = logging.getLogger(__name__)
+
+
+class _RequiredMessageFields(TypedDict):
+    MessageId: str
+    ReceiptHandle: str
+    Body: str
+
+
+class SQSMessage(_RequiredMessageFields, total=False):
+    """A message as ``receive_message`` returns it."""
+
+    MD5OfBody: str
+    Attributes: Dict[str, str]
+    MessageAttributes: Dict[str, Dict[str, Any]]
+
+
+@dataclass
+class BatchResult:
+    """
+    What a batch handler did with its messages: every message whose
+    ``MessageId`` is in ``failed`` is nacked (left for redelivery), the rest
+    are acked.
+    """
+
+    failed: Set[str] = field(default_factory=set)
+
+    def nack(self, message: SQSMessage) -> None:
+        self.failed.add(message["MessageId"])
+
+    def ok(self, message: SQSMessage) -> bool:
+        return message["MessageId"] not in self.failed
+
+
+BatchHandler = Callable[[List[SQSMessage]], Optional[BatchResult]]
+
+
+class BatchConsumer(AsyncConsumer):
+    """
+    :class:`AsyncConsumer` whose handler takes a list of messages instead of
+    one, for downstream work that is cheaper in bulk (one
+    ``bulk_insert_records`` or one S3 write per batch).
+
+    Messages from any number of receives are coalesced until ``batch_size``
+    have arrived or the oldest has waited ``batch_linger`` seconds, then
+    ``handler`` is called with them. It returns ``None`` when every message
+    succeeded, or a :class:`BatchResult` naming the ones to nack; if it
+    raises, the whole batch is nacked. Acked messages go through the usual
+    delete batching, nacked ones are redelivered after their visibility
+    timeout. ``max_in_flight`` must leave room for a full batch.
+
+    On FIFO queues batches are handled one at a time in receive order. Once a
+    message is nacked, later messages of its group, in the same batch or in
+    batches already received, are nacked too without being acked, so the
+    group is redelivered in order; make such handlers idempotent, as they may
+    have already written those later messages.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        handler: BatchHandler,
+        batch_size: int = 100,
+        batch_linger: float = 0.1,
+        **kwargs,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if kwargs.get("max_in_flight", 100) < batch_size:
+            raise ValueError("max_in_flight must be at least batch_size")
+        super().__init__(sqs_client, queue_url, handler, **kwargs)
+        self.batch_size = batch_size
+        self.batch_linger = batch_linger
+        self.batches = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tail: Optional[asyncio.Task] = None
+        self._blocked: set = set()
+
+    def _spawn(self, message: Dict[str, Any]) -> None:
+        self._pending.append(message)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.batch_linger, self._flush)
+
+    def _pollers_done(self) -> None:
+        self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        previous = self._tail if self.ordered else None
+        task = asyncio.create_task(self._handle_batch(batch, previous))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.ordered:
+            self._tail = task
+            task.add_done_callback(self._clear_batch_tail)
+
+    def _clear_batch_tail(self, task: asyncio.Task) -> None:
+        if self._tail is task:
+            self._tail = None
+            # Messages still being coalesced were received while a group was
+            # blocked, so the block must outlive this chain until they are seen.
+            if not self._pending:
+                self._blocked.clear()
+
+    async def _filter_duplicates(self, batch: List[Dict[str, Any]]):
+        if self.idempotency is None:
+            return batch, {}
+        keys = {m["MessageId"]: self.idempotency_key(m) for m in batch}
+        seen = await self._call(
+            lambda: {mid: self.idempotency.seen(key) for mid, key in keys.items()}
+        )
+        fresh = []
+        for message in batch:
+            if seen[message["MessageId"]]:
+                self.stats.duplicates += 1
+                await self._acks.put(message)
+            else:
+                fresh.append(message)
+        return fresh, keys
+
+    async def _run_handler(self, batch: List[Dict[str, Any]]) -> BatchResult:
+        try:
+            if asyncio.iscoroutinefunction(self.handler):
+                result = await self.handler(list(batch))
+            else:
+                result = await self._call(self.handler, list(batch))
+        except Exception:
+            logger.exception("Batch handler failed for %d messages", len(batch))
+            return BatchResult({m["MessageId"] for m in batch})
+        return result if result is not None else BatchResult()
+
+    async def _handle_batch(
+        self, batch: List[Dict[str, Any]], after: Optional[asyncio.Task] = None
+    ) -> None:
+        if after is not None:
+            await after
+        self.batches += 1
+        try:
+            batch, keys = await self._filter_duplicates(batch)
+        except Exception:
+            # A store error counts as a failure, so the batch is redelivered.
+            logger.exception("Idempotency check failed for %d messages", len(batch))
+            await self._nack(batch, failed=True)
+            return
+        blocked = [m for m in batch if self._group_key(m) in self._blocked]
+        ready = [m for m in batch if self._group_key(m) not in self._blocked]
+        result = await self._run_handler(ready) if ready else BatchResult()
+        acked, nacked = [], blocked
+        self.stats.skipped += len(blocked)
+        for message in ready:
+            group = self._group_key(message)
+            if group is not None and group in self._blocked:
+                # Handled after an earlier failure in its group; redo in order.
+                self.stats.skipped += 1
+                nacked.append(message)
+            elif not result.ok(message):
+                self.stats.failed += 1
+                nacked.append(message)
+                if group is not None:
+                    self._blocked.add(group)
+            else:
+                acked.append(message)
+        if acked and keys:
+            try:
+                await self._call(
+                    lambda: [
+                        self.idempotency.mark_done(keys[m["MessageId"]]) for m in acked
+                    ]
+                )
+            except Exception:
+                logger.exception("Recording %d handled messages failed", len(acked))
+                await self._nack(acked, failed=True)
+                acked = []
+        self.stats.processed += len(acked)
+        for message in acked:
+            await self._acks.put(message)
+        await self._nack(nacked)
+
+    async def _nack(self, messages: List[Dict[str, Any]], failed: bool = False) -> None:
+        if not messages:
+            return
+        if failed:
+            self.stats.failed += len(messages)
+            # Later messages of these groups must wait for their redelivery.
+            self._blocked.update(
+                group for group in map(self._group_key, messages) if group is not None
+            )
+        if self.heartbeat is not None:
+            self.heartbeat.release_messages(messages)
+        await self._release(messages)
+
+
+def run_batch_consumer(
+    sqs_client, queue_url: str, handler: BatchHandler, **kwargs
+) -> ConsumerStats:
+    """Blocking helper for scripts: run a :class:`BatchConsumer` until interrupted."""
+    consumer = BatchConsumer(sqs_client, queue_url, handler, **kwargs)
+    try:
+        return asyncio.run(consumer.run())
+    except KeyboardInterrupt:
+        return consumer.stats
@@ -0,0 +1,129 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .rate_controller import THROTTLE_ERROR_CODES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EntryResult:
+    """Outcome of one batch entry after reconciliation."""
+
+    id: str
+    ok: bool
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    code: Optional[str] = None
+    message: str = ""
+    sender_fault: bool = False
+
+
+def reconcile_batch(
+    call: Callable[..., Dict[str, Any]],
+    queue_url: str,
+    entries: List[Dict[str, Any]],
+    max_attempts: int = 3,
+    base_delay: float = 0.1,
+    rate_controller=None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, EntryResult]:
+    """
+    Run a ``*_batch`` SQS call and retry only the entries it reports as failed.
+
+    ``call`` is ``send_message_batch``, ``delete_message_batch`` or
+    ``change_message_visibility_batch`` on a client. Entries listed under
+    ``Successful`` are done after one call; entries under ``Failed`` are
+    resent on their own, each with its own ``max_attempts`` budget, unless
+    SQS marks them ``SenderFault`` (a bad entry will not get better by
+    retrying). A whole-request throttle counts as one attempt for every
+    pending entry and backs off with full jitter; any other ``ClientError``
+    on the whole request is raised.
+
+    Returns an :class:`EntryResult` per entry ``Id``.
+    """
+    pending = {entry["Id"]: entry for entry in entries}
+    attempts = {entry_id: 0 for entry_id in pending}
+    results: Dict[str, EntryResult] = {}
+    round_no = 0
+    while pending:
+        round_no += 1
+        for entry_id in pending:
+            attempts[entry_id] += 1
+        if rate_controller is not None:
+            rate_controller.acquire(len(pending))
+        try:
+            response = call(QueueUrl=queue_url, Entries=list(pending.values()))
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code not in THROTTLE_ERROR_CODES:
+                raise
+            if rate_controller is not None:
+                rate_controller.on_throttle()
+            response = {
+                "Failed": [
+                    {"Id": entry_id, "Code": code, "SenderFault": False}
+                    for entry_id in pending
+                ]
+            }
+        else:
+            if rate_controller is not None:
+                rate_controller.on_success()
+
+        for success in response.get("Successful", []):
+            entry_id = success["Id"]
+            if pending.pop(entry_id, None) is not None:
+                results[entry_id] = EntryResult(
+                    entry_id, True, attempts[entry_id], result=success
+                )
+        retry = {}
+        for failure in response.get("Failed", []):
+            entry_id = failure["Id"]
+            entry = pending.pop(entry_id, None)
+            if entry is None:
+                continue
+            sender_fault = failure.get("SenderFault", False)
+            if not sender_fault and attempts[entry_id] < max_attempts:
+                retry[entry_id] = entry
+                continue
+            results[entry_id] = EntryResult(
+                entry_id,
+                False,
+                attempts[entry_id],
+                code=failure.get("Code"),
+                message=failure.get("Message", ""),
+                sender_fault=sender_fault,
+            )
+        # Anything SQS did not mention is unknown; report it rather than guess.
+        for entry_id in pending:
+            results[entry_id] = EntryResult(
+                entry_id, False, attempts[entry_id], code="MissingResult"
+            )
+        pending = retry
+        if pending:
+            logger.info("Retrying %d failed entries on %s", len(pending), queue_url)
+            sleep(random.uniform(0, min(base_delay * 2**round_no, 20)))
+    return results
+
+
+def batch_response(results: Dict[str, EntryResult]) -> Dict[str, List[Dict[str, Any]]]:
+    """Fold reconciled results back into the ``Successful``/``Failed`` response shape."""
+    response: Dict[str, List[Dict[str, Any]]] = {"Successful": [], "Failed": []}
+    for result in results.values():
+        if result.ok:
+            response["Successful"].append(result.result)
+        else:
+            response["Failed"].append(
+                {
+                    "Id": result.id,
+                    "Code": result.code,
+                    "Message": result.message,
+                    "SenderFault": result.sender_fault,
+                }
+            )
+    return response
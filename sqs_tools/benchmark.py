@@ -0,0 +1,510 @@
+"""
+Throughput and latency benchmarks for the producer and consumer paths.
+
+Runs against :class:`~sqs_tools.local_sqs.LocalSQS` wrapped in a
+:class:`FaultInjectingClient`, so numbers are repeatable and free. Example::
+
+    python -m sqs_tools.benchmark --messages 20000 --sizes 256,4096 \\
+        --batch-sizes 1,10 --workers 8,32 --latency-ms 5 --throttle-rate 0.01 \\
+        --output bench.json --baseline last_bench.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import EntryResult
+from .consumer import AsyncConsumer
+from .local_sqs import LocalSQS
+from .operations import consume_loop, send_batch_with_retry, send_message_with_retry
+from .rate_controller import AdaptiveRateController
+from .send_buffer import SendBuffer, iter_batches
+
+logger = logging.getLogger(__name__)
+
+PRODUCERS = ("single", "batch", "buffer")
+CONSUMERS = ("loop", "async")
+
+# Operations that SQS throttles per request; receives are left alone so an
+# injected throttle rate measures the send and delete paths.
+THROTTLED_OPERATIONS = (
+    "send_message",
+    "send_message_batch",
+    "delete_message",
+    "delete_message_batch",
+)
+
+# Metrics where a higher value is better; the rest are better lower.
+HIGHER_IS_BETTER = ("messages_per_second",)
+
+
+class FaultInjectingClient:
+    """
+    Wrap an SQS client, adding a fixed delay to every call and failing a
+    fraction of throttleable calls with a ``Throttling`` error before they
+    reach the queue. Every attempt, throttled or not, is counted in
+    :attr:`calls`.
+    """
+
+    def __init__(
+        self,
+        client,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self._client = client
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self.calls[name] = self.calls.get(name, 0) + 1
+                throttle = (
+                    name in THROTTLED_OPERATIONS
+                    and self._random.random() < self.throttle_rate
+                )
+                if throttle:
+                    self.throttled += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if throttle:
+                raise ClientError(
+                    {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}},
+                    name,
+                )
+            return attr(*args, **kwargs)
+
+        return call
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+@dataclass
+class BenchmarkConfig:
+    producer: str = "batch"
+    consumer: str = "async"
+    messages: int = 10_000
+    message_size: int = 256
+    batch_size: int = 10
+    producer_workers: int = 8
+    consumer_workers: int = 4
+    latency_ms: float = 0.0
+    throttle_rate: float = 0.0
+    handler_ms: float = 0.0
+    timeout: float = 300.0
+    seed: Optional[int] = 0
+
+    def validate(self) -> None:
+        if self.producer not in PRODUCERS:
+            raise ValueError(f"producer must be one of {PRODUCERS}")
+        if self.consumer not in CONSUMERS:
+            raise ValueError(f"consumer must be one of {CONSUMERS}")
+        if not 1 <= self.batch_size <= 10:
+            raise ValueError("batch_size must be between 1 and 10")
+        if self.messages < 1 or self.producer_workers < 1 or self.consumer_workers < 1:
+            raise ValueError("messages and worker counts must be at least 1")
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (``None`` when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _body(size: int) -> str:
+    stamp = json.dumps({"sent_at": time.time(), "pad": ""})
+    return stamp[:-2] + "x" * max(size - len(stamp), 0) + '"}'
+
+
+def _bodies(config: BenchmarkConfig) -> Iterator[str]:
+    # Generated lazily so the timestamp is taken just before the send.
+    for _ in range(config.messages):
+        yield _body(config.message_size)
+
+
+def _failed(future: Future, size: int) -> int:
+    """How many of the ``size`` messages a finished send left unsent."""
+    try:
+        results = future.result()
+    except (ClientError, BotoCoreError) as e:
+        logger.error("Benchmark send failed: %s", e)
+        return size
+    if isinstance(results, EntryResult):
+        results = {results.id: results}
+    return sum(1 for result in results.values() if not result.ok)
+
+
+def _send_bounded(config: BenchmarkConfig, calls: Iterator[tuple]) -> int:
+    """
+    Run ``(size, fn, *args)`` sends on ``producer_workers`` threads with at
+    most two per worker queued; returns how many messages failed.
+    """
+    failed = 0
+    with ThreadPoolExecutor(max_workers=config.producer_workers) as executor:
+        pending: Dict[Future, int] = {}
+        for size, fn, *args in calls:
+            if len(pending) >= config.producer_workers * 2:
+                done, _ = wait(pending, return_when="FIRST_COMPLETED")
+                failed += sum(_failed(future, pending.pop(future)) for future in done)
+            pending[executor.submit(fn, *args)] = size
+        wait(pending)
+        failed += sum(_failed(future, size) for future, size in pending.items())
+    return failed
+
+
+def _produce_single(client, queue_url: str, config: BenchmarkConfig) -> int:
+    return _send_bounded(
+        config,
+        (
+            (1, send_message_with_retry, client, queue_url, body)
+            for body in _bodies(config)
+        ),
+    )
+
+
+def _produce_batch(client, queue_url: str, config: BenchmarkConfig) -> int:
+    send = partial(send_batch_with_retry, rate_controller=AdaptiveRateController())
+    return _send_bounded(
+        config,
+        (
+            (len(batch), send, client, queue_url, batch)
+            for batch in iter_batches(_bodies(config), config.batch_size)
+        ),
+    )
+
+
+def _produce_buffer(client, queue_url: str, config: BenchmarkConfig) -> int:
+    # SendBuffer picks its own batch sizes from linger and payload limits.
+    with SendBuffer(
+        client,
+        queue_url,
+        linger=0.01,
+        max_concurrent_batches=config.producer_workers,
+        max_attempts=5,
+    ) as buffer:
+        for body in _bodies(config):
+            buffer.send(body)
+    return buffer.stats.failed
+
+
+_PRODUCE = {
+    "single": _produce_single,
+    "batch": _produce_batch,
+    "buffer": _produce_buffer,
+}
+
+
+class _Recorder:
+    """
+    Collects end-to-end latencies, once per ``MessageId`` so redeliveries are
+    counted as duplicates rather than arrivals, and signals once every
+    expected message arrived.
+    """
+
+    def __init__(self, expected: int, handler_seconds: float):
+        self.expected = expected
+        self.handler_seconds = handler_seconds
+        self.latencies: List[float] = []
+        self.duplicates = 0
+        self.done = threading.Event()
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def expect(self, expected: int) -> None:
+        with self._lock:
+            self.expected = expected
+            if len(self.latencies) >= expected:
+                self.done.set()
+
+    def __call__(self, message: Dict[str, Any]) -> None:
+        sent_at = json.loads(message["Body"])["sent_at"]
+        if self.handler_seconds:
+            time.sleep(self.handler_seconds)
+        with self._lock:
+            if message["MessageId"] in self._seen:
+                self.duplicates += 1
+                return
+            self._seen.add(message["MessageId"])
+            self.latencies.append(time.time() - sent_at)
+            if len(self.latencies) >= self.expected:
+                self.done.set()
+
+
+def _start_consumer(client, queue_url: str, config: BenchmarkConfig, handler):
+    """Start consuming in the background; returns a callable that stops it."""
+    if config.consumer == "loop":
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=consume_loop,
+                args=(client, queue_url, handler, stop),
+                kwargs={"wait_time_seconds": 1},
+            )
+            for _ in range(config.consumer_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def halt():
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        return halt
+
+    consumer = AsyncConsumer(
+        client,
+        queue_url,
+        handler,
+        pollers=config.consumer_workers,
+        wait_time_seconds=1,
+        ack_linger=0.01,
+    )
+    stop = threading.Event()
+
+    async def consume():
+        task = asyncio.create_task(consumer.run())
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        consumer.stop()
+        await task
+
+    thread = threading.Thread(target=asyncio.run, args=(consume(),))
+    thread.start()
+
+    def halt():
+        stop.set()
+        thread.join()
+
+    return halt
+
+
+def run_benchmark(config: BenchmarkConfig) -> Dict[str, Any]:
+    """Send ``config.messages`` through one producer/consumer pair and measure it."""
+    config.validate()
+    local = LocalSQS()
+    client = FaultInjectingClient(
+        local,
+        latency=config.latency_ms / 1000,
+        throttle_rate=config.throttle_rate,
+        seed=config.seed,
+    )
+    queue_url = local.create_queue(QueueName="benchmark")["QueueUrl"]
+    recorder = _Recorder(config.messages, config.handler_ms / 1000)
+
+    started = time.monotonic()
+    halt = _start_consumer(client, queue_url, config, recorder)
+    try:
+        failed = _PRODUCE[config.producer](client, queue_url, config)
+        produced = time.monotonic()
+        # Messages that were never sent will never arrive.
+        recorder.expect(config.messages - failed)
+        completed = recorder.done.wait(max(config.timeout - (produced - started), 0))
+        finished = time.monotonic()
+    finally:
+        halt()
+
+    latencies = recorder.latencies
+    elapsed = finished - started
+    received = len(latencies)
+    send_calls = sum(
+        n for op, n in client.calls.items() if op.startswith("send_message")
+    )
+    delete_calls = sum(
+        n for op, n in client.calls.items() if op.startswith("delete_message")
+    )
+    return {
+        "config": asdict(config),
+        "completed": completed,
+        "received": received,
+        "send_failures": failed,
+        "duplicates": recorder.duplicates,
+        "elapsed_seconds": elapsed,
+        "produce_seconds": produced - started,
+        "messages_per_second": received / elapsed if elapsed else 0.0,
+        "latency_p50_ms": _ms(percentile(latencies, 50)),
+        "latency_p95_ms": _ms(percentile(latencies, 95)),
+        "latency_p99_ms": _ms(percentile(latencies, 99)),
+        "api_calls_per_message": client.total_calls / config.messages,
+        "send_calls_per_message": send_calls / config.messages,
+        "receive_calls_per_message": client.calls.get("receive_message", 0)
+        / config.messages,
+        "delete_calls_per_message": delete_calls / config.messages,
+        "throttled_calls": client.throttled,
+        "calls": dict(client.calls),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
+
+
+def run_suite(
+    base: BenchmarkConfig,
+    sizes: Sequence[int],
+    batch_sizes: Sequence[int],
+    workers: Sequence[int],
+) -> Dict[str, Any]:
+    """
+    Run ``base`` over every combination of message size, batch size and
+    workers. Only the ``batch`` producer uses the batch size; the others run
+    once per size and worker count with ``base.batch_size``.
+    """
+    if base.producer != "batch":
+        batch_sizes = [base.batch_size]
+    results = []
+    for size, batch_size, worker_count in itertools.product(
+        sizes, batch_sizes, workers
+    ):
+        config = BenchmarkConfig(
+            **dict(
+                asdict(base),
+                message_size=size,
+                batch_size=batch_size,
+                producer_workers=worker_count,
+                consumer_workers=worker_count,
+            )
+        )
+        results.append(run_benchmark(config))
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _key(result: Dict[str, Any]) -> tuple:
+    config = dict(result["config"])
+    config.pop("timeout", None)
+    return tuple(sorted(config.items()))
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.1,
+    metrics: Sequence[str] = (
+        "messages_per_second",
+        "latency_p99_ms",
+        "api_calls_per_message",
+    ),
+) -> List[Dict[str, Any]]:
+    """
+    Return one entry per metric that got worse than the matching baseline run
+    (same config) by more than ``tolerance`` (a fraction, 0.1 = 10%).
+    """
+    previous = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(
+                    {
+                        "config": result["config"],
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                        "change": change,
+                    }
+                )
+    return regressions
+
+
+def _ints(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--producer", choices=PRODUCERS, default="batch")
+    parser.add_argument("--consumer", choices=CONSUMERS, default="async")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--sizes", type=_ints, default=[256])
+    parser.add_argument("--batch-sizes", type=_ints, default=[10])
+    parser.add_argument("--workers", type=_ints, default=[8])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--handler-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    base = BenchmarkConfig(
+        producer=args.producer,
+        consumer=args.consumer,
+        messages=args.messages,
+        latency_ms=args.latency_ms,
+        throttle_rate=args.throttle_rate,
+        handler_ms=args.handler_ms,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    report = run_suite(base, args.sizes, args.batch_sizes, args.workers)
+    for result in report["results"]:
+        config = result["config"]
+        print(
+            f"size={config['message_size']} batch={config['batch_size']} "
+            f"workers={config['producer_workers']}: "
+            f"{result['messages_per_second']:.0f} msg/s, "
+            f"p50/p95/p99 {result['latency_p50_ms'] or 0:.1f}/"
+            f"{result['latency_p95_ms'] or 0:.1f}/{result['latency_p99_ms'] or 0:.1f} ms, "
+            f"{result['api_calls_per_message']:.3f} calls/msg"
+            + ("" if result["completed"] else " (timed out)")
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['metric']}: {regression['baseline']:.3f} -> "
+                f"{regression['current']:.3f} ({regression['change']:+.1%})"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""
+Record received messages to a local log and replay them into a queue.
+
+Example::
+
+    python -m sqs_tools.capture capture.log QUEUE_URL --speed 2
+    python -m sqs_tools.capture capture.log QUEUE_URL --max-speed --senders 16
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import reconcile_batch
+from .dedup import deduplication_id_for
+from .redrive import redrive_entry
+
+logger = logging.getLogger(__name__)
+
+# Record: 4-byte big-endian length, then that many bytes of compact JSON.
+_LENGTH = struct.Struct(">I")
+# Index entry: file offset, record number and receive time of a page's first record.
+_INDEX_ENTRY = struct.Struct(">QQd")
+
+DEFAULT_PAGE_SIZE = 64 * 1024
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def _read_index(path: str) -> List[Tuple[int, int, float]]:
+    try:
+        with open(index_path(path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % _INDEX_ENTRY.size
+    return [entry for entry in _INDEX_ENTRY.iter_unpack(data[:usable])]
+
+
+def _scan(f, offset: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, payload) of each complete record from ``offset`` on."""
+    f.seek(offset)
+    while True:
+        header = f.read(_LENGTH.size)
+        if len(header) < _LENGTH.size:
+            return
+        (length,) = _LENGTH.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length:
+            return
+        yield offset, payload
+        offset += _LENGTH.size + length
+
+
+class CaptureLog:
+    """
+    Append-only log of received messages.
+
+    Each :meth:`append` writes one length-prefixed record holding the
+    receive time, the queue URL and the messages of one receive, exactly as
+    SQS returned them. Every ``page_size`` bytes a page starts and its offset,
+    first record number and receive time go to ``<path>.idx``, so a reader
+    can jump to a point in time without scanning the log. Reopening an
+    existing log continues it; a record cut short by a crash is truncated.
+    """
+
+    def __init__(self, path: str, page_size: int = DEFAULT_PAGE_SIZE):
+        self.path = path
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._records, self._page_start, end = self._recover()
+        self._file = open(path, "ab")
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._index = open(index_path(path), "ab")
+
+    def _recover(self) -> Tuple[int, int, int]:
+        if not os.path.exists(self.path):
+            # An index without its log describes nothing; start both afresh.
+            open(index_path(self.path), "wb").close()
+            return 0, 0, 0
+        index = _read_index(self.path)
+        offset, records = (index[-1][0], index[-1][1]) if index else (0, 0)
+        page_start = offset
+        end = offset
+        with open(self.path, "rb") as f:
+            for end, payload in _scan(f, offset):
+                records += 1
+                end += _LENGTH.size + len(payload)
+        return records, page_start, end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def records(self) -> int:
+        return self._records
+
+    def append(
+        self,
+        messages: List[Dict[str, Any]],
+        queue_url: Optional[str] = None,
+        received_at: Optional[float] = None,
+    ) -> None:
+        received_at = time.time() if received_at is None else received_at
+        payload = json.dumps(
+            {"t": received_at, "q": queue_url, "m": messages}, separators=(",", ":")
+        ).encode("utf-8")
+        with self._lock:
+            offset = self._file.tell()
+            if self._records == 0 or offset - self._page_start >= self.page_size:
+                self._index.write(_INDEX_ENTRY.pack(offset, self._records, received_at))
+                self._page_start = offset
+            self._file.write(_LENGTH.pack(len(payload)) + payload)
+            self._records += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+            self._index.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+            self._index.close()
+
+
+@dataclass
+class CapturedReceive:
+    received_at: float
+    queue_url: Optional[str]
+    messages: List[Dict[str, Any]]
+
+
+def read_capture(path: str, since: Optional[float] = None) -> Iterator[CapturedReceive]:
+    """
+    Records of a :class:`CaptureLog` in order. With ``since`` (a Unix time),
+    start from the page holding that time instead of the beginning.
+    """
+    offset = 0
+    if since is not None:
+        index = _read_index(path)
+        page = bisect_right([entry[2] for entry in index], since) - 1
+        if page > 0:
+            offset = index[page][0]
+    with open(path, "rb") as f:
+        for _, payload in _scan(f, offset):
+            record = json.loads(payload)
+            if since is not None and record["t"] < since:
+                continue
+            yield CapturedReceive(record["t"], record["q"], record["m"])
+
+
+class RecordingClient:
+    """
+    Wrap an SQS client so every non-empty ``receive_message`` response is
+    appended to ``log`` before it is returned. Everything else passes through.
+    """
+
+    def __init__(self, client, log: CaptureLog):
+        self._client = client
+        self._log = log
+
+    def receive_message(self, **kwargs):
+        response = self._client.receive_message(**kwargs)
+        messages = response.get("Messages")
+        if messages:
+            self._log.append(messages, kwargs.get("QueueUrl"))
+        return response
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+@dataclass
+class ReplayStats:
+    receives: int = 0
+    messages: int = 0
+    sent: int = 0
+    failed: int = 0
+    max_lag: float = 0.0
+
+
+class Replayer:
+    """
+    Re-send a capture into ``queue_url`` (a real queue or :class:`LocalSQS`).
+
+    Each captured receive is sent as one ``send_message_batch`` (body, message
+    attributes and, for ``.fifo`` targets, ``MessageGroupId``) at its original
+    offset from the first record divided by ``speed``; ``speed=None`` sends as
+    fast as ``senders`` threads allow. Sends run on the pool so a slow call
+    does not delay the schedule; :attr:`stats` records how far behind it ran.
+    For FIFO targets each message group is always sent from the same thread,
+    keeping its captured order.
+    FIFO deduplication IDs are derived from the original ``MessageId`` and a
+    per-replay id, so the same capture can be replayed again straight away.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        speed: Optional[float] = 1.0,
+        senders: int = 8,
+        since: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive, or None for no pacing")
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.fifo = queue_url.endswith(".fifo")
+        self.speed = speed
+        self.senders = senders
+        self.since = since
+        self.stats = ReplayStats()
+        self._replay_id = uuid.uuid4().hex
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def replay(self, path: str) -> ReplayStats:
+        return self.replay_records(read_capture(path, since=self.since))
+
+    def replay_records(self, records: Iterator[CapturedReceive]) -> ReplayStats:
+        started = self._clock()
+        first: Optional[float] = None
+        # FIFO targets get one single-threaded lane per slice of message groups,
+        # so a group's messages arrive in captured order even at max speed.
+        workers = 1 if self.fifo else self.senders
+        lanes = [
+            ThreadPoolExecutor(max_workers=workers)
+            for _ in range(self.senders if self.fifo else 1)
+        ]
+        # At most two sends queued per sender, so a long capture is read only
+        # as fast as it can be sent rather than piling up in the executors.
+        windows = [threading.Semaphore(2 * workers) for _ in lanes]
+        try:
+            for record in records:
+                if first is None:
+                    first = record.received_at
+                if self.speed is not None:
+                    due = started + (record.received_at - first) / self.speed
+                    delay = due - self._clock()
+                    if delay > 0:
+                        self._sleep(delay)
+                    else:
+                        self.stats.max_lag = max(self.stats.max_lag, -delay)
+                self.stats.receives += 1
+                self.stats.messages += len(record.messages)
+                for lane, messages in self._split(record.messages, len(lanes)):
+                    for start in range(0, len(messages), 10):
+                        windows[lane].acquire()
+                        future = lanes[lane].submit(
+                            self._send, messages[start : start + 10]
+                        )
+                        future.add_done_callback(
+                            lambda _, window=windows[lane]: window.release()
+                        )
+        finally:
+            for lane in lanes:
+                lane.shutdown(wait=True)
+        return self.stats
+
+    def _split(self, messages: List[Dict[str, Any]], lanes: int):
+        if lanes == 1:
+            return [(0, messages)]
+        split: Dict[int, List[Dict[str, Any]]] = {}
+        for message in messages:
+            group = message.get("Attributes", {}).get("MessageGroupId", "")
+            split.setdefault(zlib.crc32(group.encode("utf-8")) % lanes, []).append(
+                message
+            )
+        return split.items()
+
+    def _entry(self, message: Dict[str, Any], entry_id: str) -> Dict[str, Any]:
+        entry = redrive_entry(message, entry_id, self.fifo)
+        if self.fifo:
+            entry["MessageDeduplicationId"] = deduplication_id_for(
+                message["Body"], key=f"{self._replay_id}:{message['MessageId']}"
+            )
+        return entry
+
+    def _send(self, messages: List[Dict[str, Any]]) -> None:
+        entries = [self._entry(message, str(i)) for i, message in enumerate(messages)]
+        try:
+            results = reconcile_batch(
+                self.sqs.send_message_batch, self.queue_url, entries
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Replay send to %s failed: %s", self.queue_url, e)
+            sent = 0
+        else:
+            sent = sum(1 for result in results.values() if result.ok)
+        with self._lock:
+            self.stats.sent += sent
+            self.stats.failed += len(messages) - sent
+
+
+def replay(
+    sqs_client, path: str, queue_url: str, speed: Optional[float] = 1.0, **kwargs
+) -> ReplayStats:
+    """Replay the capture at ``path`` into ``queue_url`` and return the stats."""
+    return Replayer(sqs_client, queue_url, speed=speed, **kwargs).replay(path)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .clients import get_client
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log")
+    parser.add_argument("queue_url")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time")
+    parser.add_argument("--max-speed", action="store_true", help="no pacing")
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--since", type=float, help="Unix time to start from")
+    parser.add_argument("--region")
+    args = parser.parse_args(argv)
+
+    sqs = get_client("sqs", region_name=args.region, max_workers=args.senders)
+    stats = replay(
+        sqs,
+        args.log,
+        args.queue_url,
+        speed=None if args.max_speed else args.speed,
+        senders=args.senders,
+        since=args.since,
+    )
+    print(
+        f"{stats.receives} receives, {stats.sent}/{stats.messages} messages sent, "
+        f"{stats.failed} failed, fell behind by up to {stats.max_lag:.2f}s"
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
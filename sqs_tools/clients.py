@@ -0,0 +1,136 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+# botocore's own default; a pool smaller than the worker count makes threads
+# queue for a connection or open throwaway ones.
+DEFAULT_POOL_CONNECTIONS = 10
+
+
+def client_config(
+    max_workers: Optional[int] = None,
+    connect_timeout: float = 5,
+    read_timeout: float = 30,
+    max_attempts: int = 3,
+    retry_mode: str = "standard",
+) -> Config:
+    """
+    botocore ``Config`` for a client shared by ``max_workers`` threads.
+
+    The read timeout stays above the 20 second SQS long-poll maximum, and
+    TCP keep-alive stops idle pooled connections from being dropped between
+    bursts. ``standard`` retries are used rather than ``adaptive``, and
+    clients for the paced send paths should pass ``max_attempts=1``: botocore
+    retries throttles inside each thread with its own backoff, so they would
+    only reach the shared ``AdaptiveRateController`` after every thread had
+    already retried on its own. Those paths retry through
+    :func:`~sqs_tools.batch_reconciler.reconcile_batch` instead.
+    """
+    return Config(
+        max_pool_connections=max(DEFAULT_POOL_CONNECTIONS, max_workers or 0),
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={"mode": retry_mode, "max_attempts": max_attempts},
+        tcp_keepalive=True,
+    )
+
+
+class ClientFactory:
+    """
+    Creates boto3 clients on first use and caches one per service and region.
+
+    Asking again with a larger ``max_workers`` replaces the cached client with
+    one whose connection pool fits; callers holding the old client keep a
+    working (smaller) one. The boto3 session is also created lazily, so
+    importing a module that uses the factory costs nothing.
+    """
+
+    def __init__(self, session: Optional[boto3.session.Session] = None, **config):
+        self._session = session
+        self._config = config
+        self._lock = threading.Lock()
+        self._clients: Dict[
+            Tuple[str, Optional[str], Optional[int]], Tuple[Any, int]
+        ] = {}
+
+    def _get_session(self) -> boto3.session.Session:
+        if self._session is None:
+            self._session = boto3.session.Session()
+        return self._session
+
+    def get(
+        self,
+        service: str,
+        region_name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        config = dict(self._config)
+        if max_attempts is not None:
+            config["max_attempts"] = max_attempts
+        with self._lock:
+            session = self._get_session()
+            key = (service, region_name or session.region_name, max_attempts)
+            pool = max(DEFAULT_POOL_CONNECTIONS, max_workers or 0)
+            cached = self._clients.get(key)
+            if cached is not None and cached[1] >= pool:
+                return cached[0]
+            # Client creation is not thread-safe on a shared session, hence the lock.
+            client = session.client(
+                service,
+                region_name=region_name,
+                config=client_config(max_workers=pool, **config),
+            )
+            self._clients[key] = (client, pool)
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+default_factory = ClientFactory()
+
+
+def get_client(
+    service: str,
+    region_name: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    max_attempts: Optional[int] = None,
+):
+    """Cached, tuned client from the process-wide :class:`ClientFactory`."""
+    return default_factory.get(service, region_name, max_workers, max_attempts)
+
+
+class LazyClient:
+    """
+    Stand-in for a module-level ``boto3.client(...)`` that builds the real
+    client on first attribute access, so importing a script makes no AWS
+    calls and tests can still swap the attribute with ``patch.object``.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        region_name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        factory: Optional[ClientFactory] = None,
+    ):
+        self._service = service
+        self._region_name = region_name
+        self._max_workers = max_workers
+        self._factory = factory
+        self._client = None
+
+    def __getattr__(self, name: str):
+        if self._client is None:
+            factory = self._factory or default_factory
+            self._client = factory.get(
+                self._service, self._region_name, self._max_workers
+            )
+        return getattr(self._client, name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._service!r}, region_name={self._region_name!r})"
@@ -0,0 +1,157 @@
+import base64
+import json
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from .large_payload import ClaimCheck
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for serializer="msgpack"
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for compression="zstd"
+    zstandard = None
+
+# Message attribute naming the codec a body was written with, e.g. "json+zlib+b64".
+CODEC_ATTRIBUTE = "ContentCodec"
+
+SERIALIZERS = ("text", "json", "msgpack")
+COMPRESSIONS = (None, "zlib", "zstd")
+
+
+class CodecError(ValueError):
+    """Unknown codec name, missing optional dependency, or undecodable body."""
+
+
+def _require(module, name: str):
+    if module is None:
+        raise CodecError(
+            f"codec needs the optional '{name}' package; pip install {name}"
+        )
+    return module
+
+
+def _serialize(serializer: str, obj: Any) -> bytes:
+    if serializer == "text":
+        return obj.encode("utf-8")
+    if serializer == "json":
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return _require(msgpack, "msgpack").packb(obj, use_bin_type=True)
+
+
+def _deserialize(serializer: str, data: bytes) -> Any:
+    if serializer == "text":
+        return data.decode("utf-8")
+    if serializer == "json":
+        return json.loads(data)
+    if serializer == "msgpack":
+        return _require(msgpack, "msgpack").unpackb(data, raw=False)
+    raise CodecError(f"unknown serializer {serializer!r}")
+
+
+def _compress(compression: str, data: bytes, level: Optional[int]) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(data, 6 if level is None else level)
+    return (
+        _require(zstandard, "zstandard")
+        .ZstdCompressor(level=3 if level is None else level)
+        .compress(data)
+    )
+
+
+def _decompress(compression: str, data: bytes) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "zstd":
+        return _require(zstandard, "zstandard").ZstdDecompressor().decompress(data)
+    raise CodecError(f"unknown compression {compression!r}")
+
+
+class MessageCodec:
+    """
+    Serialize, optionally compress and base64-frame SQS message bodies.
+
+    The codec actually applied is written to the ``ContentCodec`` attribute so
+    :func:`decode_message` can reverse it without any out-of-band config.
+    Bodies smaller than ``min_compress_bytes`` (or that do not shrink) are sent
+    uncompressed; binary output (msgpack, compressed data) is base64 framed
+    because SQS bodies must be text.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "json",
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+        min_compress_bytes: int = 512,
+    ):
+        if serializer not in SERIALIZERS:
+            raise CodecError(f"serializer must be one of {SERIALIZERS}")
+        if compression not in COMPRESSIONS:
+            raise CodecError(f"compression must be one of {COMPRESSIONS}")
+        if serializer == "msgpack":
+            _require(msgpack, "msgpack")
+        if compression == "zstd":
+            _require(zstandard, "zstandard")
+        self.serializer = serializer
+        self.compression = compression
+        self.level = level
+        self.min_compress_bytes = min_compress_bytes
+
+    def encode(self, obj: Any) -> Tuple[str, str]:
+        """Return ``(body, codec_name)`` for ``obj``."""
+        data = _serialize(self.serializer, obj)
+        parts = [self.serializer]
+        if self.compression and len(data) >= self.min_compress_bytes:
+            compressed = _compress(self.compression, data, self.level)
+            # Base64 adds a third, so only keep compression that still wins after framing.
+            if len(compressed) * 4 // 3 < len(data):
+                data = compressed
+                parts.append(self.compression)
+        if len(parts) > 1 or self.serializer == "msgpack":
+            parts.append("b64")
+            return base64.b64encode(data).decode("ascii"), "+".join(parts)
+        return data.decode("utf-8"), "+".join(parts)
+
+    def encode_entry(self, obj: Any, **params) -> Dict[str, Any]:
+        """
+        Build ``send_message`` kwargs or a batch entry for ``obj``; extra keyword
+        arguments (``Id``, ``QueueUrl``, ``MessageAttributes``...) are kept.
+        """
+        body, name = self.encode(obj)
+        attributes = dict(params.pop("MessageAttributes", {}))
+        attributes[CODEC_ATTRIBUTE] = {"DataType": "String", "StringValue": name}
+        return dict(params, MessageBody=body, MessageAttributes=attributes)
+
+
+def decode_body(body: str, codec_name: str) -> Any:
+    parts = codec_name.split("+")
+    serializer, steps = parts[0], parts[1:]
+    if steps and steps[-1] == "b64":
+        data = base64.b64decode(body)
+        steps = steps[:-1]
+    else:
+        data = body.encode("utf-8")
+    for compression in reversed(steps):
+        data = _decompress(compression, data)
+    return _deserialize(serializer, data)
+
+
+def decode_message(message: Dict[str, Any]) -> Any:
+    """
+    Decode a received message. Messages without a ``ContentCodec`` attribute
+    (older producers) and S3 pointers not yet resolved by
+    :meth:`ClaimCheck.wrap_handler` are returned as their raw ``Body`` text.
+    """
+    attribute = message.get("MessageAttributes", {}).get(CODEC_ATTRIBUTE)
+    if attribute is None or ClaimCheck.pointer(message) is not None:
+        return message["Body"]
+    try:
+        return decode_body(message["Body"], attribute["StringValue"])
+    except (ValueError, zlib.error) as e:
+        raise CodecError(
+            f"cannot decode body with codec {attribute['StringValue']!r}: {e}"
+        ) from e
@@ -0,0 +1,466 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import reconcile_batch
+from .heartbeat import VisibilityHeartbeat
+from .idempotency import IdempotencyStore, idempotency_key
+
+logger = logging.getLogger(__name__)
+
+# SQS caps receive_message and delete_message_batch at 10 entries.
+MAX_BATCH_SIZE = 10
+
+
+@dataclass
+class ConsumerStats:
+    """Running counters for one consumer."""
+
+    received: int = 0
+    processed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    deleted: int = 0
+    empty_receives: int = 0
+    receives: int = 0
+
+
+class InFlightBudget:
+    """
+    Counting limit on messages that have been received but not yet acked.
+
+    Unlike a plain semaphore, a poller can ask for up to ``n`` slots at once and
+    gets whatever is free (at least one), so it can size ``MaxNumberOfMessages``
+    to the room that is actually left.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._available = limit
+        self._cond = asyncio.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self.limit - self._available
+
+    async def acquire(self, n: int) -> int:
+        """Wait until at least one slot is free and take up to ``n`` of them."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._available > 0)
+            granted = min(n, self._available)
+            self._available -= granted
+            return granted
+
+    async def release(self, n: int = 1) -> None:
+        if n <= 0:
+            return
+        async with self._cond:
+            self._available = min(self.limit, self._available + n)
+            self._cond.notify_all()
+
+    async def resize(self, limit: int) -> None:
+        """
+        Change the limit. Shrinking below what is in flight just holds new
+        acquires back until enough slots are released.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        async with self._cond:
+            self._available += limit - self.limit
+            self.limit = limit
+            self._cond.notify_all()
+
+
+class AsyncConsumer:
+    """
+    Long-poll consumer that keeps receive, processing and delete busy at once.
+
+    ``pollers`` receive loops run concurrently against the queue, every message
+    is handed to ``handler`` as its own task, and successfully handled messages
+    are acked by a background loop in delete batches of up to 10. At most
+    ``max_in_flight`` messages are held between receive and delete.
+
+    ``handler`` takes the raw SQS message dict. Coroutine functions are awaited
+    on the event loop; plain functions (such as the existing ``process_message``
+    helpers) are run in the worker thread pool. A handler that raises leaves the
+    message on the queue so it is redelivered after its visibility timeout.
+
+    ``on_deleted``, if given, is called in the thread pool with the list of
+    messages whose delete succeeded (e.g. ``ClaimCheck.cleanup``). With a
+    ``heartbeat``, every received message is kept invisible until it is acked
+    or its handler fails; receives then default to the heartbeat's
+    ``visibility_timeout``.
+
+    On FIFO queues (``ordered``, on by default for ``.fifo`` URLs) messages of
+    the same ``MessageGroupId`` are handled one after another in receive
+    order while different groups run in parallel. If one fails, the rest of
+    its group in that receive are skipped and left for in-order redelivery.
+
+    With an ``idempotency`` store, messages whose key (``MessageId`` by
+    default) is already recorded are acked without calling the handler, and
+    each handled message is recorded before it is acked.
+
+    An ``autoscaler`` (:class:`~sqs_tools.autoscale.BacklogAutoscaler`) runs
+    alongside the pollers and adjusts their number, ``max_in_flight`` and the
+    long-poll wait through :meth:`scale`.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        handler: Callable[[Dict[str, Any]], Any],
+        pollers: int = 4,
+        max_in_flight: int = 100,
+        wait_time_seconds: int = 10,
+        max_messages: int = MAX_BATCH_SIZE,
+        visibility_timeout: Optional[int] = None,
+        ack_linger: float = 0.05,
+        executor: Optional[ThreadPoolExecutor] = None,
+        on_deleted: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        heartbeat: Optional[VisibilityHeartbeat] = None,
+        ordered: Optional[bool] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        idempotency_key: Callable[[Dict[str, Any]], str] = idempotency_key,
+        autoscaler=None,
+    ):
+        if pollers < 1:
+            raise ValueError("pollers must be at least 1")
+        if not 1 <= max_messages <= MAX_BATCH_SIZE:
+            raise ValueError(f"max_messages must be between 1 and {MAX_BATCH_SIZE}")
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.handler = handler
+        self.pollers = pollers
+        self.max_in_flight = max_in_flight
+        self.wait_time_seconds = wait_time_seconds
+        self.max_messages = max_messages
+        if visibility_timeout is None and heartbeat is not None:
+            # The heartbeat times its first extension from this, so the receive
+            # must not fall back to the queue's own default.
+            visibility_timeout = heartbeat.visibility_timeout
+        self.visibility_timeout = visibility_timeout
+        self.ack_linger = ack_linger
+        self.on_deleted = on_deleted
+        self.heartbeat = heartbeat
+        self.ordered = queue_url.endswith(".fifo") if ordered is None else ordered
+        self.idempotency = idempotency
+        self.idempotency_key = idempotency_key
+        self.autoscaler = autoscaler
+        self.stats = ConsumerStats()
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._budget: Optional[InFlightBudget] = None
+        self._acks: Optional[asyncio.Queue] = None
+        self._tasks: set = set()
+        self._group_tails: Dict[str, asyncio.Task] = {}
+        self._poller_tasks: set = set()
+        self._retiring = 0
+
+    async def run(self) -> ConsumerStats:
+        """Consume until :meth:`stop` is called, then drain and return the stats."""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._budget = InFlightBudget(self.max_in_flight)
+        self._acks = asyncio.Queue()
+        if self._executor is None:
+            # One thread per blocking long poll plus headroom for deletes and sync handlers.
+            most = self.pollers
+            if self.autoscaler is not None:
+                most = max(most, self.autoscaler.max_pollers)
+            self._executor = ThreadPoolExecutor(max_workers=most * 2 + 4)
+        acker = asyncio.create_task(self._ack_loop())
+        scaler = (
+            asyncio.create_task(self.autoscaler.run(self))
+            if self.autoscaler is not None
+            else None
+        )
+        own_heartbeat = self.heartbeat is not None and not self.heartbeat.running
+        if own_heartbeat:
+            self.heartbeat.start()
+        try:
+            self._retiring = 0
+            for _ in range(self.pollers):
+                self._add_poller()
+            # Pollers can be added while we wait, so loop until none are left.
+            while self._poller_tasks:
+                await asyncio.gather(*list(self._poller_tasks))
+            self._pollers_done()
+            if self._tasks:
+                await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            await self._acks.put(None)
+            await acker
+            if scaler is not None:
+                # Awaited last so a failed scaler cannot skip the drain above.
+                (result,) = await asyncio.gather(scaler, return_exceptions=True)
+                if isinstance(result, Exception):
+                    logger.error("Autoscaler stopped with %r", result)
+        finally:
+            if own_heartbeat:
+                self.heartbeat.stop()
+            if self._owns_executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return self.stats
+
+    @property
+    def active_pollers(self) -> int:
+        return len(self._poller_tasks) - self._retiring
+
+    def _add_poller(self) -> None:
+        task = asyncio.create_task(self._poll_loop())
+        self._poller_tasks.add(task)
+        task.add_done_callback(self._poller_tasks.discard)
+
+    def _retire_poller(self) -> bool:
+        """Called by a poller between receives: should it exit to scale down?"""
+        if self._retiring > 0:
+            self._retiring -= 1
+            return True
+        return False
+
+    async def scale(
+        self,
+        pollers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        wait_time_seconds: Optional[int] = None,
+    ) -> None:
+        """
+        Change the number of pollers, the in-flight budget or the long-poll
+        wait while running. Must be called on the consumer's event loop.
+        Pollers that are scaled away finish their current receive first.
+        """
+        if pollers is not None:
+            if pollers < 1:
+                raise ValueError("pollers must be at least 1")
+            self.pollers = pollers
+            change = pollers - self.active_pollers
+            if change > 0:
+                revived = min(change, self._retiring)
+                self._retiring -= revived
+                for _ in range(change - revived):
+                    self._add_poller()
+            elif change < 0:
+                self._retiring -= change
+        if max_in_flight is not None and max_in_flight != self.max_in_flight:
+            self.max_in_flight = max_in_flight
+            await self._budget.resize(max_in_flight)
+        if wait_time_seconds is not None:
+            self.wait_time_seconds = wait_time_seconds
+
+    def stop(self) -> None:
+        """
+        Ask the consumer to finish. Safe to call from any thread.
+
+        Pollers stop after their current long poll returns; messages already
+        received are still processed and acked before :meth:`run` returns.
+        """
+        if self._loop is None or self._stop is None:
+            return
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _call(self, fn, *args, **kwargs):
+        return await self._loop.run_in_executor(
+            self._executor, partial(fn, *args, **kwargs)
+        )
+
+    def _receive_kwargs(self, max_messages: int) -> Dict[str, Any]:
+        kwargs = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": max_messages,
+            "WaitTimeSeconds": self.wait_time_seconds,
+            "MessageAttributeNames": ["All"],
+            "AttributeNames": ["All"],
+        }
+        if self.visibility_timeout is not None:
+            kwargs["VisibilityTimeout"] = self.visibility_timeout
+        return kwargs
+
+    async def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            if self._retire_poller():
+                return
+            granted = await self._budget.acquire(self.max_messages)
+            if self._stop.is_set():
+                await self._budget.release(granted)
+                break
+            try:
+                response = await self._call(
+                    self.sqs.receive_message, **self._receive_kwargs(granted)
+                )
+            except (ClientError, BotoCoreError) as e:
+                await self._budget.release(granted)
+                logger.error("Receive from %s failed: %s", self.queue_url, e)
+                await asyncio.sleep(1)
+                continue
+            messages = response.get("Messages", [])
+            self.stats.receives += 1
+            await self._budget.release(granted - len(messages))
+            if not messages:
+                self.stats.empty_receives += 1
+                continue
+            self.stats.received += len(messages)
+            if self.heartbeat is not None:
+                for message in messages:
+                    self.heartbeat.track(
+                        message["ReceiptHandle"], self.visibility_timeout
+                    )
+            for message in messages:
+                self._spawn(message)
+
+    def _group_key(self, message: Dict[str, Any]) -> Optional[Hashable]:
+        if not self.ordered:
+            return None
+        return message.get("Attributes", {}).get("MessageGroupId")
+
+    def _handler_for(self, message: Dict[str, Any]) -> Callable[[Dict[str, Any]], Any]:
+        return self.handler
+
+    def _queue_url_for(self, message: Dict[str, Any]) -> str:
+        return self.queue_url
+
+    async def _release(self, messages: List[Dict[str, Any]]) -> None:
+        """Give the in-flight slots of messages that are done (acked or not) back."""
+        await self._budget.release(len(messages))
+
+    def _pollers_done(self) -> None:
+        """Called once every poller has exited, before in-flight work is awaited."""
+
+    def _spawn(self, message: Dict[str, Any]) -> None:
+        group = self._group_key(message)
+        previous = self._group_tails.get(group) if group is not None else None
+        task = asyncio.create_task(self._handle(message, previous))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if group is not None:
+            # Chain each message behind the previous one of its group.
+            self._group_tails[group] = task
+            task.add_done_callback(partial(self._clear_tail, group))
+
+    def _clear_tail(self, group: Hashable, task: asyncio.Task) -> None:
+        if self._group_tails.get(group) is task:
+            del self._group_tails[group]
+
+    async def _handle(
+        self, message: Dict[str, Any], after: Optional[asyncio.Task] = None
+    ) -> bool:
+        if after is not None and not await after:
+            self.stats.skipped += 1
+            if self.heartbeat is not None:
+                self.heartbeat.release(message["ReceiptHandle"])
+            await self._release([message])
+            return False
+        handler = self._handler_for(message)
+        try:
+            # A store error counts as a failure, so the message is redelivered.
+            key = None
+            if self.idempotency is not None:
+                key = self.idempotency_key(message)
+                if await self._call(self.idempotency.seen, key):
+                    self.stats.duplicates += 1
+                    await self._acks.put(message)
+                    return True
+            if asyncio.iscoroutinefunction(handler):
+                await handler(message)
+            else:
+                await self._call(handler, message)
+            if key is not None:
+                await self._call(self.idempotency.mark_done, key)
+        except Exception:
+            self.stats.failed += 1
+            logger.exception("Handler failed for message %s", message.get("MessageId"))
+            if self.heartbeat is not None:
+                self.heartbeat.release(message["ReceiptHandle"])
+            await self._release([message])
+            return False
+        self.stats.processed += 1
+        await self._acks.put(message)
+        return True
+
+    async def _ack_loop(self) -> None:
+        deletes: set = set()
+        done = False
+        while not done:
+            message = await self._acks.get()
+            if message is None:
+                break
+            batch = [message]
+            deadline = self._loop.time() + self.ack_linger
+            while len(batch) < MAX_BATCH_SIZE:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._acks.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    done = True
+                    break
+                batch.append(message)
+            task = asyncio.create_task(self._delete(batch))
+            deletes.add(task)
+            task.add_done_callback(deletes.discard)
+        if deletes:
+            await asyncio.gather(*list(deletes), return_exceptions=True)
+
+    async def _delete(self, batch: List[Dict[str, Any]]) -> None:
+        by_queue: Dict[str, List[Dict[str, Any]]] = {}
+        for message in batch:
+            by_queue.setdefault(self._queue_url_for(message), []).append(message)
+        await asyncio.gather(
+            *(self._delete_from(url, messages) for url, messages in by_queue.items())
+        )
+
+    async def _delete_from(self, queue_url: str, batch: List[Dict[str, Any]]) -> None:
+        entries = [
+            {"Id": str(i), "ReceiptHandle": msg["ReceiptHandle"]}
+            for i, msg in enumerate(batch)
+        ]
+        try:
+            results = await self._call(
+                reconcile_batch, self.sqs.delete_message_batch, queue_url, entries
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Delete batch on %s failed: %s", queue_url, e)
+            return
+        finally:
+            if self.heartbeat is not None:
+                self.heartbeat.release_messages(batch)
+            await self._release(batch)
+        deleted = []
+        for result in results.values():
+            if result.ok:
+                deleted.append(batch[int(result.id)])
+            else:
+                logger.warning(
+                    "Delete failed for entry %s: %s %s",
+                    result.id,
+                    result.code,
+                    result.message,
+                )
+        self.stats.deleted += len(deleted)
+        if deleted and self.on_deleted is not None:
+            try:
+                await self._call(self.on_deleted, deleted)
+            except Exception:
+                logger.exception("on_deleted hook failed")
+
+
+def run_consumer(sqs_client, queue_url: str, handler, **kwargs) -> ConsumerStats:
+    """Blocking helper for scripts: run an :class:`AsyncConsumer` until interrupted."""
+    consumer = AsyncConsumer(sqs_client, queue_url, handler, **kwargs)
+    try:
+        return asyncio.run(consumer.run())
+    except KeyboardInterrupt:
+        return consumer.stats
@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# SQS FIFO queues drop a repeated MessageDeduplicationId seen in the last 5 minutes.
+SQS_DEDUP_INTERVAL = 300.0
+
+
+def deduplication_id_for(body: str, key: Optional[str] = None) -> str:
+    """
+    ``MessageDeduplicationId`` for a message: a SHA-256 of the caller's key
+    (e.g. ``"<csv file>:<row>"`` or a job id) if given, else of the body.
+    """
+    source = body if key is None else str(key)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+class DedupWindow:
+    """
+    Local, time-windowed set of recently sent deduplication IDs.
+
+    SQS would drop these duplicates anyway, but only after we paid for the
+    request; checking locally first keeps replays of the same CSV or job dump
+    from costing API calls. Entries expire after ``window`` seconds and the
+    oldest are evicted beyond ``max_entries`` so memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        window: float = SQS_DEDUP_INTERVAL,
+        max_entries: int = 1_000_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.max_entries = max_entries
+        self.dropped = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _expire(self, now: float) -> None:
+        while self._seen:
+            dedup_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.window and len(self._seen) < self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def check_and_add(self, dedup_id: str) -> bool:
+        """Record ``dedup_id``; returns False if it was already seen inside the window."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            if dedup_id in self._seen:
+                self.dropped += 1
+                return False
+            self._seen[dedup_id] = now
+            return True
+
+    def forget(self, dedup_id: str) -> None:
+        """Drop ``dedup_id`` again, e.g. when its send failed and should be retried."""
+        with self._lock:
+            self._seen.pop(dedup_id, None)
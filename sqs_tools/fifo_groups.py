@@ -0,0 +1,110 @@
+import hashlib
+import re
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+# MessageGroupId: up to 128 alphanumeric or punctuation characters.
+_VALID_GROUP_ID = re.compile(r"^[!-~]{1,128}$")
+
+
+class GroupBlockedError(Exception):
+    """Raised for work skipped because an earlier item in its group failed."""
+
+
+def group_id_for(key: Hashable, partitions: Optional[int] = None) -> str:
+    """
+    Map a business key (document id, case id...) to a FIFO ``MessageGroupId``.
+
+    Messages with the same key stay ordered; different keys can be consumed in
+    parallel. With ``partitions`` the keys are hashed into that many stable
+    groups, which bounds the number of groups while still spreading load.
+    """
+    key = str(key)
+    if partitions is not None:
+        return f"p{zlib.crc32(key.encode('utf-8')) % partitions}"
+    if _VALID_GROUP_ID.match(key):
+        return key
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class GroupedExecutor:
+    """
+    Run work in parallel across groups but strictly in order within a group.
+
+    Each group has its own queue and occupies at most one pool thread at a
+    time; after every item the group goes to the back of the pool queue, so a
+    busy group cannot starve the rest. If an item fails, the items already
+    queued behind it in the same group are failed with
+    :class:`GroupBlockedError` instead of running out of order; on a FIFO
+    queue their messages are then left undeleted and redelivered in order.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[Tuple[Callable, tuple, dict, Future]]] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, group_id: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        future: Future = Future()
+        with self._lock:
+            queue = self._queues.get(group_id)
+            if queue is None:
+                queue = self._queues[group_id] = deque()
+                queue.append((fn, args, kwargs, future))
+                self._pool.submit(self._run_next, group_id)
+            else:
+                queue.append((fn, args, kwargs, future))
+        return future
+
+    @property
+    def active_groups(self) -> int:
+        return len(self._queues)
+
+    def _run_next(self, group_id: str) -> None:
+        with self._lock:
+            fn, args, kwargs, future = self._queues[group_id][0]
+        failed = False
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+        with self._lock:
+            queue = self._queues[group_id]
+            queue.popleft()
+            if failed:
+                while queue:
+                    blocked = queue.popleft()[3]
+                    if blocked.set_running_or_notify_cancel():
+                        blocked.set_exception(
+                            GroupBlockedError(f"group {group_id} is blocked")
+                        )
+            if queue:
+                self._pool.submit(self._run_next, group_id)
+            else:
+                del self._queues[group_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        if wait:
+            # Groups resubmit themselves, so wait for every queue to drain first.
+            while True:
+                with self._lock:
+                    pending = [q[-1][3] for q in self._queues.values() if q]
+                if not pending:
+                    break
+                for future in pending:
+                    try:
+                        future.exception()
+                    except BaseException:
+                        pass
+        self._pool.shutdown(wait=wait)
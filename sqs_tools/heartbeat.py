@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .batch_reconciler import reconcile_batch
+
+logger = logging.getLogger(__name__)
+
+# A message can stay invisible for at most 12 hours after it was first received.
+MAX_VISIBILITY_SECONDS = 12 * 60 * 60
+
+
+@dataclass
+class _Lease:
+    received_at: float
+    deadline: float
+
+
+class VisibilityHeartbeat:
+    """
+    Keep in-flight messages invisible while a slow handler (OCR...) works on them.
+
+    :meth:`track` registers a receipt handle; a background thread pushes its
+    visibility out by ``visibility_timeout`` seconds whenever fewer than
+    ``extend_margin`` seconds are left, batching due handles into
+    ``change_message_visibility_batch`` calls of 10. :meth:`release` stops
+    tracking a handle once it has been deleted (or given up on). Handles SQS
+    rejects (already deleted, expired) are dropped, and nothing is extended
+    past the 12-hour SQS ceiling.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        visibility_timeout: int = 60,
+        extend_margin: float = 15.0,
+        tick: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if extend_margin >= visibility_timeout:
+            raise ValueError("extend_margin must be smaller than visibility_timeout")
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+        self.extend_margin = extend_margin
+        self.tick = tick
+        self.extensions = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._leases: Dict[str, _Lease] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> "VisibilityHeartbeat":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="visibility-heartbeat", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def track(self, receipt_handle: str, visible_for: Optional[float] = None) -> None:
+        """
+        Start extending ``receipt_handle``. ``visible_for`` is how long the message
+        is invisible from now; it defaults to ``visibility_timeout`` (i.e. the
+        receive used that timeout).
+        """
+        now = self._clock()
+        visible_for = self.visibility_timeout if visible_for is None else visible_for
+        with self._lock:
+            self._leases[receipt_handle] = _Lease(now, now + visible_for)
+
+    def track_messages(self, messages: Iterable[Dict[str, Any]]) -> None:
+        for message in messages:
+            self.track(message["ReceiptHandle"])
+
+    def release(self, receipt_handle: str) -> None:
+        with self._lock:
+            self._leases.pop(receipt_handle, None)
+
+    def release_messages(self, messages: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for message in messages:
+                self._leases.pop(message["ReceiptHandle"], None)
+
+    @contextmanager
+    def hold(self, message: Dict[str, Any]):
+        """Track ``message`` for the duration of a ``with`` block."""
+        self.track(message["ReceiptHandle"])
+        try:
+            yield message
+        finally:
+            self.release(message["ReceiptHandle"])
+
+    @property
+    def tracked(self) -> int:
+        return len(self._leases)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.tick):
+            try:
+                self.extend_due()
+            except Exception:
+                logger.exception("Visibility heartbeat failed")
+
+    def extend_due(self) -> int:
+        """Extend every handle inside its margin now; returns how many were extended."""
+        now = self._clock()
+        with self._lock:
+            due = []
+            for handle, lease in list(self._leases.items()):
+                if lease.deadline - now > self.extend_margin:
+                    continue
+                # Never ask for more than SQS allows since the first receive.
+                remaining_cap = MAX_VISIBILITY_SECONDS - (now - lease.received_at)
+                timeout = int(min(self.visibility_timeout, remaining_cap))
+                if timeout <= 0:
+                    del self._leases[handle]
+                    continue
+                due.append((handle, timeout))
+        extended = 0
+        for start in range(0, len(due), 10):
+            extended += self._extend(due[start : start + 10], now)
+        return extended
+
+    def _extend(self, due: List, now: float) -> int:
+        entries = [
+            {"Id": str(i), "ReceiptHandle": handle, "VisibilityTimeout": timeout}
+            for i, (handle, timeout) in enumerate(due)
+        ]
+        results = reconcile_batch(
+            self.sqs.change_message_visibility_batch,
+            self.queue_url,
+            entries,
+            max_attempts=2,
+        )
+        extended = 0
+        with self._lock:
+            for result in results.values():
+                handle, timeout = due[int(result.id)]
+                lease = self._leases.get(handle)
+                if lease is None:
+                    continue  # released while the call was in flight
+                if result.ok:
+                    lease.deadline = now + timeout
+                    extended += 1
+                else:
+                    logger.warning("Could not extend %s: %s", handle[:16], result.code)
+                    del self._leases[handle]
+        self.extensions += extended
+        return extended
@@ -0,0 +1,159 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+def idempotency_key(message: Dict[str, Any]) -> str:
+    """Key a message by its ``MessageId``; redeliveries of one message share it."""
+    return message["MessageId"]
+
+
+def body_hash_key(message: Dict[str, Any]) -> str:
+    """Key a message by its body, so the same payload sent twice is also caught."""
+    return "sha256:" + hashlib.sha256(message["Body"].encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore(ABC):
+    """Remembers which message keys have already been handled."""
+
+    @abstractmethod
+    def seen(self, key: str) -> bool:
+        """Whether ``key`` has been marked done."""
+
+    @abstractmethod
+    def mark_done(self, key: str) -> None:
+        """Record ``key`` as handled."""
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Bounded in-process LRU of handled keys, with an optional TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            done_at = self._entries.get(key)
+            if done_at is None:
+                return False
+            if self.ttl is not None and self._clock() - done_at > self.ttl:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def mark_done(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = self._clock()
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Handled keys persisted in a SQLite file, so they survive restarts.
+
+    One connection is shared by all threads behind a lock; WAL mode keeps
+    writes cheap. Rows older than ``ttl`` are ignored and pruned on
+    :meth:`prune`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_messages (key TEXT PRIMARY KEY, done_at REAL NOT NULL)"
+        )
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT done_at FROM processed_messages WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False
+        return self.ttl is None or self._clock() - row[0] <= self.ttl
+
+    def mark_done(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_messages (key, done_at) VALUES (?, ?)",
+                (key, self._clock()),
+            )
+
+    def prune(self) -> int:
+        """Delete rows past their TTL; returns how many were removed."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM processed_messages WHERE done_at < ?",
+                (self._clock() - self.ttl,),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredIdempotencyStore(IdempotencyStore):
+    """
+    LRU in front of a persistent store: hot redeliveries are answered from
+    memory, everything else falls through to SQLite and is promoted.
+    """
+
+    def __init__(
+        self,
+        persistent: IdempotencyStore,
+        memory: Optional[MemoryIdempotencyStore] = None,
+    ):
+        self.persistent = persistent
+        self.memory = memory or MemoryIdempotencyStore()
+
+    def seen(self, key: str) -> bool:
+        if self.memory.seen(key):
+            return True
+        if self.persistent.seen(key):
+            self.memory.mark_done(key)
+            return True
+        return False
+
+    def mark_done(self, key: str) -> None:
+        self.persistent.mark_done(key)
+        self.memory.mark_done(key)
+
+    def close(self) -> None:
+        self.persistent.close()
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+from .fifo_groups import GroupedExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """A record was not started because the invocation was about to time out."""
+
+
+def message_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a Lambda SQS event record to the ``receive_message`` shape
+    (``MessageId``, ``Body``, ``MessageAttributes`` with ``StringValue``...),
+    so handlers written for the consumers and scripts run unchanged.
+    """
+    attributes = {}
+    for name, value in record.get("messageAttributes", {}).items():
+        converted = {"DataType": value.get("dataType", "String")}
+        if value.get("stringValue") is not None:
+            converted["StringValue"] = value["stringValue"]
+        if value.get("binaryValue") is not None:
+            converted["BinaryValue"] = value["binaryValue"]
+        attributes[name] = converted
+    message = {
+        "MessageId": record["messageId"],
+        "ReceiptHandle": record.get("receiptHandle"),
+        "Body": record["body"],
+        "Attributes": dict(record.get("attributes", {})),
+        "MessageAttributes": attributes,
+    }
+    if "md5OfBody" in record:
+        message["MD5OfBody"] = record["md5OfBody"]
+    return message
+
+
+def _group_of(record: Dict[str, Any]) -> Optional[str]:
+    if not record.get("eventSourceARN", "").endswith(".fifo"):
+        return None
+    return record.get("attributes", {}).get("MessageGroupId")
+
+
+def process_batch(
+    event: Dict[str, Any],
+    handler: Callable[[Dict[str, Any]], Any],
+    context=None,
+    max_workers: int = 10,
+    safety_ms: int = 2000,
+    convert: bool = True,
+) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Run ``handler`` on every record of an SQS-triggered Lambda event and
+    return the partial batch response, listing only the records that failed.
+
+    Records are handled concurrently on ``max_workers`` threads (or as
+    tasks, for a coroutine ``handler``). Records from a FIFO queue run in
+    order within their message group, and once one fails the rest of its
+    group is reported failed unprocessed, so the group is retried in order.
+    Records not yet started, or still running, when fewer than
+    ``safety_ms`` of the invocation remain are reported failed as well,
+    rather than letting a timeout retry the whole batch.
+
+    The event source mapping needs ``ReportBatchItemFailures`` enabled for
+    Lambda to honour the response.
+    """
+    records = event.get("Records", [])
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = (
+            time.monotonic()
+            + (context.get_remaining_time_in_millis() - safety_ms) / 1000
+        )
+
+    def run_one(record):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded(record["messageId"])
+        return handler(message_from_record(record) if convert else record)
+
+    if asyncio.iscoroutinefunction(handler):
+        failed = asyncio.run(_process_async(records, run_one, max_workers, deadline))
+    else:
+        failed = _process_threaded(records, run_one, max_workers, deadline)
+    if failed:
+        logger.warning("%d of %d records failed", len(failed), len(records))
+    return {"batchItemFailures": [{"itemIdentifier": i} for i in failed]}
+
+
+def _process_threaded(records, run_one, max_workers, deadline) -> List[str]:
+    futures: Dict[str, Future] = {}
+    grouped = GroupedExecutor(max_workers=max_workers)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for record in records:
+            group = _group_of(record)
+            if group is None:
+                futures[record["messageId"]] = pool.submit(run_one, record)
+            else:
+                futures[record["messageId"]] = grouped.submit(group, run_one, record)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        wait_futures(list(futures.values()), timeout=timeout)
+    finally:
+        # Anything still running past the deadline is abandoned and reported.
+        pool.shutdown(wait=False)
+        grouped.shutdown(wait=False)
+    failed = []
+    for record in records:
+        future = futures[record["messageId"]]
+        if not future.done():
+            logger.warning(
+                "Record %s still running at the deadline", record["messageId"]
+            )
+        elif future.exception() is not None:
+            _log_failure(record, future.exception())
+        else:
+            continue
+        failed.append(record["messageId"])
+    return failed
+
+
+async def _process_async(records, run_one, max_workers, deadline) -> List[str]:
+    slots = asyncio.Semaphore(max_workers)
+    succeeded = set()
+    lanes: Dict[Any, List[Dict[str, Any]]] = {}
+    for record in records:
+        group = _group_of(record)
+        # Records outside a FIFO group each get a lane of their own.
+        key = ("group", group) if group is not None else ("record", record["messageId"])
+        lanes.setdefault(key, []).append(record)
+
+    async def run_lane(lane):
+        for record in lane:
+            try:
+                async with slots:
+                    await run_one(record)
+            except Exception as e:
+                # The rest of the lane stays unprocessed and is retried in order.
+                _log_failure(record, e)
+                return
+            succeeded.add(record["messageId"])
+
+    tasks = [asyncio.ensure_future(run_lane(lane)) for lane in lanes.values()]
+    if tasks:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return [r["messageId"] for r in records if r["messageId"] not in succeeded]
+
+
+def _log_failure(record: Dict[str, Any], error: BaseException) -> None:
+    if isinstance(error, DeadlineExceeded):
+        logger.warning("Record %s not started before the deadline", record["messageId"])
+    else:
+        logger.error("Record %s failed: %r", record["messageId"], error)
+
+
+def sqs_batch_handler(
+    handler: Optional[Callable[[Dict[str, Any]], Any]] = None, **options
+):
+    """
+    Decorator turning a per-message handler into a Lambda entry point that
+    returns ``batchItemFailures``; ``options`` go to :func:`process_batch`::
+
+        @sqs_batch_handler(max_workers=5)
+        def lambda_handler(message):
+            ...
+    """
+
+    def decorate(fn):
+        @wraps(fn)
+        def lambda_handler(event, context=None):
+            return process_batch(event, fn, context, **options)
+
+        return lambda_handler
+
+    return decorate(handler) if handler is not None else decorate
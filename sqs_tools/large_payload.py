@@ -0,0 +1,168 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .send_buffer import MAX_BATCH_BYTES, entry_size
+
+# Same pointer format and attribute as the AWS SQS Extended Client libraries,
+# so Java/Python consumers built on those can read our messages and vice versa.
+POINTER_CLASS = "software.amazon.payloadoffloading.PayloadS3Pointer"
+SIZE_ATTRIBUTE = "ExtendedPayloadSize"
+
+
+class Payload:
+    """
+    Message body that may live in S3.
+
+    Nothing is fetched until :meth:`stream`, :meth:`read` or :meth:`text` is
+    called, so handlers that route on attributes alone never pay for the
+    download. :meth:`stream` returns the botocore ``StreamingBody`` for
+    chunked reads of very large documents.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        body: str,
+        bucket: Optional[str] = None,
+        key: Optional[str] = None,
+    ):
+        self._s3 = s3_client
+        self._inline = body
+        self.bucket = bucket
+        self.key = key
+        self._cached: Optional[bytes] = None
+
+    @property
+    def offloaded(self) -> bool:
+        return self.key is not None
+
+    def stream(self):
+        if not self.offloaded:
+            raise ValueError("inline payloads have no S3 stream; use read()")
+        return self._s3.get_object(Bucket=self.bucket, Key=self.key)["Body"]
+
+    def read(self) -> bytes:
+        if not self.offloaded:
+            return self._inline.encode("utf-8")
+        if self._cached is None:
+            self._cached = self.stream().read()
+        return self._cached
+
+    def text(self) -> str:
+        return self._inline if not self.offloaded else self.read().decode("utf-8")
+
+
+class ClaimCheck:
+    """
+    Offload SQS bodies above ``threshold`` bytes to S3 and send a pointer instead.
+
+    Producers run their ``send_message`` kwargs or batch entries through
+    :meth:`offload`; consumers use :meth:`payload` (or :meth:`wrap_handler`)
+    to get at the real body and :meth:`cleanup` once the message is deleted.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        threshold: int = MAX_BATCH_BYTES,
+        key_prefix: str = "sqs-payloads/",
+    ):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.threshold = threshold
+        self.key_prefix = key_prefix
+
+    def fits(self, params: Dict[str, Any]) -> bool:
+        """Whether ``params`` is small enough to be sent without offloading."""
+        return entry_size(params) <= self.threshold
+
+    def offload(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return ``params`` unchanged if small enough, otherwise a copy whose
+        ``MessageBody`` is an S3 pointer. Works for both ``send_message``
+        kwargs and ``send_message_batch`` entries.
+        """
+        if self.fits(params):
+            return params
+        data = params["MessageBody"].encode("utf-8")
+        key = f"{self.key_prefix}{uuid.uuid4()}"
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data)
+        attributes = dict(params.get("MessageAttributes", {}))
+        attributes[SIZE_ATTRIBUTE] = {
+            "DataType": "Number",
+            "StringValue": str(len(data)),
+        }
+        pointer = json.dumps(
+            [POINTER_CLASS, {"s3BucketName": self.bucket, "s3Key": key}]
+        )
+        return dict(params, MessageBody=pointer, MessageAttributes=attributes)
+
+    @staticmethod
+    def pointer(message: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """The ``{"s3BucketName", "s3Key"}`` pointer of an offloaded message, else None."""
+        if SIZE_ATTRIBUTE not in message.get("MessageAttributes", {}):
+            return None
+        try:
+            kind, location = json.loads(message["Body"])
+        except (TypeError, ValueError):
+            return None
+        return location if kind == POINTER_CLASS else None
+
+    def payload(self, message: Dict[str, Any]) -> Payload:
+        location = self.pointer(message)
+        if location is None:
+            return Payload(self.s3, message["Body"])
+        return Payload(
+            self.s3, message["Body"], location["s3BucketName"], location["s3Key"]
+        )
+
+    def wrap_handler(
+        self, handler: Callable[[Dict[str, Any]], Any], materialize: bool = True
+    ):
+        """
+        Wrap a ``process_message``-style handler. The message it receives gets a
+        lazy ``"Payload"`` entry; with ``materialize`` its ``"Body"`` is also
+        replaced by the full text so existing handlers work unchanged.
+        """
+
+        def resolve(message):
+            payload = self.payload(message)
+            message = dict(message, Payload=payload)
+            if materialize and payload.offloaded:
+                message["Body"] = payload.text()
+            return message
+
+        if asyncio.iscoroutinefunction(handler):
+
+            async def wrapped_async(message):
+                return await handler(await asyncio.to_thread(resolve, message))
+
+            return wrapped_async
+
+        def wrapped(message):
+            return handler(resolve(message))
+
+        return wrapped
+
+    def cleanup(self, messages: Iterable[Dict[str, Any]]) -> int:
+        """Delete the S3 objects behind already-deleted messages; returns how many."""
+        by_bucket: Dict[str, List[str]] = {}
+        for location in map(self.pointer, messages):
+            if location:
+                by_bucket.setdefault(location["s3BucketName"], []).append(
+                    location["s3Key"]
+                )
+        for bucket, keys in by_bucket.items():
+            # DeleteObjects takes at most 1000 keys per call.
+            for start in range(0, len(keys), 1000):
+                self.s3.delete_objects(
+                    Bucket=bucket,
+                    Delete={
+                        "Objects": [{"Key": key} for key in keys[start : start + 1000]],
+                        "Quiet": True,
+                    },
+                )
+        return sum(len(keys) for keys in by_bucket.values())
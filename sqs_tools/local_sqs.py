@@ -0,0 +1,619 @@
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+ACCOUNT_ID = "000000000000"
+REGION = "local"
+MAX_BATCH_ENTRIES = 10
+MAX_PAYLOAD_BYTES = 256 * 1024
+DEDUP_INTERVAL = 300.0
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Message:
+    message_id: str
+    body: str
+    attributes: Dict[str, Any]
+    sent_at: float
+    group_id: Optional[str] = None
+    dedup_id: Optional[str] = None
+    sequence: Optional[str] = None
+    receive_count: int = 0
+    first_received_at: Optional[float] = None
+    receipt_handle: Optional[str] = None
+    visible_at: float = 0.0
+
+
+@dataclass
+class _Queue:
+    name: str
+    url: str
+    arn: str
+    fifo: bool
+    visibility_timeout: int
+    attributes: Dict[str, str]
+    cond: threading.Condition
+    ready: Deque[_Message] = field(default_factory=deque)
+    # FIFO only: group id -> undeleted messages in send order.
+    groups: "OrderedDict[str, Deque[_Message]]" = field(default_factory=OrderedDict)
+    locked_groups: Dict[str, int] = field(default_factory=dict)
+    inflight: Dict[str, _Message] = field(default_factory=dict)
+    expiry: List = field(default_factory=list)
+    delayed: List = field(default_factory=list)
+    dedup: "OrderedDict[str, Any]" = field(default_factory=OrderedDict)
+    redrive: Optional[Dict[str, Any]] = None
+
+    @property
+    def visible_count(self) -> int:
+        if not self.fifo:
+            return len(self.ready)
+        return sum(len(q) for q in self.groups.values()) - len(self.inflight)
+
+
+class LocalSQS:
+    """
+    In-process, thread-safe stand-in for ``boto3.client("sqs")``.
+
+    Implements the subset this repo uses: ``create_queue`` (standard and FIFO,
+    ``VisibilityTimeout``, ``RedrivePolicy``, ``ContentBasedDeduplication``),
+    ``get_queue_url``, ``get_queue_attributes``, ``send_message(_batch)``,
+    ``receive_message`` with long polling, ``delete_message(_batch)``,
+    ``change_message_visibility(_batch)`` and ``purge_queue``. Visibility
+    timeouts, receive counts, redrive to a dead-letter queue, FIFO group
+    locking and the 5-minute deduplication window behave like SQS; errors are
+    raised as ``botocore`` ``ClientError`` with SQS error codes, so the
+    existing ``except ClientError`` paths work unchanged.
+
+    Pass it wherever a client is expected, e.g.
+    ``patch.object(regular, "sqs", LocalSQS())``.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._queues: Dict[str, _Queue] = {}
+        self._by_arn: Dict[str, _Queue] = {}
+        self._sequence = itertools.count(1)
+        self.calls: Dict[str, int] = {}
+
+    # -- queue management -------------------------------------------------
+
+    def _count(self, operation: str) -> None:
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def create_queue(
+        self, QueueName: str, Attributes: Optional[Dict[str, str]] = None, **_
+    ) -> Dict[str, Any]:
+        self._count("CreateQueue")
+        attributes = dict(Attributes or {})
+        fifo = attributes.get("FifoQueue", "false").lower() == "true"
+        if fifo != QueueName.endswith(".fifo"):
+            raise _error(
+                "InvalidParameterValue",
+                "FIFO queue names must end in .fifo and set FifoQueue=true",
+                "CreateQueue",
+            )
+        with self._lock:
+            existing = next(
+                (q for q in self._queues.values() if q.name == QueueName), None
+            )
+            if existing is not None:
+                return {"QueueUrl": existing.url}
+            url = f"https://sqs.{REGION}.amazonaws.com/{ACCOUNT_ID}/{QueueName}"
+            queue = _Queue(
+                name=QueueName,
+                url=url,
+                arn=f"arn:aws:sqs:{REGION}:{ACCOUNT_ID}:{QueueName}",
+                fifo=fifo,
+                visibility_timeout=int(attributes.get("VisibilityTimeout", 30)),
+                attributes=attributes,
+                cond=threading.Condition(self._lock),
+            )
+            if "RedrivePolicy" in attributes:
+                queue.redrive = json.loads(attributes["RedrivePolicy"])
+            self._queues[url] = queue
+            self._by_arn[queue.arn] = queue
+        return {"QueueUrl": url}
+
+    def get_queue_url(self, QueueName: str, **_) -> Dict[str, str]:
+        with self._lock:
+            for queue in self._queues.values():
+                if queue.name == QueueName:
+                    return {"QueueUrl": queue.url}
+        raise _error(
+            "AWS.SimpleQueueService.NonExistentQueue", QueueName, "GetQueueUrl"
+        )
+
+    def list_queues(self, QueueNamePrefix: str = "", **_) -> Dict[str, List[str]]:
+        with self._lock:
+            return {
+                "QueueUrls": [
+                    q.url
+                    for q in self._queues.values()
+                    if q.name.startswith(QueueNamePrefix)
+                ]
+            }
+
+    def _queue(self, url: str, operation: str) -> _Queue:
+        queue = self._queues.get(url)
+        if queue is None:
+            raise _error("AWS.SimpleQueueService.NonExistentQueue", url, operation)
+        return queue
+
+    def get_queue_attributes(
+        self, QueueUrl: str, AttributeNames: Optional[List[str]] = None, **_
+    ):
+        self._count("GetQueueAttributes")
+        with self._lock:
+            queue = self._queue(QueueUrl, "GetQueueAttributes")
+            self._refresh(queue, self._clock())
+            values = dict(queue.attributes)
+            values.update(
+                {
+                    "QueueArn": queue.arn,
+                    "VisibilityTimeout": str(queue.visibility_timeout),
+                    "ApproximateNumberOfMessages": str(queue.visible_count),
+                    "ApproximateNumberOfMessagesNotVisible": str(len(queue.inflight)),
+                    "ApproximateNumberOfMessagesDelayed": str(len(queue.delayed)),
+                }
+            )
+        names = AttributeNames or ["All"]
+        if "All" not in names:
+            values = {k: v for k, v in values.items() if k in names}
+        return {"Attributes": values}
+
+    def set_queue_attributes(
+        self, QueueUrl: str, Attributes: Dict[str, str], **_
+    ) -> Dict:
+        with self._lock:
+            queue = self._queue(QueueUrl, "SetQueueAttributes")
+            queue.attributes.update(Attributes)
+            if "VisibilityTimeout" in Attributes:
+                queue.visibility_timeout = int(Attributes["VisibilityTimeout"])
+            if "RedrivePolicy" in Attributes:
+                queue.redrive = json.loads(Attributes["RedrivePolicy"])
+        return {}
+
+    def purge_queue(self, QueueUrl: str, **_) -> Dict:
+        with self._lock:
+            queue = self._queue(QueueUrl, "PurgeQueue")
+            queue.ready.clear()
+            queue.groups.clear()
+            queue.locked_groups.clear()
+            queue.inflight.clear()
+            queue.expiry.clear()
+            queue.delayed.clear()
+        return {}
+
+    # -- send -------------------------------------------------------------
+
+    def _enqueue(
+        self, queue: _Queue, message: _Message, delay: float, now: float
+    ) -> None:
+        if delay > 0:
+            message.visible_at = now + delay
+            heapq.heappush(
+                queue.delayed, (message.visible_at, message.message_id, message)
+            )
+            return
+        if queue.fifo:
+            queue.groups.setdefault(message.group_id, deque()).append(message)
+        else:
+            queue.ready.append(message)
+        queue.cond.notify_all()
+
+    def _send_one(
+        self, queue: _Queue, entry: Dict[str, Any], operation: str, now: float
+    ) -> Dict[str, Any]:
+        body = entry["MessageBody"]
+        if not body:
+            raise _error("MissingParameter", "MessageBody is required", operation)
+        size = len(body.encode("utf-8"))
+        if size > MAX_PAYLOAD_BYTES:
+            raise _error(
+                "InvalidParameterValue",
+                "Message must be shorter than 262144 bytes",
+                operation,
+            )
+        group_id = entry.get("MessageGroupId")
+        dedup_id = entry.get("MessageDeduplicationId")
+        if queue.fifo:
+            if not group_id:
+                raise _error(
+                    "MissingParameter",
+                    "MessageGroupId is required for FIFO queues",
+                    operation,
+                )
+            if dedup_id is None:
+                if (
+                    queue.attributes.get("ContentBasedDeduplication", "false").lower()
+                    != "true"
+                ):
+                    raise _error(
+                        "InvalidParameterValue",
+                        "MessageDeduplicationId is required without ContentBasedDeduplication",
+                        operation,
+                    )
+                dedup_id = hashlib.sha256(body.encode("utf-8")).hexdigest()
+            # Entries are in send order, so expired ones are always at the front.
+            while (
+                queue.dedup
+                and now - next(iter(queue.dedup.values()))[0] >= DEDUP_INTERVAL
+            ):
+                queue.dedup.popitem(last=False)
+            previous = queue.dedup.get(dedup_id)
+            if previous is not None and now - previous[0] < DEDUP_INTERVAL:
+                return previous[1]
+        message = _Message(
+            message_id=str(uuid.uuid4()),
+            body=body,
+            attributes=entry.get("MessageAttributes") or {},
+            sent_at=time.time(),
+            group_id=group_id,
+            dedup_id=dedup_id,
+        )
+        result = {"MessageId": message.message_id, "MD5OfMessageBody": _md5(body)}
+        if queue.fifo:
+            message.sequence = str(next(self._sequence)).zfill(20)
+            result["SequenceNumber"] = message.sequence
+            queue.dedup[dedup_id] = (now, result)
+        self._enqueue(queue, message, float(entry.get("DelaySeconds", 0)), now)
+        return result
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> Dict[str, Any]:
+        self._count("SendMessage")
+        with self._lock:
+            queue = self._queue(QueueUrl, "SendMessage")
+            return self._send_one(
+                queue,
+                dict(kwargs, MessageBody=MessageBody),
+                "SendMessage",
+                self._clock(),
+            )
+
+    def _check_batch(self, entries: List[Dict[str, Any]], operation: str) -> None:
+        if not entries:
+            raise _error(
+                "AWS.SimpleQueueService.EmptyBatchRequest", "No entries", operation
+            )
+        if len(entries) > MAX_BATCH_ENTRIES:
+            raise _error(
+                "AWS.SimpleQueueService.TooManyEntriesInBatchRequest",
+                "Max 10 entries",
+                operation,
+            )
+        ids = [entry["Id"] for entry in entries]
+        if len(set(ids)) != len(ids):
+            raise _error(
+                "AWS.SimpleQueueService.BatchEntryIdsNotDistinct",
+                "Duplicate Id",
+                operation,
+            )
+
+    def send_message_batch(
+        self, QueueUrl: str, Entries: List[Dict[str, Any]], **_
+    ) -> Dict[str, Any]:
+        self._count("SendMessageBatch")
+        self._check_batch(Entries, "SendMessageBatch")
+        total = sum(len(entry["MessageBody"].encode("utf-8")) for entry in Entries)
+        if total > MAX_PAYLOAD_BYTES:
+            raise _error(
+                "AWS.SimpleQueueService.BatchRequestTooLong",
+                "Batch over 262144 bytes",
+                "SendMessageBatch",
+            )
+        successful, failed = [], []
+        with self._lock:
+            queue = self._queue(QueueUrl, "SendMessageBatch")
+            now = self._clock()
+            for entry in Entries:
+                try:
+                    result = self._send_one(queue, entry, "SendMessageBatch", now)
+                except ClientError as e:
+                    error = e.response["Error"]
+                    failed.append(
+                        {
+                            "Id": entry["Id"],
+                            "SenderFault": True,
+                            "Code": error["Code"],
+                            "Message": error["Message"],
+                        }
+                    )
+                else:
+                    successful.append(dict(result, Id=entry["Id"]))
+        return {"Successful": successful, "Failed": failed}
+
+    # -- receive ----------------------------------------------------------
+
+    def _refresh(self, queue: _Queue, now: float) -> None:
+        """Return expired in-flight messages and due delayed messages to the queue."""
+        woke = False
+        while queue.expiry and queue.expiry[0][0] <= now:
+            visible_at, handle, _ = heapq.heappop(queue.expiry)
+            message = queue.inflight.get(handle)
+            if message is None or message.visible_at != visible_at:
+                continue  # deleted, or its visibility was changed since
+            del queue.inflight[handle]
+            message.receipt_handle = None
+            if queue.fifo:
+                self._unlock_group(queue, message.group_id)
+            else:
+                queue.ready.appendleft(message)
+            woke = True
+        while queue.delayed and queue.delayed[0][0] <= now:
+            _, _, message = heapq.heappop(queue.delayed)
+            message.visible_at = 0.0
+            self._enqueue(queue, message, 0, now)
+        if woke:
+            queue.cond.notify_all()
+
+    def _unlock_group(self, queue: _Queue, group_id: str) -> None:
+        remaining = queue.locked_groups.get(group_id, 0) - 1
+        if remaining > 0:
+            queue.locked_groups[group_id] = remaining
+        else:
+            queue.locked_groups.pop(group_id, None)
+
+    def _next_wakeup(self, queue: _Queue) -> Optional[float]:
+        times = [heap[0][0] for heap in (queue.expiry, queue.delayed) if heap]
+        return min(times) if times else None
+
+    def _take(self, queue: _Queue, limit: int) -> List[_Message]:
+        if not queue.fifo:
+            taken = []
+            while queue.ready and len(taken) < limit:
+                taken.append(queue.ready.popleft())
+            return taken
+        taken = []
+        for group_id in list(queue.groups):
+            if len(taken) >= limit:
+                break
+            messages = queue.groups[group_id]
+            if not messages:
+                del queue.groups[group_id]
+                continue
+            if group_id in queue.locked_groups:
+                continue
+            for message in messages:
+                if len(taken) >= limit:
+                    break
+                taken.append(message)
+            # Rotate so the next receive starts with a different group.
+            queue.groups.move_to_end(group_id)
+        return taken
+
+    def _dead_letter(self, queue: _Queue, message: _Message, now: float) -> bool:
+        if queue.redrive is None:
+            return False
+        if message.receive_count <= int(queue.redrive["maxReceiveCount"]):
+            return False
+        dlq = self._by_arn.get(queue.redrive["deadLetterTargetArn"])
+        if dlq is None:
+            return False
+        if queue.fifo:
+            queue.groups[message.group_id].remove(message)
+        message.receipt_handle = None
+        message.visible_at = 0.0
+        self._enqueue(dlq, message, 0, now)
+        return True
+
+    def _render(
+        self, message: _Message, names: List[str], attr_names: List[str]
+    ) -> Dict[str, Any]:
+        rendered = {
+            "MessageId": message.message_id,
+            "ReceiptHandle": message.receipt_handle,
+            "MD5OfBody": _md5(message.body),
+            "Body": message.body,
+        }
+        system = {
+            "SentTimestamp": str(int(message.sent_at * 1000)),
+            "ApproximateReceiveCount": str(message.receive_count),
+            "ApproximateFirstReceiveTimestamp": str(
+                int((message.first_received_at or message.sent_at) * 1000)
+            ),
+        }
+        if message.group_id is not None:
+            system["MessageGroupId"] = message.group_id
+            system["MessageDeduplicationId"] = message.dedup_id
+            system["SequenceNumber"] = message.sequence
+        if names:
+            wanted = (
+                system
+                if "All" in names
+                else {k: v for k, v in system.items() if k in names}
+            )
+            if wanted:
+                rendered["Attributes"] = wanted
+        if attr_names and message.attributes:
+            if "All" in attr_names or ".*" in attr_names:
+                rendered["MessageAttributes"] = dict(message.attributes)
+            else:
+                picked = {
+                    k: v for k, v in message.attributes.items() if k in attr_names
+                }
+                if picked:
+                    rendered["MessageAttributes"] = picked
+        return rendered
+
+    def receive_message(
+        self,
+        QueueUrl: str,
+        MaxNumberOfMessages: int = 1,
+        WaitTimeSeconds: float = 0,
+        VisibilityTimeout: Optional[int] = None,
+        AttributeNames: Optional[List[str]] = None,
+        MessageSystemAttributeNames: Optional[List[str]] = None,
+        MessageAttributeNames: Optional[List[str]] = None,
+        **_,
+    ) -> Dict[str, Any]:
+        self._count("ReceiveMessage")
+        if not 1 <= MaxNumberOfMessages <= MAX_BATCH_ENTRIES:
+            raise _error(
+                "InvalidParameterValue",
+                "MaxNumberOfMessages must be 1-10",
+                "ReceiveMessage",
+            )
+        names = list(AttributeNames or []) + list(MessageSystemAttributeNames or [])
+        with self._lock:
+            queue = self._queue(QueueUrl, "ReceiveMessage")
+            timeout = (
+                queue.visibility_timeout
+                if VisibilityTimeout is None
+                else VisibilityTimeout
+            )
+            deadline = self._clock() + WaitTimeSeconds
+            while True:
+                now = self._clock()
+                self._refresh(queue, now)
+                taken = self._take(queue, MaxNumberOfMessages)
+                delivered = []
+                for message in taken:
+                    message.receive_count += 1
+                    if self._dead_letter(queue, message, now):
+                        continue
+                    if message.first_received_at is None:
+                        message.first_received_at = time.time()
+                    message.receipt_handle = uuid.uuid4().hex
+                    message.visible_at = now + timeout
+                    queue.inflight[message.receipt_handle] = message
+                    heapq.heappush(
+                        queue.expiry,
+                        (
+                            message.visible_at,
+                            message.receipt_handle,
+                            message.message_id,
+                        ),
+                    )
+                    if queue.fifo:
+                        queue.locked_groups[message.group_id] = (
+                            queue.locked_groups.get(message.group_id, 0) + 1
+                        )
+                    delivered.append(
+                        self._render(message, names, MessageAttributeNames or [])
+                    )
+                if delivered or now >= deadline:
+                    return {"Messages": delivered} if delivered else {}
+                wakeup = self._next_wakeup(queue)
+                wait = deadline - now if wakeup is None else min(deadline, wakeup) - now
+                queue.cond.wait(max(wait, 0.001))
+
+    # -- delete / visibility ---------------------------------------------
+
+    def _delete_one(self, queue: _Queue, handle: str, operation: str) -> None:
+        message = queue.inflight.pop(handle, None)
+        if message is None:
+            raise _error(
+                "ReceiptHandleIsInvalid", "The receipt handle is not valid", operation
+            )
+        message.receipt_handle = None
+        message.visible_at = 0.0
+        if queue.fifo:
+            queue.groups[message.group_id].remove(message)
+            if not queue.groups[message.group_id]:
+                del queue.groups[message.group_id]
+            self._unlock_group(queue, message.group_id)
+            queue.cond.notify_all()
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str, **_) -> Dict:
+        self._count("DeleteMessage")
+        with self._lock:
+            self._delete_one(
+                self._queue(QueueUrl, "DeleteMessage"), ReceiptHandle, "DeleteMessage"
+            )
+        return {}
+
+    def delete_message_batch(
+        self, QueueUrl: str, Entries: List[Dict[str, Any]], **_
+    ) -> Dict[str, Any]:
+        self._count("DeleteMessageBatch")
+        self._check_batch(Entries, "DeleteMessageBatch")
+        return self._batch(
+            QueueUrl,
+            Entries,
+            "DeleteMessageBatch",
+            lambda q, e: self._delete_one(q, e["ReceiptHandle"], "DeleteMessageBatch"),
+        )
+
+    def _change_one(
+        self, queue: _Queue, handle: str, timeout: int, operation: str
+    ) -> None:
+        message = queue.inflight.get(handle)
+        if message is None:
+            raise _error(
+                "ReceiptHandleIsInvalid", "The receipt handle is not valid", operation
+            )
+        message.visible_at = self._clock() + int(timeout)
+        heapq.heappush(queue.expiry, (message.visible_at, handle, message.message_id))
+        if timeout == 0:
+            self._refresh(queue, self._clock())
+
+    def change_message_visibility(
+        self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int, **_
+    ) -> Dict:
+        self._count("ChangeMessageVisibility")
+        with self._lock:
+            queue = self._queue(QueueUrl, "ChangeMessageVisibility")
+            self._change_one(
+                queue, ReceiptHandle, VisibilityTimeout, "ChangeMessageVisibility"
+            )
+        return {}
+
+    def change_message_visibility_batch(
+        self, QueueUrl: str, Entries: List[Dict[str, Any]], **_
+    ) -> Dict[str, Any]:
+        self._count("ChangeMessageVisibilityBatch")
+        self._check_batch(Entries, "ChangeMessageVisibilityBatch")
+        return self._batch(
+            QueueUrl,
+            Entries,
+            "ChangeMessageVisibilityBatch",
+            lambda q, e: self._change_one(
+                q,
+                e["ReceiptHandle"],
+                e["VisibilityTimeout"],
+                "ChangeMessageVisibilityBatch",
+            ),
+        )
+
+    def _batch(
+        self, url: str, entries: List[Dict[str, Any]], operation: str, apply
+    ) -> Dict[str, Any]:
+        successful, failed = [], []
+        with self._lock:
+            queue = self._queue(url, operation)
+            self._refresh(queue, self._clock())
+            for entry in entries:
+                try:
+                    apply(queue, entry)
+                except ClientError as e:
+                    error = e.response["Error"]
+                    failed.append(
+                        {
+                            "Id": entry["Id"],
+                            "SenderFault": True,
+                            "Code": error["Code"],
+                            "Message": error["Message"],
+                        }
+                    )
+                else:
+                    successful.append({"Id": entry["Id"]})
+        return {"Successful": successful, "Failed": failed}
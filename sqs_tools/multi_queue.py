@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .consumer import MAX_BATCH_SIZE, AsyncConsumer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueueSpec:
+    """
+    One queue served by a :class:`MultiQueueConsumer`.
+
+    ``weight`` is its share of receives while every queue is busy,
+    ``max_concurrency`` caps its messages in flight, and ``handler``
+    overrides the consumer-wide handler for its messages.
+    """
+
+    url: str
+    weight: float = 1.0
+    max_concurrency: Optional[int] = None
+    handler: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+
+@dataclass
+class QueueState:
+    spec: QueueSpec
+    vtime: float = 0.0
+    activity: float = 1.0
+    in_flight: int = 0
+    empty_streak: int = 0
+    backoff_until: float = 0.0
+    receives: int = 0
+    received: int = 0
+    empty_receives: int = 0
+
+    @property
+    def url(self) -> str:
+        return self.spec.url
+
+    @property
+    def room(self) -> int:
+        if self.spec.max_concurrency is None:
+            return MAX_BATCH_SIZE
+        return max(0, min(MAX_BATCH_SIZE, self.spec.max_concurrency - self.in_flight))
+
+
+class WeightedQueueScheduler:
+    """
+    Decides which queue the next receive goes to.
+
+    Stride scheduling: each receive advances the queue's virtual time by
+    ``1 / effective weight`` and the eligible queue furthest behind goes
+    next. The effective weight is the configured weight times how full its
+    recent receives came back (an average of received / requested, floored at
+    ``min_share``), so share drifts from queues that return little to queues
+    that return full batches. A queue whose receive comes back empty is also
+    skipped entirely for ``min_backoff`` seconds, doubling per consecutive
+    empty receive up to ``max_backoff``. Queues at their ``max_concurrency``
+    are skipped until messages are released.
+    """
+
+    def __init__(
+        self,
+        specs: Sequence[QueueSpec],
+        min_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+        smoothing: float = 0.3,
+        min_share: float = 0.05,
+    ):
+        if not specs:
+            raise ValueError("at least one queue is required")
+        for spec in specs:
+            if spec.weight <= 0:
+                raise ValueError(f"weight for {spec.url} must be positive")
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.smoothing = smoothing
+        self.min_share = min_share
+        self.queues = [QueueState(spec) for spec in specs]
+        self._floor = 0.0
+
+    def effective_weight(self, state: QueueState) -> float:
+        return state.spec.weight * max(state.activity, self.min_share)
+
+    def next(self, now: float) -> Optional[QueueState]:
+        """The eligible queue to receive from next, or ``None`` if none is."""
+        eligible = [q for q in self.queues if now >= q.backoff_until and q.room > 0]
+        if not eligible:
+            return None
+        # A queue back from backoff starts level with the rest, not with a
+        # backlog of virtual time that would let it monopolise the pollers.
+        for state in eligible:
+            state.vtime = max(state.vtime, self._floor)
+        state = min(eligible, key=lambda q: q.vtime)
+        self._floor = state.vtime
+        state.vtime += 1 / self.effective_weight(state)
+        return state
+
+    def wait_hint(self, now: float) -> float:
+        """Seconds until some queue leaves backoff (0 if one is only full)."""
+        waits = [q.backoff_until - now for q in self.queues if q.room > 0]
+        return max(0.0, min(waits)) if waits else 0.0
+
+    def record(self, state: QueueState, requested: int, received: int, now: float):
+        state.receives += 1
+        state.received += received
+        fill = received / requested if requested else 0.0
+        state.activity += self.smoothing * (fill - state.activity)
+        if received:
+            state.empty_streak = 0
+            state.backoff_until = 0.0
+            return
+        state.empty_receives += 1
+        state.empty_streak += 1
+        state.backoff_until = now + min(
+            self.min_backoff * 2 ** (state.empty_streak - 1), self.max_backoff
+        )
+
+
+class MultiQueueConsumer(AsyncConsumer):
+    """
+    One :class:`AsyncConsumer` fleet serving several queues.
+
+    The ``pollers`` share a :class:`WeightedQueueScheduler` that picks the
+    queue for every receive, and the consumer-wide ``max_in_flight`` budget;
+    each queue can additionally be capped with ``QueueSpec.max_concurrency``.
+    Messages are acked on the queue they came from, and ``.fifo`` queues keep
+    per-group ordering. Receives use a short ``wait_time_seconds`` so a poller
+    is not parked on one empty queue while another has work.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queues: Sequence[QueueSpec],
+        handler: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        pollers: int = 4,
+        max_in_flight: int = 100,
+        wait_time_seconds: int = 1,
+        min_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+        **kwargs,
+    ):
+        if kwargs.get("heartbeat") is not None:
+            raise ValueError("a VisibilityHeartbeat is bound to a single queue")
+        if handler is None and any(spec.handler is None for spec in queues):
+            raise ValueError("every queue needs a handler when no default is given")
+        self.scheduler = WeightedQueueScheduler(
+            queues, min_backoff=min_backoff, max_backoff=max_backoff
+        )
+        super().__init__(
+            sqs_client,
+            queues[0].url,
+            handler,
+            pollers=pollers,
+            max_in_flight=max_in_flight,
+            wait_time_seconds=wait_time_seconds,
+            ordered=False,
+            **kwargs,
+        )
+        self._origin: Dict[str, QueueState] = {}
+
+    @property
+    def queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            state.url: {
+                "receives": state.receives,
+                "received": state.received,
+                "empty_receives": state.empty_receives,
+                "in_flight": state.in_flight,
+                "effective_weight": self.scheduler.effective_weight(state),
+            }
+            for state in self.scheduler.queues
+        }
+
+    def _state(self, message: Dict[str, Any]) -> QueueState:
+        return self._origin[message["ReceiptHandle"]]
+
+    def _queue_url_for(self, message: Dict[str, Any]) -> str:
+        return self._state(message).url
+
+    def _handler_for(self, message: Dict[str, Any]) -> Callable[[Dict[str, Any]], Any]:
+        return self._state(message).spec.handler or self.handler
+
+    def _group_key(self, message: Dict[str, Any]) -> Optional[Hashable]:
+        url = self._queue_url_for(message)
+        if not url.endswith(".fifo"):
+            return None
+        return (url, message.get("Attributes", {}).get("MessageGroupId"))
+
+    async def _release(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            state = self._origin.pop(message["ReceiptHandle"], None)
+            if state is not None:
+                state.in_flight -= 1
+        await super()._release(messages)
+
+    async def _idle(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            if self._retire_poller():
+                return
+            now = self._loop.time()
+            state = self.scheduler.next(now)
+            if state is None:
+                # Everything is backing off or full; nap until that changes.
+                await self._idle(min(max(self.scheduler.wait_hint(now), 0.05), 1.0))
+                continue
+            wanted = state.room
+            state.in_flight += wanted
+            granted = await self._budget.acquire(wanted)
+            state.in_flight -= wanted - granted
+            if self._stop.is_set():
+                state.in_flight -= granted
+                await self._budget.release(granted)
+                break
+            kwargs = self._receive_kwargs(granted)
+            kwargs["QueueUrl"] = state.url
+            try:
+                response = await self._call(self.sqs.receive_message, **kwargs)
+            except (ClientError, BotoCoreError) as e:
+                state.in_flight -= granted
+                await self._budget.release(granted)
+                self.scheduler.record(state, granted, 0, self._loop.time())
+                logger.error("Receive from %s failed: %s", state.url, e)
+                continue
+            messages = response.get("Messages", [])
+            self.stats.receives += 1
+            state.in_flight -= granted - len(messages)
+            await self._budget.release(granted - len(messages))
+            self.scheduler.record(state, granted, len(messages), self._loop.time())
+            if not messages:
+                self.stats.empty_receives += 1
+                continue
+            self.stats.received += len(messages)
+            for message in messages:
+                self._origin[message["ReceiptHandle"]] = state
+                self._spawn(message)
+
+
+def run_multi_queue_consumer(
+    sqs_client, queues: Sequence[QueueSpec], handler=None, **kwargs
+):
+    """Blocking helper for scripts: run a :class:`MultiQueueConsumer` until interrupted."""
+    consumer = MultiQueueConsumer(sqs_client, queues, handler, **kwargs)
+    try:
+        return asyncio.run(consumer.run())
+    except KeyboardInterrupt:
+        return consumer.stats
@@ -0,0 +1,172 @@
+"""
+The plain send, receive and delete calls the example scripts make, with the
+retry policy they share. :mod:`sqs_tools.benchmark` runs these same functions,
+so its numbers describe what the scripts do.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import EntryResult, reconcile_batch
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.1
+
+
+def send_message_with_retry(
+    sqs_client,
+    queue_url: str,
+    body: str,
+    max_attempts: int = MAX_ATTEMPTS,
+    base_delay: float = BASE_DELAY,
+    rate_controller=None,
+    **params,
+) -> EntryResult:
+    """
+    ``send_message`` one body, retrying throttles the way
+    :func:`reconcile_batch` retries a batch. Extra ``params`` (message
+    attributes, FIFO ids) are passed through.
+    """
+
+    def send(QueueUrl, Entries):
+        entry = dict(Entries[0])
+        entry_id = entry.pop("Id")
+        response = sqs_client.send_message(QueueUrl=QueueUrl, **entry)
+        return {"Successful": [dict(response, Id=entry_id)]}
+
+    entry = dict(params, Id="0", MessageBody=body)
+    return reconcile_batch(
+        send,
+        queue_url,
+        [entry],
+        max_attempts=max_attempts,
+        base_delay=base_delay,
+        rate_controller=rate_controller,
+    )["0"]
+
+
+def send_batch_with_retry(
+    sqs_client,
+    queue_url: str,
+    bodies: Sequence[Any],
+    max_attempts: int = MAX_ATTEMPTS,
+    base_delay: float = BASE_DELAY,
+    rate_controller=None,
+    codec=None,
+    message_attributes: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Dict[str, EntryResult]:
+    """
+    Send up to 10 ``bodies`` in one ``send_message_batch`` and retry only
+    the entries that failed. Entry ids are the bodies' positions. With a
+    ``codec`` each body is encoded (and tagged) by it first.
+    """
+    params = {"MessageAttributes": message_attributes} if message_attributes else {}
+    if codec is None:
+        entries = [
+            dict(params, Id=str(i), MessageBody=body) for i, body in enumerate(bodies)
+        ]
+    else:
+        entries = [
+            codec.encode_entry(body, Id=str(i), **params)
+            for i, body in enumerate(bodies)
+        ]
+    return reconcile_batch(
+        sqs_client.send_message_batch,
+        queue_url,
+        entries,
+        max_attempts=max_attempts,
+        base_delay=base_delay,
+        rate_controller=rate_controller,
+    )
+
+
+def receive_batch(
+    sqs_client,
+    queue_url: str,
+    wait_time_seconds: int = 10,
+    visibility_timeout: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Long-poll up to 10 messages with all their attributes."""
+    params: Dict[str, Any] = {}
+    if visibility_timeout is not None:
+        params["VisibilityTimeout"] = visibility_timeout
+    response = sqs_client.receive_message(
+        QueueUrl=queue_url,
+        MaxNumberOfMessages=10,
+        WaitTimeSeconds=wait_time_seconds,
+        MessageAttributeNames=["All"],
+        **params,
+    )
+    return response.get("Messages", [])
+
+
+def delete_batch(
+    sqs_client,
+    queue_url: str,
+    messages: Sequence[Dict[str, Any]],
+    max_attempts: int = MAX_ATTEMPTS,
+    base_delay: float = BASE_DELAY,
+) -> Dict[str, EntryResult]:
+    """Delete up to 10 received messages, keyed by ``MessageId``."""
+    entries = [
+        {"Id": m["MessageId"], "ReceiptHandle": m["ReceiptHandle"]} for m in messages
+    ]
+    return reconcile_batch(
+        sqs_client.delete_message_batch,
+        queue_url,
+        entries,
+        max_attempts=max_attempts,
+        base_delay=base_delay,
+    )
+
+
+def consume_loop(
+    sqs_client,
+    queue_url: str,
+    handler: Callable[[Dict[str, Any]], Any],
+    stop: threading.Event,
+    wait_time_seconds: int = 10,
+    visibility_timeout: Optional[int] = None,
+) -> None:
+    """
+    Receive, handle and delete one batch at a time until ``stop`` is set.
+    Messages whose handler raised are left to reappear after their
+    visibility timeout.
+    """
+    while not stop.is_set():
+        try:
+            messages = receive_batch(
+                sqs_client, queue_url, wait_time_seconds, visibility_timeout
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Receive from %s failed: %s", queue_url, e)
+            stop.wait(1)
+            continue
+        handled = []
+        for message in messages:
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Handler failed for %s", message.get("MessageId"))
+            else:
+                handled.append(message)
+        if not handled:
+            continue
+        try:
+            results = delete_batch(sqs_client, queue_url, handled)
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Delete batch on %s failed: %s", queue_url, e)
+            continue
+        for result in results.values():
+            if not result.ok:
+                logger.warning(
+                    "Delete failed for %s: %s %s",
+                    result.id,
+                    result.code,
+                    result.message,
+                )
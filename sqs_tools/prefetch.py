@@ -0,0 +1,357 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .ack_batcher import AckBatcher
+from .consumer import MAX_BATCH_SIZE, ConsumerStats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Batch:
+    """One receive's worth of messages plus when it was received and picked up."""
+
+    messages: List[Dict[str, Any]]
+    received_at: float
+    started_at: Optional[float] = None
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+
+@dataclass
+class PrefetchStats:
+    batches: int = 0
+    messages: int = 0
+    empty_receives: int = 0
+    expired: int = 0
+    idle_seconds: float = 0.0
+    peak_depth: int = 0
+
+
+class PrefetchBuffer:
+    """
+    Receives batches in the background so the next one is ready when a
+    worker finishes the current one.
+
+    ``receive`` is called with no arguments and returns a list of messages
+    (``None`` or empty when there is nothing). Up to :attr:`depth` batches are
+    kept buffered or being received, with receives running in parallel on
+    ``fetchers`` threads (``max_depth`` by default). The depth adapts: it grows
+    until a receive round trip is hidden behind the time ``consumers`` workers
+    take to work through the buffer, and shrinks so buffered messages are still
+    processed within ``safety`` of their ``visibility_timeout``. A batch that
+    has waited so long that it would expire before it could be processed is
+    dropped instead of handed out; SQS redelivers it.
+
+    Workers call :meth:`get` and then :meth:`task_done` with the same batch so
+    the buffer can learn how long a batch takes.
+    """
+
+    def __init__(
+        self,
+        receive: Callable[[], Optional[List[Dict[str, Any]]]],
+        visibility_timeout: float = 30,
+        consumers: int = 1,
+        fetchers: Optional[int] = None,
+        min_depth: int = 1,
+        max_depth: int = 8,
+        safety: float = 0.5,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= min_depth <= max_depth:
+            raise ValueError("expected 1 <= min_depth <= max_depth")
+        self._receive = receive
+        self.visibility_timeout = visibility_timeout
+        self.consumers = consumers
+        self.fetchers = fetchers or max_depth
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.safety = safety
+        self.smoothing = smoothing
+        self.stats = PrefetchStats(peak_depth=min_depth)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._buffer: Deque[Batch] = deque()
+        self._fetching = 0
+        self._receive_time: Optional[float] = None
+        self._batch_time: Optional[float] = None
+        self._depth = min_depth
+        self._stopped = True
+        self._threads: List[threading.Thread] = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def depth(self) -> int:
+        """Current target number of batches to hold (buffered plus in flight)."""
+        return self._depth
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        with self._cond:
+            if not self._stopped:
+                return
+            self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._fetch_loop, name=f"prefetch-{i}", daemon=True)
+            for i in range(self.fetchers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop fetching. Batches still buffered are returned by :meth:`get` until
+        it runs dry; they were received, so they should still be processed.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Batch]:
+        """Next batch, or ``None`` once stopped and drained or after ``timeout``."""
+        waited_from = self._clock()
+        deadline = None if timeout is None else waited_from + timeout
+        with self._cond:
+            while True:
+                batch = self._pop_fresh()
+                if batch is not None:
+                    now = self._clock()
+                    self.stats.idle_seconds += now - waited_from
+                    batch.started_at = now
+                    self._cond.notify_all()
+                    return batch
+                if self._stopped and not self._fetching:
+                    return None
+                remaining = None if deadline is None else deadline - self._clock()
+                if remaining is not None and remaining <= 0:
+                    self.stats.idle_seconds += self._clock() - waited_from
+                    return None
+                self._cond.wait(remaining)
+
+    def task_done(self, batch: Batch) -> None:
+        """Record how long ``batch`` took, to size the prefetch depth."""
+        if batch.started_at is None:
+            return
+        elapsed = self._clock() - batch.started_at
+        with self._cond:
+            self._batch_time = self._average(self._batch_time, elapsed)
+            self._resize()
+
+    def _pop_fresh(self) -> Optional[Batch]:
+        # Drop batches that would run past their visibility timeout if started now.
+        budget = self.visibility_timeout - (self._batch_time or 0.0)
+        now = self._clock()
+        while self._buffer:
+            batch = self._buffer.popleft()
+            if now - batch.received_at < budget:
+                return batch
+            self.stats.expired += len(batch)
+            logger.warning(
+                "Dropping %d prefetched messages that waited %.1fs",
+                len(batch),
+                now - batch.received_at,
+            )
+        return None
+
+    def _average(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def _resize(self) -> None:
+        if self._batch_time is None or self._receive_time is None:
+            return
+        per_batch = max(self._batch_time / self.consumers, 1e-6)
+        # Little's law: enough batches queued to cover one receive round trip.
+        wanted = math.ceil(self._receive_time / per_batch) + 1
+        # The last buffered batch must still start well inside its visibility timeout.
+        limit = math.floor(
+            (self.visibility_timeout * self.safety - self._batch_time) / per_batch
+        )
+        depth = max(self.min_depth, min(self.max_depth, wanted, limit))
+        if depth != self._depth:
+            self._depth = depth
+            self.stats.peak_depth = max(self.stats.peak_depth, depth)
+            self._cond.notify_all()
+
+    def _fetch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while (
+                    not self._stopped
+                    and len(self._buffer) + self._fetching >= self._depth
+                ):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._fetching += 1
+            started = self._clock()
+            try:
+                messages = self._receive() or []
+            except Exception:
+                logger.exception("Prefetch receive failed")
+                messages = []
+                time.sleep(1)
+            now = self._clock()
+            with self._cond:
+                self._fetching -= 1
+                if messages:
+                    self._receive_time = self._average(
+                        self._receive_time, now - started
+                    )
+                    self._buffer.append(Batch(messages, received_at=started))
+                    self.stats.batches += 1
+                    self.stats.messages += len(messages)
+                    self._resize()
+                else:
+                    self.stats.empty_receives += 1
+                self._cond.notify_all()
+
+
+class PipelinedConsumer:
+    """
+    Thread-based receive / process / delete loop with the next receive
+    already in flight.
+
+    ``workers`` threads each take a prefetched batch, run ``handler`` on every
+    message in it and hand each success to a shared :class:`AckBatcher`, then
+    immediately take the next batch. Handlers that raise leave their message for
+    redelivery. Suited to plain synchronous handlers such as the scripts'
+    ``process_message``; :class:`AsyncConsumer` is the per-message variant.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        handler: Callable[[Dict[str, Any]], Any],
+        workers: int = 4,
+        visibility_timeout: int = 30,
+        wait_time_seconds: int = 10,
+        max_depth: int = 8,
+        fetchers: Optional[int] = None,
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.handler = handler
+        self.workers = workers
+        self.visibility_timeout = visibility_timeout
+        self.wait_time_seconds = wait_time_seconds
+        self.stats = ConsumerStats()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.buffer = PrefetchBuffer(
+            self._receive,
+            visibility_timeout=visibility_timeout,
+            consumers=workers,
+            fetchers=fetchers,
+            max_depth=max_depth,
+        )
+
+    def _receive(self) -> List[Dict[str, Any]]:
+        try:
+            response = self.sqs.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=MAX_BATCH_SIZE,
+                WaitTimeSeconds=self.wait_time_seconds,
+                VisibilityTimeout=self.visibility_timeout,
+                MessageAttributeNames=["All"],
+                AttributeNames=["All"],
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Receive from %s failed: %s", self.queue_url, e)
+            time.sleep(1)
+            return []
+        messages = response.get("Messages", [])
+        self._count(received=len(messages), empty_receives=0 if messages else 1)
+        return messages
+
+    def _count(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self.stats, name, getattr(self.stats, name) + count)
+
+    def run(self) -> ConsumerStats:
+        """Consume until :meth:`stop` is called, then drain and return the stats."""
+        with AckBatcher(
+            self.sqs,
+            self.queue_url,
+            visibility_timeout=self.visibility_timeout,
+            max_concurrent=self.workers,
+            on_deleted=lambda deleted: self._count(deleted=len(deleted)),
+        ) as acks:
+            self.buffer.start()
+            threads = [
+                threading.Thread(target=self._work, args=(acks,), name=f"pipeline-{i}")
+                for i in range(self.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            self._stop.wait()
+            self.buffer.stop()
+            for thread in threads:
+                thread.join()
+        return self.stats
+
+    def stop(self) -> None:
+        """Stop receiving; already buffered batches are still processed."""
+        self._stop.set()
+
+    def _work(self, acks: AckBatcher) -> None:
+        while True:
+            batch = self.buffer.get()
+            if batch is None:
+                return
+            # Acks are deleted in full batches across all workers, most urgent first.
+            deadline = batch.received_at + self.visibility_timeout
+            processed = 0
+            for message in batch:
+                try:
+                    self.handler(message)
+                except Exception:
+                    logger.exception(
+                        "Handler failed for message %s", message.get("MessageId")
+                    )
+                    self._count(failed=1)
+                    continue
+                processed += 1
+                acks.ack(message, deadline=deadline)
+            self._count(processed=processed)
+            self.buffer.task_done(batch)
+
+
+def run_pipelined(sqs_client, queue_url: str, handler, **kwargs) -> ConsumerStats:
+    """Blocking helper for scripts: run a :class:`PipelinedConsumer` until interrupted."""
+    consumer = PipelinedConsumer(sqs_client, queue_url, handler, **kwargs)
+    thread = threading.Thread(target=consumer.run)
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+    except KeyboardInterrupt:
+        consumer.stop()
+        thread.join()
+    return consumer.stats
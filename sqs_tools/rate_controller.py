@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Callable
+
+THROTTLE_ERROR_CODES = ("Throttling", "ThrottlingException", "RequestThrottled")
+
+
+class AdaptiveRateController:
+    """
+    AIMD token bucket shared by every sender thread.
+
+    Each send calls :meth:`acquire` with the number of messages it is about to
+    send. Until the first throttle nothing is paced: the controller only
+    measures the rate actually sent, so an unthrottled loader runs at full
+    speed. The first throttle starts pacing at that measured rate (or
+    ``initial_rate`` if none was measured yet) times ``decrease_factor``;
+    ``pace_before_throttle`` paces from ``initial_rate`` from the start.
+
+    Once pacing, each send waits for the current rate. Successful sends
+    additively raise it by ``increase_step`` messages/s at most once per
+    ``increase_interval``; a throttle halves it (``decrease_factor``). Throttles
+    that land within ``decrease_cooldown`` of the last cut are treated as the
+    same congestion event, so 200 threads hitting the limit together cut the
+    rate once instead of 200 times.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 300.0,
+        min_rate: float = 10.0,
+        max_rate: float = 30_000.0,
+        increase_step: float = 50.0,
+        increase_interval: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        burst_seconds: float = 0.25,
+        pace_before_throttle: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if not 0 < min_rate <= initial_rate <= max_rate:
+            raise ValueError("expected 0 < min_rate <= initial_rate <= max_rate")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.increase_interval = increase_interval
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.burst_seconds = burst_seconds
+        self.pacing = pace_before_throttle
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._rate = float(initial_rate)
+        now = clock()
+        self._tokens = self._capacity()
+        self._last_refill = now
+        self._last_increase = now
+        self._last_decrease = float("-inf")
+        self._window_start = now
+        self._window_tokens = 0
+        self.throttles = 0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _capacity(self) -> float:
+        return max(self._rate * self.burst_seconds, 1.0)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self._capacity(), self._tokens + elapsed * self._rate)
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Block until ``tokens`` messages may be sent; returns the seconds waited.
+
+        Tokens are reserved up front (the bucket may go negative) so waiting
+        threads are served in arrival order rather than racing on wake-up.
+        """
+        with self._lock:
+            now = self._clock()
+            if not self.pacing:
+                self._measure(now, tokens)
+                return 0.0
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def _measure(self, now: float, tokens: int) -> None:
+        self._window_tokens += tokens
+        elapsed = now - self._window_start
+        if elapsed >= self.increase_interval:
+            self._rate = self._clamp(self._window_tokens / elapsed)
+            self._window_start = now
+            self._window_tokens = 0
+
+    def _clamp(self, rate: float) -> float:
+        return max(self.min_rate, min(self.max_rate, rate))
+
+    def on_success(self) -> None:
+        with self._lock:
+            if not self.pacing:
+                return
+            now = self._clock()
+            if now - self._last_increase >= self.increase_interval:
+                self._last_increase = now
+                self._refill(now)
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.throttles += 1
+            now = self._clock()
+            if not self.pacing:
+                # Start pacing from what was really being sent when it happened.
+                elapsed = now - self._window_start
+                if elapsed >= 0.1 * self.increase_interval and self._window_tokens:
+                    self._rate = self._clamp(self._window_tokens / elapsed)
+                self.pacing = True
+                self._tokens = 0.0
+                self._last_refill = now
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            self._last_increase = now
+            self._refill(now)
+            self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+            self._tokens = min(self._tokens, self._capacity())
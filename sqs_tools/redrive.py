@@ -0,0 +1,371 @@
+"""
+Drain or inspect a dead-letter queue.
+
+Example::
+
+    python -m sqs_tools.redrive DLQ_URL --to SOURCE_URL --body-pattern 'timeout' \\
+        --attribute Attribute1=Value1 --pollers 32 [--dry-run]
+"""
+
+import argparse
+import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .batch_reconciler import reconcile_batch
+from .dedup import deduplication_id_for
+from .rate_controller import AdaptiveRateController
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 10
+
+
+def message_filter(
+    attributes: Optional[Dict[str, str]] = None,
+    body_pattern: Optional[str] = None,
+) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Build a predicate matching messages whose message attributes equal every
+    ``attributes`` value and whose body contains ``body_pattern`` (a regex).
+    With neither, every message matches.
+    """
+    attributes = dict(attributes or {})
+    pattern = re.compile(body_pattern) if body_pattern else None
+
+    def match(message: Dict[str, Any]) -> bool:
+        present = message.get("MessageAttributes", {})
+        for name, value in attributes.items():
+            if present.get(name, {}).get("StringValue") != value:
+                return False
+        return pattern is None or pattern.search(message["Body"]) is not None
+
+    return match
+
+
+def redrive_entry(message: Dict[str, Any], entry_id: str, fifo: bool) -> Dict[str, Any]:
+    """``send_message_batch`` entry that re-sends a received message unchanged."""
+    entry: Dict[str, Any] = {"Id": entry_id, "MessageBody": message["Body"]}
+    attributes = {}
+    for name, value in message.get("MessageAttributes", {}).items():
+        attributes[name] = {
+            k: v
+            for k, v in value.items()
+            if k in ("DataType", "StringValue", "BinaryValue")
+        }
+    if attributes:
+        entry["MessageAttributes"] = attributes
+    if fifo:
+        system = message.get("Attributes", {})
+        entry["MessageGroupId"] = system.get("MessageGroupId", "dlq-redrive")
+        # Keyed on the DLQ MessageId: a retry after a crash between send and
+        # delete is dropped by SQS instead of delivered twice.
+        entry["MessageDeduplicationId"] = deduplication_id_for(
+            message["Body"], key=message["MessageId"]
+        )
+    return entry
+
+
+@dataclass
+class RedriveStats:
+    received: int = 0
+    matched: int = 0
+    redriven: int = 0
+    failed: int = 0
+    deleted: int = 0
+
+
+class DLQRedriver:
+    """
+    Move messages from a dead-letter queue back to ``target_url`` in parallel.
+
+    ``pollers`` threads each receive 10 messages at a time, re-send the ones
+    ``match`` accepts with ``send_message_batch`` (keeping body, message
+    attributes and, for FIFO targets, ``MessageGroupId``) and delete only
+    those whose send succeeded. Messages that do not match, or whose send
+    failed, stay invisible for ``visibility_timeout`` so the scan does not see
+    them twice, then reappear on the DLQ untouched.
+
+    Sends and deletes share ``rate_controller``, if given, so throttling
+    slows every poller down together.
+
+    With ``dry_run`` nothing is sent or deleted; the stats count what would
+    be redriven. Every scanned message is made visible again once the scan
+    ends, though each one's receive count has still gone up by one.
+
+    A poller stops after ``idle_receives`` empty receives in a row, or once
+    ``limit`` messages have been received.
+
+    On a FIFO DLQ, a message left behind keeps the rest of its group locked
+    until its visibility timeout ends, so filter FIFO DLQs by whole groups.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        dlq_url: str,
+        target_url: Optional[str] = None,
+        match: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        pollers: int = 32,
+        dry_run: bool = False,
+        visibility_timeout: int = 600,
+        wait_time_seconds: int = 2,
+        idle_receives: int = 2,
+        limit: Optional[int] = None,
+        progress_interval: float = 5.0,
+        rate_controller=None,
+    ):
+        if target_url is None and not dry_run:
+            raise ValueError("target_url is required unless dry_run is set")
+        self.sqs = sqs_client
+        self.dlq_url = dlq_url
+        self.target_url = target_url
+        self.fifo = target_url is not None and target_url.endswith(".fifo")
+        self.match = match or message_filter()
+        self.pollers = pollers
+        self.dry_run = dry_run
+        self.visibility_timeout = visibility_timeout
+        self.wait_time_seconds = wait_time_seconds
+        self.idle_receives = idle_receives
+        self.limit = limit
+        self.progress_interval = progress_interval
+        self.rate_controller = rate_controller
+        self.stats = RedriveStats()
+        self._lock = threading.Lock()
+        self._claimed = 0
+        self._scanned: List[str] = []
+        self._started = 0.0
+        self._last_report = 0.0
+
+    def run(self) -> RedriveStats:
+        self._started = self._last_report = time.monotonic()
+        threads = [
+            threading.Thread(target=self._poll_loop, name=f"redrive-{i}")
+            for i in range(self.pollers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.dry_run:
+            self._restore_visibility()
+        self.report()
+        return self.stats
+
+    def _restore_visibility(self) -> None:
+        # The scan hid everything it received; hand it straight back.
+        handles, self._scanned = self._scanned, []
+        batches = [
+            handles[start : start + MAX_BATCH_SIZE]
+            for start in range(0, len(handles), MAX_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=self.pollers) as pool:
+            list(pool.map(self._make_visible, batches))
+
+    def _make_visible(self, handles: List[str]) -> None:
+        entries = [
+            {"Id": str(i), "ReceiptHandle": handle, "VisibilityTimeout": 0}
+            for i, handle in enumerate(handles)
+        ]
+        try:
+            results = reconcile_batch(
+                self.sqs.change_message_visibility_batch,
+                self.dlq_url,
+                entries,
+                rate_controller=self.rate_controller,
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Restoring visibility on %s failed: %s", self.dlq_url, e)
+            return
+        failed = sum(1 for result in results.values() if not result.ok)
+        if failed:
+            logger.warning(
+                "%d scanned messages stay hidden until their timeout", failed
+            )
+
+    def report(self) -> None:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        stats = self.stats
+        verb = "would redrive" if self.dry_run else "redriven"
+        print(
+            f"{stats.received} received, {stats.matched} matched, "
+            f"{stats.redriven} {verb}, {stats.failed} failed "
+            f"({stats.received / elapsed:.0f} messages/s, {elapsed:.1f}s elapsed)"
+        )
+
+    def _update(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self.stats, name, getattr(self.stats, name) + count)
+            now = time.monotonic()
+            if now - self._last_report < self.progress_interval:
+                return
+            self._last_report = now
+        self.report()
+
+    def _claim(self) -> int:
+        # Reserve receive slots up front so parallel pollers cannot overshoot limit.
+        if self.limit is None:
+            return MAX_BATCH_SIZE
+        with self._lock:
+            wanted = max(0, min(MAX_BATCH_SIZE, self.limit - self._claimed))
+            self._claimed += wanted
+            return wanted
+
+    def _unclaim(self, count: int) -> None:
+        if self.limit is not None and count:
+            with self._lock:
+                self._claimed -= count
+
+    def _poll_loop(self) -> None:
+        idle = 0
+        while idle < self.idle_receives:
+            wanted = self._claim()
+            if wanted == 0:
+                return
+            try:
+                response = self.sqs.receive_message(
+                    QueueUrl=self.dlq_url,
+                    MaxNumberOfMessages=wanted,
+                    WaitTimeSeconds=self.wait_time_seconds,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=["All"],
+                    MessageAttributeNames=["All"],
+                )
+            except (ClientError, BotoCoreError) as e:
+                logger.error("Receive from %s failed: %s", self.dlq_url, e)
+                self._unclaim(wanted)
+                idle += 1
+                continue
+            messages = response.get("Messages", [])
+            self._unclaim(wanted - len(messages))
+            if not messages:
+                idle += 1
+                continue
+            idle = 0
+            matched = [message for message in messages if self.match(message)]
+            if self.dry_run:
+                with self._lock:
+                    self._scanned.extend(m["ReceiptHandle"] for m in messages)
+            if self.dry_run or not matched:
+                self._update(
+                    received=len(messages),
+                    matched=len(matched),
+                    redriven=len(matched) if self.dry_run else 0,
+                )
+                continue
+            sent, failed = self._send(matched)
+            deleted = self._delete(sent)
+            self._update(
+                received=len(messages),
+                matched=len(matched),
+                redriven=len(sent),
+                failed=failed,
+                deleted=deleted,
+            )
+
+    def _send(self, messages: List[Dict[str, Any]]):
+        entries = [
+            redrive_entry(message, str(i), self.fifo)
+            for i, message in enumerate(messages)
+        ]
+        try:
+            results = reconcile_batch(
+                self.sqs.send_message_batch,
+                self.target_url,
+                entries,
+                rate_controller=self.rate_controller,
+            )
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Send to %s failed: %s", self.target_url, e)
+            return [], len(messages)
+        sent = []
+        for result in results.values():
+            if result.ok:
+                sent.append(messages[int(result.id)])
+            else:
+                logger.warning(
+                    "Redrive of %s failed: %s %s",
+                    messages[int(result.id)]["MessageId"],
+                    result.code,
+                    result.message,
+                )
+        return sent, len(messages) - len(sent)
+
+    def _delete(self, messages: List[Dict[str, Any]]) -> int:
+        if not messages:
+            return 0
+        entries = [
+            {"Id": str(i), "ReceiptHandle": message["ReceiptHandle"]}
+            for i, message in enumerate(messages)
+        ]
+        try:
+            results = reconcile_batch(
+                self.sqs.delete_message_batch,
+                self.dlq_url,
+                entries,
+                rate_controller=self.rate_controller,
+            )
+        except (ClientError, BotoCoreError) as e:
+            # Already re-sent; the copy left on the DLQ reappears after the timeout.
+            logger.error("Delete from %s failed: %s", self.dlq_url, e)
+            return 0
+        return sum(1 for result in results.values() if result.ok)
+
+
+def redrive(sqs_client, dlq_url: str, target_url: Optional[str] = None, **kwargs):
+    """Run a :class:`DLQRedriver` to completion and return its stats."""
+    return DLQRedriver(sqs_client, dlq_url, target_url, **kwargs).run()
+
+
+def _attribute(text: str):
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE")
+    return name, value
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .clients import get_client
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dlq_url")
+    parser.add_argument("--to", dest="target_url", help="queue to redrive into")
+    parser.add_argument("--attribute", type=_attribute, action="append", default=[])
+    parser.add_argument("--body-pattern")
+    parser.add_argument("--pollers", type=int, default=32)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--visibility-timeout", type=int, default=600)
+    parser.add_argument("--dry-run", action="store_true", help="only count matches")
+    parser.add_argument("--region")
+    args = parser.parse_args(argv)
+    if args.target_url is None and not args.dry_run:
+        parser.error("--to is required unless --dry-run is given")
+
+    # Throttles go to the shared controller instead of per-thread botocore retries.
+    sqs = get_client(
+        "sqs", region_name=args.region, max_workers=args.pollers, max_attempts=1
+    )
+    stats = redrive(
+        sqs,
+        args.dlq_url,
+        args.target_url,
+        match=message_filter(dict(args.attribute), args.body_pattern),
+        pollers=args.pollers,
+        dry_run=args.dry_run,
+        visibility_timeout=args.visibility_timeout,
+        limit=args.limit,
+        rate_controller=AdaptiveRateController(),
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
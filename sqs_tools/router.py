@@ -0,0 +1,296 @@
+import json
+import logging
+import threading
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from botocore.exceptions import ClientError
+
+from .batch_reconciler import reconcile_batch
+from .dedup import deduplication_id_for
+from .fifo_groups import group_id_for
+from .send_buffer import MAX_BATCH_BYTES, MAX_BATCH_ENTRIES, entry_size
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingTable:
+    """
+    Status to destination queue URL(s), resolved once up front.
+
+    ``routes`` maps a status to one URL or a list of URLs (a fan-out);
+    statuses are matched case-insensitively. Records whose status has no
+    route go to ``default``, or nowhere if it is ``None``.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Union[str, Sequence[str]]],
+        default: Optional[Union[str, Sequence[str]]] = None,
+    ):
+        self._routes: Dict[str, Tuple[str, ...]] = {
+            str(status).lower(): self._urls(urls) for status, urls in routes.items()
+        }
+        self._default = self._urls(default) if default is not None else ()
+
+    @staticmethod
+    def _urls(urls: Union[str, Sequence[str]]) -> Tuple[str, ...]:
+        return (urls,) if isinstance(urls, str) else tuple(urls)
+
+    @property
+    def destinations(self) -> List[str]:
+        urls = {url for route in self._routes.values() for url in route}
+        return sorted(urls.union(self._default))
+
+    def lookup(self, status: Any) -> Tuple[str, ...]:
+        if status is None:
+            return self._default
+        return self._routes.get(str(status).lower(), self._default)
+
+
+@dataclass
+class RouteFailure:
+    record: Dict[str, Any]
+    queue_url: Optional[str]
+    code: str
+    message: str = ""
+
+
+@dataclass
+class RouteResult:
+    records: int = 0
+    sent: int = 0
+    batches: int = 0
+    unrouted: int = 0
+    failures: List[RouteFailure] = field(default_factory=list)
+
+
+class StatusRouter:
+    """
+    Fan a batch of status-change records out to per-status queues.
+
+    :meth:`route` looks each record's ``status_field`` up in a
+    :class:`RoutingTable`, buffers one entry per destination, cuts every
+    destination's buffer into ``send_message_batch`` calls of up to 10
+    entries and 256 KiB, and sends all of them on ``max_workers`` threads, so
+    10,000 changes cost about 1,000 calls running in parallel. Entries SQS
+    reports as failed are retried by :func:`reconcile_batch`; what still
+    fails is returned with its record.
+
+    For ``.fifo`` destinations the ``MessageGroupId`` comes from
+    ``group_field`` (the document id by default). Their entries are split
+    into lanes by group, and each lane sends its batches one after another,
+    and carries at most one change per document, so each document's changes
+    keep their order even when SQS fails part of a batch; after a failed
+    change, later changes for the same document are returned as
+    ``GroupBlocked`` instead of sent.
+
+    The FIFO deduplication id is keyed on the record's ``dedup_field`` (a
+    change or event id) when it has one. Otherwise it is keyed on the body
+    and how many identical bodies came before it in the same :meth:`route`
+    call, so repeated identical changes are all delivered while routing the
+    same records again inside the 5-minute window is still deduplicated.
+
+    With a ``rate_controller``, give the router a client built with
+    ``max_attempts=1`` (see :func:`~sqs_tools.clients.client_config`) so
+    throttles reach the controller instead of being retried per thread.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        table: RoutingTable,
+        status_field: str = "status",
+        group_field: str = "document_id",
+        dedup_field: Optional[str] = "change_id",
+        serialize: Callable[[Dict[str, Any]], str] = json.dumps,
+        max_workers: int = 16,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        rate_controller=None,
+    ):
+        self.sqs = sqs_client
+        self.table = table
+        self.status_field = status_field
+        self.group_field = group_field
+        self.dedup_field = dedup_field
+        self.serialize = serialize
+        self.max_workers = max_workers
+        self.max_batch_bytes = max_batch_bytes
+        self.rate_controller = rate_controller
+
+    def _entry(
+        self, record: Dict[str, Any], body: str, fifo: bool, repeat: int
+    ) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"MessageBody": body}
+        if fifo:
+            entry["MessageGroupId"] = group_id_for(record.get(self.group_field, ""))
+            change = record.get(self.dedup_field) if self.dedup_field else None
+            key = f"{body}#{repeat}" if change is None else str(change)
+            entry["MessageDeduplicationId"] = deduplication_id_for(body, key=key)
+        return entry
+
+    def _batches(
+        self, buffered: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> Iterable[List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        batch: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        size = 0
+        for record, entry in buffered:
+            entry_bytes = entry_size(entry)
+            if batch and (
+                len(batch) >= MAX_BATCH_ENTRIES
+                or size + entry_bytes > self.max_batch_bytes
+            ):
+                yield batch
+                batch, size = [], 0
+            batch.append((record, entry))
+            size += entry_bytes
+        if batch:
+            yield batch
+
+    def _fifo_batches(
+        self, buffered: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> Iterable[List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        # One entry per group per batch: if SQS fails one entry of a batch and
+        # accepts the rest, no later change of that group can have gone with it.
+        groups: Dict[str, deque] = {}
+        for item in buffered:
+            groups.setdefault(item[1]["MessageGroupId"], deque()).append(item)
+        ready = deque(groups.values())
+        while ready:
+            batch: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+            taken = []
+            size = 0
+            while ready and len(batch) < MAX_BATCH_ENTRIES:
+                entry_bytes = entry_size(ready[0][0][1])
+                if batch and size + entry_bytes > self.max_batch_bytes:
+                    break
+                items = ready.popleft()
+                batch.append(items.popleft())
+                size += entry_bytes
+                taken.append(items)
+            ready.extend(items for items in taken if items)
+            yield batch
+
+    def route(self, records: Iterable[Dict[str, Any]]) -> RouteResult:
+        result = RouteResult()
+        buffers: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+        repeats: Counter = Counter()
+        for record in records:
+            result.records += 1
+            urls = self.table.lookup(record.get(self.status_field))
+            if not urls:
+                result.unrouted += 1
+                continue
+            body = self.serialize(record)
+            repeat = repeats[body]
+            repeats[body] += 1
+            for url in urls:
+                entry = self._entry(record, body, url.endswith(".fifo"), repeat)
+                if entry_size(entry) > self.max_batch_bytes:
+                    result.failures.append(
+                        RouteFailure(record, url, "MessageTooLong", "over batch limit")
+                    )
+                    continue
+                buffers.setdefault(url, []).append((record, entry))
+        if result.unrouted:
+            logger.warning("%d records had no route", result.unrouted)
+
+        lock = threading.Lock()
+
+        def send(queue_url: str, batch) -> List[RouteFailure]:
+            entries = [dict(entry, Id=str(i)) for i, (_, entry) in enumerate(batch)]
+            try:
+                results = reconcile_batch(
+                    self.sqs.send_message_batch,
+                    queue_url,
+                    entries,
+                    rate_controller=self.rate_controller,
+                )
+            except Exception as e:
+                # Anything else (a dropped connection, a timeout) fails the batch too.
+                if isinstance(e, ClientError):
+                    code = e.response["Error"]["Code"]
+                    message = e.response["Error"].get("Message", "")
+                else:
+                    code, message = type(e).__name__, str(e)
+                failures = [
+                    RouteFailure(record, queue_url, code, message)
+                    for record, _ in batch
+                ]
+                sent = 0
+            else:
+                failures = [
+                    RouteFailure(batch[int(r.id)][0], queue_url, r.code, r.message)
+                    for r in results.values()
+                    if not r.ok
+                ]
+                sent = len(batch) - len(failures)
+            with lock:
+                result.batches += 1
+                result.sent += sent
+                result.failures.extend(failures)
+            return failures
+
+        def send_in_order(queue_url: str, batches) -> None:
+            # Once a group's change fails, its later changes are held back
+            # rather than overtaking it.
+            blocked = set()
+            for batch in batches:
+                ready = []
+                for record, entry in batch:
+                    if entry["MessageGroupId"] in blocked:
+                        with lock:
+                            result.failures.append(
+                                RouteFailure(record, queue_url, "GroupBlocked")
+                            )
+                    else:
+                        ready.append((record, entry))
+                if not ready:
+                    continue
+                for failure in send(queue_url, ready):
+                    blocked.add(group_id_for(failure.record.get(self.group_field, "")))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = []
+            lanes = max(1, self.max_workers // max(1, len(buffers)))
+            for url, buffered in buffers.items():
+                if url.endswith(".fifo"):
+                    # Split by group so groups send in parallel, each in order.
+                    split: Dict[int, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+                    for item in buffered:
+                        lane = zlib.crc32(item[1]["MessageGroupId"].encode()) % lanes
+                        split.setdefault(lane, []).append(item)
+                    futures.extend(
+                        pool.submit(send_in_order, url, list(self._fifo_batches(part)))
+                        for part in split.values()
+                    )
+                else:
+                    batches = list(self._batches(buffered))
+                    futures.extend(pool.submit(send, url, batch) for batch in batches)
+            wait(futures)
+            for future in futures:
+                future.result()
+        for failure in result.failures:
+            logger.error(
+                "Routing to %s failed: %s %s",
+                failure.queue_url,
+                failure.code,
+                failure.message,
+            )
+        return result
+
+
+def route_status_changes(
+    sqs_client,
+    records: Iterable[Dict[str, Any]],
+    routes: Dict[str, Union[str, Sequence[str]]],
+    **kwargs,
+) -> RouteResult:
+    """Route ``records`` once with a table built from ``routes``."""
+    default = kwargs.pop("default", None)
+    return StatusRouter(sqs_client, RoutingTable(routes, default), **kwargs).route(
+        records
+    )
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .batch_reconciler import reconcile_batch
+
+logger = logging.getLogger(__name__)
+
+# SendMessageBatch limits: 10 entries and 256 KiB summed over all entries.
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+
+class BatchEntryError(Exception):
+    """Raised through a message future when SQS lists its entry under ``Failed``."""
+
+    def __init__(self, code: str, message: str = "", sender_fault: bool = False):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+        self.sender_fault = sender_fault
+
+
+def iter_batches(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group ``records`` into lists of ``size`` lazily, without materializing them."""
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """
+    Size of one batch entry as SQS counts it against the payload limit:
+    the body plus every attribute name, data type and value.
+    """
+    size = len(entry["MessageBody"].encode("utf-8"))
+    for name, attr in entry.get("MessageAttributes", {}).items():
+        size += len(name.encode("utf-8")) + len(attr["DataType"].encode("utf-8"))
+        if "StringValue" in attr:
+            size += len(attr["StringValue"].encode("utf-8"))
+        elif "BinaryValue" in attr:
+            size += len(attr["BinaryValue"])
+    return size
+
+
+@dataclass
+class SendBufferStats:
+    messages: int = 0
+    batches: int = 0
+    failed: int = 0
+
+
+class SendBuffer:
+    """
+    Producer-side buffer that coalesces single sends into ``send_message_batch``.
+
+    :meth:`send` queues one message and returns a ``Future`` that resolves to
+    that entry's ``Successful`` record (``MessageId``, ``MD5OfMessageBody``...)
+    or raises :class:`BatchEntryError`; entries SQS reports as failed are retried
+    on their own up to ``max_attempts`` times. A batch is flushed when it holds 10
+    entries, when the next message would push it past ``max_batch_bytes``, or
+    when its oldest message has waited ``linger`` seconds. Batches are sent on a
+    small thread pool so a slow call does not hold up the next batch.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        linger: float = 0.05,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        max_concurrent_batches: int = 4,
+        max_attempts: int = 3,
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.linger = linger
+        self.max_batch_bytes = max_batch_bytes
+        self.max_attempts = max_attempts
+        self.stats = SendBufferStats()
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._pending_bytes = 0
+        self._oldest = 0.0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+        self._timer = threading.Thread(
+            target=self._linger_loop, name="send-buffer-linger", daemon=True
+        )
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(
+        self,
+        body: str,
+        message_attributes: Optional[Dict[str, Dict[str, Any]]] = None,
+        **params,
+    ) -> Future:
+        """
+        Queue ``body`` for sending. Extra keyword arguments (``MessageGroupId``,
+        ``MessageDeduplicationId``, ``DelaySeconds``...) are copied into the
+        batch entry as-is.
+        """
+        future: Future = Future()
+        entry = {"MessageBody": body, **params}
+        if message_attributes:
+            entry["MessageAttributes"] = message_attributes
+        size = entry_size(entry)
+        if size > self.max_batch_bytes:
+            future.set_exception(
+                ValueError(
+                    f"Message of {size} bytes exceeds the {self.max_batch_bytes} byte limit"
+                )
+            )
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SendBuffer is closed")
+            if self._pending and self._pending_bytes + size > self.max_batch_bytes:
+                self._dispatch_locked()
+            if not self._pending:
+                self._oldest = time.monotonic()
+                self._cond.notify()
+            self._pending.append((entry, future))
+            self._pending_bytes += size
+            if len(self._pending) >= MAX_BATCH_ENTRIES:
+                self._dispatch_locked()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Send whatever is buffered now and wait for it to complete."""
+        with self._cond:
+            futures = [future for _, future in self._pending]
+            self._dispatch_locked()
+        wait(futures, timeout=timeout)
+
+    def close(self) -> None:
+        """Flush remaining messages and stop the background threads."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._dispatch_locked()
+            self._cond.notify()
+        self._timer.join()
+        self._pool.shutdown(wait=True)
+
+    def _dispatch_locked(self) -> None:
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        self._pool.submit(self._send_batch, batch)
+
+    def _linger_loop(self) -> None:
+        with self._cond:
+            while not self._closed:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self.linger - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                else:
+                    self._dispatch_locked()
+
+    def _send_batch(self, batch: List[Tuple[Dict[str, Any], Future]]) -> None:
+        entries = [dict(entry, Id=str(i)) for i, (entry, _) in enumerate(batch)]
+        try:
+            results = reconcile_batch(
+                self.sqs.send_message_batch,
+                self.queue_url,
+                entries,
+                max_attempts=self.max_attempts,
+            )
+        except Exception as e:
+            logger.error("send_message_batch to %s failed: %s", self.queue_url, e)
+            self.stats.failed += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats.batches += 1
+        for index, (_, future) in enumerate(batch):
+            result = results[str(index)]
+            if result.ok:
+                self.stats.messages += 1
+                future.set_result(result.result)
+            else:
+                self.stats.failed += 1
+                future.set_exception(
+                    BatchEntryError(result.code, result.message, result.sender_fault)
+                )
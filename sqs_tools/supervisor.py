@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from .clients import get_client
+from .consumer import AsyncConsumer, ConsumerStats
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may actually use: the smaller of its CPU affinity and
+    the cgroup CPU quota (v2 ``cpu.max`` or v1 ``cpu.cfs_quota_us``), so a
+    container limited to 2 CPUs on a 64-core host gets 2.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        count = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        count = min(count, math.ceil(quota))
+    return max(1, count)
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+        if limit != "max":
+            return int(limit) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            limit = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return limit / period if limit > 0 and period > 0 else None
+
+
+def _worker_main(
+    slot: int,
+    queue_url: str,
+    handler: Callable[[Dict[str, Any]], Any],
+    client_factory: Callable[[], Any],
+    consumer_kwargs: Dict[str, Any],
+    stats_queue,
+    stats_interval: float,
+) -> None:
+    # Runs in the child: its own client, pollers and event loop.
+    consumer = AsyncConsumer(client_factory(), queue_url, handler, **consumer_kwargs)
+    done = threading.Event()
+
+    def report() -> None:
+        while not done.wait(stats_interval):
+            stats_queue.put((slot, os.getpid(), asdict(consumer.stats)))
+
+    async def consume() -> ConsumerStats:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, consumer.stop)
+        loop.add_signal_handler(signal.SIGINT, consumer.stop)
+        return await consumer.run()
+
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    try:
+        asyncio.run(consume())
+    finally:
+        done.set()
+        stats_queue.put((slot, os.getpid(), asdict(consumer.stats)))
+
+
+@dataclass
+class _Slot:
+    index: int
+    process: Optional[multiprocessing.Process] = None
+    started_at: float = 0.0
+    next_start: float = 0.0
+    crashes: int = 0
+
+
+class ConsumerSupervisor:
+    """
+    Runs ``processes`` worker processes, each with its own SQS client and an
+    :class:`AsyncConsumer`, for handlers that are CPU-bound (OCR and the
+    like) and would otherwise share one GIL.
+
+    Workers that exit unexpectedly are restarted, backing off from
+    ``restart_delay`` up to a minute while they keep crashing quickly. On
+    SIGTERM or SIGINT (or :meth:`stop`) every worker gets SIGTERM, stops
+    polling, finishes and acks what it already received, and is killed only
+    if it has not exited after ``drain_timeout``. Workers report their
+    counters every ``stats_interval``; :attr:`stats` sums them across all
+    workers, including ones that have since been replaced.
+
+    ``handler`` and ``client_factory`` are sent to the children, so they must
+    be picklable (module-level functions or ``functools.partial``).
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        handler: Callable[[Dict[str, Any]], Any],
+        processes: Optional[int] = None,
+        client_factory: Optional[Callable[[], Any]] = None,
+        consumer_kwargs: Optional[Dict[str, Any]] = None,
+        restart_delay: float = 1.0,
+        drain_timeout: float = 60.0,
+        stats_interval: float = 5.0,
+        mp_context: str = "spawn",
+    ):
+        self.queue_url = queue_url
+        self.handler = handler
+        self.processes = processes or available_cpus()
+        consumer_kwargs = dict(consumer_kwargs or {})
+        pollers = consumer_kwargs.get("pollers", 4)
+        self.client_factory = client_factory or partial(
+            get_client, "sqs", max_workers=pollers * 2 + 4
+        )
+        self.consumer_kwargs = consumer_kwargs
+        self.restart_delay = restart_delay
+        self.drain_timeout = drain_timeout
+        self.stats_interval = stats_interval
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._stats_queue = self._ctx.Queue()
+        self._latest: Dict[int, Dict[str, int]] = {}
+        self._slots = [_Slot(i) for i in range(self.processes)]
+        self._stopping = threading.Event()
+
+    @property
+    def stats(self) -> ConsumerStats:
+        """Counters summed over every worker process started so far."""
+        total = ConsumerStats()
+        for snapshot in self._latest.values():
+            for field in fields(ConsumerStats):
+                setattr(
+                    total, field.name, getattr(total, field.name) + snapshot[field.name]
+                )
+        return total
+
+    @property
+    def workers(self) -> List[int]:
+        """PIDs of the worker processes currently alive."""
+        return [
+            slot.process.pid
+            for slot in self._slots
+            if slot.process is not None and slot.process.is_alive()
+        ]
+
+    def stop(self) -> None:
+        """Begin a graceful drain. Safe to call from a signal handler or thread."""
+        self._stopping.set()
+
+    def run(self) -> ConsumerStats:
+        """Supervise workers until stopped, drain them and return the totals."""
+        previous = self._install_signal_handlers()
+        try:
+            while not self._stopping.is_set():
+                now = time.monotonic()
+                for slot in self._slots:
+                    self._check(slot, now)
+                self._collect(timeout=0.2)
+        finally:
+            self._drain()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        return self.stats
+
+    def _install_signal_handlers(self) -> Dict[int, Any]:
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        previous = {}
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous[signum] = signal.signal(signum, lambda *_: self.stop())
+        return previous
+
+    def _check(self, slot: _Slot, now: float) -> None:
+        process = slot.process
+        if process is not None:
+            if process.is_alive():
+                return
+            process.join()
+            logger.warning(
+                "Worker %d (pid %d) exited with %s; restarting",
+                slot.index,
+                process.pid,
+                process.exitcode,
+            )
+            # Quick repeat crashes back off; a worker that ran a while resets it.
+            slot.crashes = slot.crashes + 1 if now - slot.started_at < 60 else 1
+            slot.next_start = now + min(
+                self.restart_delay * 2 ** (slot.crashes - 1), 60
+            )
+            slot.process = None
+            self.restarts += 1
+        if now >= slot.next_start:
+            self._start(slot, now)
+
+    def _start(self, slot: _Slot, now: float) -> None:
+        slot.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                slot.index,
+                self.queue_url,
+                self.handler,
+                self.client_factory,
+                self.consumer_kwargs,
+                self._stats_queue,
+                self.stats_interval,
+            ),
+            name=f"sqs-worker-{slot.index}",
+        )
+        slot.process.start()
+        slot.started_at = now
+
+    def _collect(self, timeout: float = 0.0) -> None:
+        try:
+            _, pid, snapshot = self._stats_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self._latest[pid] = snapshot
+        while True:
+            try:
+                _, pid, snapshot = self._stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._latest[pid] = snapshot
+
+    def _drain(self) -> None:
+        running = [s.process for s in self._slots if s.process is not None]
+        for process in running:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.drain_timeout
+        for process in running:
+            while process.is_alive() and time.monotonic() < deadline:
+                self._collect(timeout=0.1)
+            if process.is_alive():
+                logger.error(
+                    "Worker pid %d did not drain in time; killing", process.pid
+                )
+                process.kill()
+            process.join()
+        self._collect(timeout=0.1)
+
+
+def run_supervised(queue_url: str, handler, **kwargs) -> ConsumerStats:
+    """Blocking helper for scripts: supervise worker processes until SIGTERM/SIGINT."""
+    return ConsumerSupervisor(queue_url, handler, **kwargs).run()
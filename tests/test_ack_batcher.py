@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from sqs_tools.ack_batcher import AckBatcher
+from sqs_tools.local_sqs import LocalSQS
+
+
+class RecordingSQS:
+    def __init__(self, local):
+        self._local = local
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        with self._lock:
+            self.batches.append([e["ReceiptHandle"] for e in Entries])
+        return self._local.delete_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+
+def _received(sqs, url, count):
+    for i in range(count):
+        sqs.send_message(QueueUrl=url, MessageBody=str(i))
+    messages = []
+    while len(messages) < count:
+        messages += sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)[
+            "Messages"
+        ]
+    return messages
+
+
+def test_acks_from_many_threads_are_deleted_in_full_batches():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="acks")["QueueUrl"]
+    messages = _received(local, url, 200)
+    sqs = RecordingSQS(local)
+    deleted = []
+
+    with AckBatcher(sqs, url, linger=5, on_deleted=deleted.extend) as acks:
+
+        def worker(part):
+            for message in part:
+                acks.ack(message)
+
+        threads = [
+            threading.Thread(target=worker, args=(messages[i::8],)) for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert acks.flush(timeout=5)
+
+    assert len(deleted) == 200
+    assert acks.stats.deleted == 200 and acks.stats.failed == 0
+    assert [len(batch) for batch in sqs.batches] == [10] * 20
+    assert (
+        local.get_queue_attributes(
+            QueueUrl=url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+        )["Attributes"]["ApproximateNumberOfMessagesNotVisible"]
+        == "0"
+    )
+
+
+def test_partial_batch_is_flushed_after_linger():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="linger")["QueueUrl"]
+    sqs = RecordingSQS(local)
+
+    with AckBatcher(sqs, url, linger=0.05) as acks:
+        started = time.monotonic()
+        for message in _received(local, url, 3):
+            acks.ack(message)
+        while not sqs.batches and time.monotonic() - started < 2:
+            time.sleep(0.005)
+
+    assert [len(batch) for batch in sqs.batches] == [3]
+
+
+def test_handles_nearest_their_deadline_are_deleted_first():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="urgent")["QueueUrl"]
+    messages = _received(local, url, 15)
+    sqs = RecordingSQS(local)
+    now = time.monotonic()
+
+    with AckBatcher(sqs, url, linger=10, urgency=1, max_concurrent=1) as acks:
+        # Hold the flush thread off so all 15 are pending together; ten relaxed
+        # acks fill a batch, but the urgent ones must go in the first one.
+        with acks._cond:
+            for message in messages[:10]:
+                acks.ack(message, deadline=now + 60)
+            for message in messages[10:]:
+                acks.ack(message, deadline=now + 0.5)
+
+    urgent = {m["ReceiptHandle"] for m in messages[10:]}
+    assert urgent <= set(sqs.batches[0])
+    assert sum(len(batch) for batch in sqs.batches) == 15
+
+
+def test_ack_after_close_is_refused():
+    acks = AckBatcher(LocalSQS(), "https://queue")
+    acks.start()
+    acks.close()
+
+    with pytest.raises(RuntimeError):
+        acks.ack({"MessageId": "1", "ReceiptHandle": "h"})
+
+
+def test_transport_errors_count_as_failed_deletes():
+    class Unreachable:
+        def delete_message_batch(self, QueueUrl, Entries):
+            raise EndpointConnectionError(endpoint_url=QueueUrl)
+
+    with AckBatcher(Unreachable(), "https://queue") as acks:
+        for i in range(12):
+            acks.ack({"MessageId": str(i), "ReceiptHandle": f"h{i}"})
+        assert acks.flush(timeout=5)
+
+    assert acks.stats.deleted == 0 and acks.stats.failed == 12
@@ -0,0 +1,170 @@
+import asyncio
+
+from botocore.exceptions import EndpointConnectionError
+
+from sqs_tools.autoscale import BacklogAutoscaler
+from sqs_tools.consumer import AsyncConsumer, InFlightBudget
+from sqs_tools.local_sqs import LocalSQS
+
+
+def test_decide_scales_pollers_and_slots_with_backlog():
+    scaler = BacklogAutoscaler(max_pollers=8, backlog_per_poller=100)
+
+    decision = scaler.decide(450, 0, 10, 0, current_pollers=1)
+
+    assert decision.pollers == 5
+    assert decision.max_in_flight == 125
+    assert decision.wait_time_seconds == scaler.active_wait
+    assert not decision.idle
+    assert scaler.decide(10_000, 0, 10, 0, current_pollers=1).pollers == 8
+
+
+def test_decide_shrinks_by_at_most_half():
+    scaler = BacklogAutoscaler(max_pollers=16, backlog_per_poller=100)
+
+    assert scaler.decide(50, 0, 10, 0, current_pollers=16).pollers == 8
+    assert scaler.decide(50, 0, 10, 0, current_pollers=8).pollers == 4
+
+
+def test_decide_keeps_slots_for_messages_in_flight():
+    scaler = BacklogAutoscaler(max_pollers=4, slots_per_poller=10)
+
+    assert scaler.decide(10, 35, 10, 0, current_pollers=1).max_in_flight == 35
+    assert scaler.decide(10, 500, 10, 0, current_pollers=1).max_in_flight == 40
+
+
+def test_decide_parks_on_long_waits_when_idle():
+    scaler = BacklogAutoscaler(min_pollers=2, max_pollers=8, idle_wait=20)
+
+    decision = scaler.decide(0, 0, 20, 19, current_pollers=8)
+
+    assert decision.idle
+    assert decision.pollers == 2
+    assert decision.wait_time_seconds == 20
+    # Empty right now but receives were still finding messages: not idle.
+    assert not scaler.decide(0, 0, 20, 5, current_pollers=8).idle
+
+
+def test_budget_resize_takes_effect_for_waiters():
+    async def main():
+        budget = InFlightBudget(2)
+        assert await budget.acquire(2) == 2
+        waiter = asyncio.create_task(budget.acquire(5))
+        await asyncio.sleep(0)
+        await budget.resize(5)
+        assert await waiter == 3
+        await budget.resize(1)
+        await budget.release(4)
+        assert budget.in_flight == 1
+
+    asyncio.run(main())
+
+
+def test_consumer_scale_adds_and_retires_pollers():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="scaled")["QueueUrl"]
+
+    async def handler(message):
+        pass
+
+    async def main():
+        consumer = AsyncConsumer(sqs, url, handler, pollers=1, wait_time_seconds=0)
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.05)
+        await consumer.scale(pollers=4, max_in_flight=40)
+        assert consumer.active_pollers == 4
+        await consumer.scale(pollers=2)
+        for _ in range(100):
+            if len(consumer._poller_tasks) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert len(consumer._poller_tasks) == 2
+        consumer.stop()
+        await task
+
+    asyncio.run(main())
+
+
+def test_autoscaler_follows_backlog_then_idles():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="backlog")["QueueUrl"]
+    for i in range(0, 600, 10):
+        sqs.send_message_batch(
+            QueueUrl=url,
+            Entries=[{"Id": str(j), "MessageBody": f"m{i + j}"} for j in range(10)],
+        )
+    seen = []
+    peak = 0
+
+    async def handler(message):
+        await asyncio.sleep(0.02)
+        seen.append(message["Body"])
+
+    scaler = BacklogAutoscaler(
+        max_pollers=6,
+        backlog_per_poller=100,
+        slots_per_poller=10,
+        sample_interval=0.05,
+        active_wait=0,
+        idle_wait=1,
+    )
+
+    async def main():
+        nonlocal peak
+        consumer = AsyncConsumer(
+            sqs,
+            url,
+            handler,
+            pollers=1,
+            max_in_flight=10,
+            wait_time_seconds=0,
+            autoscaler=scaler,
+        )
+        task = asyncio.create_task(consumer.run())
+        for _ in range(500):
+            peak = max(peak, consumer.active_pollers)
+            if len(seen) == 600 and scaler.last is not None and scaler.last.idle:
+                break
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return consumer, await task
+
+    consumer, stats = asyncio.run(main())
+
+    assert len(seen) == 600
+    assert stats.deleted == 600
+    assert peak > 1
+    assert scaler.last.idle
+    assert consumer.pollers == 1
+    assert consumer.wait_time_seconds == 1
+
+
+def test_failed_samples_do_not_stop_scaling_or_the_drain():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="flaky")["QueueUrl"]
+    for i in range(30):
+        local.send_message(QueueUrl=url, MessageBody=str(i))
+
+    class Unreachable:
+        samples = 0
+
+        def get_queue_attributes(self, **kwargs):
+            self.samples += 1
+            raise EndpointConnectionError(endpoint_url=url)
+
+    sampler = Unreachable()
+    scaler = BacklogAutoscaler(sqs_client=sampler, sample_interval=0.01)
+
+    async def main():
+        consumer = AsyncConsumer(
+            local, url, lambda m: None, wait_time_seconds=0, autoscaler=scaler
+        )
+        task = asyncio.create_task(consumer.run())
+        while consumer.stats.processed < 30 or sampler.samples < 3:
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    stats = asyncio.run(main())
+
+    assert stats.deleted == 30
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+from sqs_tools.batch_consumer import BatchConsumer, BatchResult
+from sqs_tools.idempotency import MemoryIdempotencyStore
+from sqs_tools.local_sqs import LocalSQS
+
+
+def _queue(count, fifo=False, groups=1):
+    sqs = LocalSQS()
+    if fifo:
+        url = sqs.create_queue(
+            QueueName="batches.fifo",
+            Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true"},
+        )["QueueUrl"]
+    else:
+        url = sqs.create_queue(QueueName="batches")["QueueUrl"]
+    for i in range(count):
+        params = {"MessageGroupId": f"g{i % groups}"} if fifo else {}
+        sqs.send_message(QueueUrl=url, MessageBody=str(i), **params)
+    return sqs, url
+
+
+def _run(consumer, until):
+    async def main():
+        task = asyncio.create_task(consumer.run())
+        for _ in range(500):
+            if until():
+                break
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    return asyncio.run(main())
+
+
+def test_receives_are_coalesced_into_handler_batches():
+    sqs, url = _queue(95)
+    sizes = []
+
+    def handler(messages):
+        sizes.append(len(messages))
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=40, batch_linger=0.05, wait_time_seconds=0
+    )
+    stats = _run(consumer, lambda: sum(sizes) == 95 and consumer.stats.deleted == 95)
+
+    assert stats.processed == 95
+    assert stats.deleted == 95
+    assert max(sizes) == 40
+    assert len(sizes) < 10  # far fewer calls than the 10-message receives
+
+
+def test_linger_flushes_a_partial_batch():
+    sqs, url = _queue(3)
+    sizes = []
+
+    async def handler(messages):
+        sizes.append(len(messages))
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=50, batch_linger=0.02, wait_time_seconds=0
+    )
+    _run(consumer, lambda: sizes)
+
+    assert sizes == [3]
+
+
+def test_nacked_items_are_redelivered_and_others_acked():
+    sqs, url = _queue(10)
+
+    def handler(messages):
+        result = BatchResult()
+        for message in messages:
+            if int(message["Body"]) % 3 == 0:
+                result.nack(message)
+        return result
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=10, wait_time_seconds=0, visibility_timeout=30
+    )
+    stats = _run(consumer, lambda: consumer.stats.deleted == 6)
+
+    assert (stats.processed, stats.failed, stats.deleted) == (6, 4, 6)
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+    )["Attributes"]
+    assert attributes["ApproximateNumberOfMessagesNotVisible"] == "4"
+
+
+def test_raising_handler_nacks_whole_batch():
+    sqs, url = _queue(5)
+
+    def handler(messages):
+        raise RuntimeError("database down")
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=5, wait_time_seconds=0, visibility_timeout=30
+    )
+    stats = _run(consumer, lambda: consumer.stats.failed == 5)
+
+    assert stats.deleted == 0
+
+
+def test_fifo_failure_holds_back_rest_of_group():
+    sqs, url = _queue(6, fifo=True, groups=2)
+    calls = []
+
+    def handler(messages):
+        calls.append([m["Body"] for m in messages])
+        result = BatchResult()
+        for message in messages:
+            if message["Body"] == "2":
+                result.nack(message)
+        return result
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=6, wait_time_seconds=0, visibility_timeout=30
+    )
+    stats = _run(consumer, lambda: consumer.stats.deleted == 4)
+
+    # Group g0 is 0, 2, 4: "2" failed so "4" must not be acked ahead of it.
+    assert sorted(calls[0]) == ["0", "1", "2", "3", "4", "5"]
+    assert (stats.processed, stats.failed, stats.skipped) == (4, 1, 1)
+
+
+def test_duplicates_skip_the_handler():
+    sqs, url = _queue(4)
+    store = MemoryIdempotencyStore()
+    seen = []
+
+    def handler(messages):
+        seen.extend(m["Body"] for m in messages)
+
+    consumer = BatchConsumer(
+        sqs, url, handler, batch_size=4, wait_time_seconds=0, idempotency=store
+    )
+    _run(consumer, lambda: consumer.stats.deleted == 4)
+    assert sorted(seen) == ["0", "1", "2", "3"]
+
+
+def test_idempotency_store_error_nacks_the_batch():
+    class LockedStore(MemoryIdempotencyStore):
+        def seen(self, key):
+            raise RuntimeError("database is locked")
+
+    sqs, url = _queue(4)
+    seen = []
+    consumer = BatchConsumer(
+        sqs,
+        url,
+        seen.extend,
+        batch_size=4,
+        max_in_flight=4,
+        wait_time_seconds=0,
+        idempotency=LockedStore(),
+    )
+    stats = _run(consumer, lambda: consumer.stats.failed == 4)
+
+    assert seen == []
+    assert (stats.failed, stats.deleted) == (4, 0)
+
+
+def test_max_in_flight_must_fit_a_batch():
+    with pytest.raises(ValueError):
+        BatchConsumer(LocalSQS(), "q", print, batch_size=200, max_in_flight=100)
@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from sqs_tools.batch_reconciler import batch_response, reconcile_batch
+
+
+def _entries(n):
+    return [{"Id": str(i), "MessageBody": f"m{i}"} for i in range(n)]
+
+
+def test_only_failed_entries_are_resent():
+    call = MagicMock(
+        side_effect=[
+            {
+                "Successful": [{"Id": str(i), "MessageId": f"x{i}"} for i in range(9)],
+                "Failed": [{"Id": "9", "Code": "InternalError", "SenderFault": False}],
+            },
+            {"Successful": [{"Id": "9", "MessageId": "x9"}]},
+        ]
+    )
+    results = reconcile_batch(call, "q", _entries(10), sleep=lambda s: None)
+
+    assert all(r.ok for r in results.values())
+    assert results["9"].attempts == 2
+    assert [e["Id"] for e in call.call_args_list[1].kwargs["Entries"]] == ["9"]
+
+
+def test_sender_fault_is_not_retried():
+    call = MagicMock(
+        return_value={
+            "Successful": [{"Id": "0"}],
+            "Failed": [
+                {"Id": "1", "Code": "InvalidMessageContents", "SenderFault": True}
+            ],
+        }
+    )
+    results = reconcile_batch(call, "q", _entries(2), sleep=lambda s: None)
+
+    assert call.call_count == 1
+    assert results["1"].ok is False
+    assert results["1"].code == "InvalidMessageContents"
+
+
+def test_retry_budget_is_per_entry():
+    failing = {"Id": "0", "Code": "InternalError", "SenderFault": False}
+    call = MagicMock(return_value={"Failed": [failing], "Successful": [{"Id": "1"}]})
+    results = reconcile_batch(
+        call, "q", _entries(2), max_attempts=3, sleep=lambda s: None
+    )
+
+    assert call.call_count == 3
+    assert results["0"].attempts == 3
+    assert results["1"].attempts == 1
+    response = batch_response(results)
+    assert [f["Id"] for f in response["Failed"]] == ["0"]
+
+
+def test_whole_request_throttle_retries_and_other_errors_raise():
+    throttle = ClientError({"Error": {"Code": "Throttling"}}, "SendMessageBatch")
+    call = MagicMock(side_effect=[throttle, {"Successful": [{"Id": "0"}]}])
+    results = reconcile_batch(call, "q", _entries(1), sleep=lambda s: None)
+    assert results["0"].ok
+
+    denied = ClientError({"Error": {"Code": "AccessDenied"}}, "SendMessageBatch")
+    with pytest.raises(ClientError):
+        reconcile_batch(MagicMock(side_effect=denied), "q", _entries(1))
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from sqs_tools.benchmark import (
+    BenchmarkConfig,
+    FaultInjectingClient,
+    _Recorder,
+    compare,
+    main,
+    percentile,
+    run_benchmark,
+    run_suite,
+)
+from sqs_tools.local_sqs import LocalSQS
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) is None
+
+
+def test_fault_injecting_client_counts_and_throttles():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="q")["QueueUrl"]
+    client = FaultInjectingClient(local, throttle_rate=1.0)
+
+    with pytest.raises(ClientError) as e:
+        client.send_message(QueueUrl=url, MessageBody="x")
+    assert e.value.response["Error"]["Code"] == "Throttling"
+    client.receive_message(QueueUrl=url)
+
+    assert client.calls == {"send_message": 1, "receive_message": 1}
+    assert client.throttled == 1
+    assert local.calls.get("send_message", 0) == 0
+
+
+@pytest.mark.parametrize(
+    "producer,consumer", [("single", "loop"), ("batch", "async"), ("buffer", "async")]
+)
+def test_run_benchmark_delivers_every_message(producer, consumer):
+    result = run_benchmark(
+        BenchmarkConfig(
+            producer=producer,
+            consumer=consumer,
+            messages=200,
+            message_size=512,
+            producer_workers=2,
+            consumer_workers=2,
+            throttle_rate=0.05,
+            timeout=30,
+        )
+    )
+
+    assert result["completed"]
+    assert result["received"] == 200
+    assert result["messages_per_second"] > 0
+    assert 0 <= result["latency_p50_ms"] <= result["latency_p99_ms"]
+    assert result["api_calls_per_message"] > 0
+    json.dumps(result)
+
+
+def test_batch_producer_makes_fewer_send_calls_than_single():
+    single = run_benchmark(BenchmarkConfig(producer="single", messages=100, timeout=30))
+    batch = run_benchmark(BenchmarkConfig(producer="batch", messages=100, timeout=30))
+
+    assert single["send_calls_per_message"] == 1
+    assert batch["send_calls_per_message"] == pytest.approx(0.1)
+
+
+def test_suite_only_varies_batch_size_for_the_batch_producer():
+    single = BenchmarkConfig(producer="single", messages=20, timeout=30)
+    batch = BenchmarkConfig(producer="batch", messages=20, timeout=30)
+
+    singles = run_suite(single, [256], [1, 10], [2])["results"]
+    batches = run_suite(batch, [256], [1, 10], [2])["results"]
+
+    assert len(singles) == 1
+    assert [r["config"]["batch_size"] for r in batches] == [1, 10]
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    config = {"producer": "batch", "messages": 10, "timeout": 1}
+    baseline = {
+        "results": [
+            {"config": config, "messages_per_second": 1000, "latency_p99_ms": 10}
+        ]
+    }
+    current = {
+        "results": [
+            {
+                "config": dict(config, timeout=5),
+                "messages_per_second": 950,
+                "latency_p99_ms": 20,
+            }
+        ]
+    }
+
+    regressions = compare(baseline, current, tolerance=0.1)
+
+    assert [r["metric"] for r in regressions] == ["latency_p99_ms"]
+
+
+def test_main_writes_json(tmp_path):
+    output = tmp_path / "bench.json"
+
+    assert main(["--messages", "50", "--workers", "1,2", "--output", str(output)]) == 0
+
+    report = json.loads(output.read_text())
+    assert [r["config"]["producer_workers"] for r in report["results"]] == [1, 2]
+
+
+def test_recorder_counts_each_message_id_once():
+    recorder = _Recorder(expected=2, handler_seconds=0)
+    body = json.dumps({"sent_at": 0.0})
+
+    recorder({"MessageId": "a", "Body": body})
+    recorder({"MessageId": "a", "Body": body})
+    assert not recorder.done.is_set()
+    recorder({"MessageId": "b", "Body": body})
+
+    assert recorder.done.is_set()
+    assert (len(recorder.latencies), recorder.duplicates) == (2, 1)
+
+
+def test_failed_sends_are_reported_not_waited_for():
+    result = run_benchmark(
+        BenchmarkConfig(
+            producer="single",
+            messages=4,
+            producer_workers=4,
+            throttle_rate=1.0,
+            timeout=30,
+        )
+    )
+
+    assert result["completed"]
+    assert (result["send_failures"], result["received"]) == (4, 0)
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+
+from botocore.exceptions import EndpointConnectionError
+
+from sqs_tools.capture import (
+    CapturedReceive,
+    CaptureLog,
+    RecordingClient,
+    Replayer,
+    index_path,
+    read_capture,
+)
+from sqs_tools.local_sqs import LocalSQS
+
+
+def _message(i, group=None):
+    message = {
+        "MessageId": f"id-{i}",
+        "ReceiptHandle": f"r-{i}",
+        "Body": f"body {i}",
+        "MessageAttributes": {"Kind": {"DataType": "String", "StringValue": "doc"}},
+    }
+    if group:
+        message["Attributes"] = {"MessageGroupId": group}
+    return message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_log_round_trips_records_and_pages(tmp_path):
+    path = str(tmp_path / "capture.log")
+    with CaptureLog(path, page_size=200) as log:
+        for i in range(20):
+            log.append([_message(i)], "q", received_at=1000.0 + i)
+
+    records = list(read_capture(path))
+    assert [r.messages[0]["Body"] for r in records] == [f"body {i}" for i in range(20)]
+    assert records[3].received_at == 1003.0
+    assert records[3].queue_url == "q"
+    assert os.path.getsize(index_path(path)) > 24  # more than one page
+
+    later = list(read_capture(path, since=1015.0))
+    assert [r.received_at for r in later] == [1015.0 + i for i in range(5)]
+
+
+def test_reopening_continues_and_drops_torn_record(tmp_path):
+    path = str(tmp_path / "capture.log")
+    with CaptureLog(path) as log:
+        log.append([_message(0)], received_at=1.0)
+        log.append([_message(1)], received_at=2.0)
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00{partial")
+
+    with CaptureLog(path) as log:
+        assert log.records == 2
+        log.append([_message(2)], received_at=3.0)
+
+    assert [r.received_at for r in read_capture(path)] == [1.0, 2.0, 3.0]
+
+
+def test_recording_client_appends_non_empty_receives(tmp_path):
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="source")["QueueUrl"]
+    for i in range(3):
+        sqs.send_message(QueueUrl=url, MessageBody=f"m{i}")
+    path = str(tmp_path / "capture.log")
+
+    with CaptureLog(path) as log:
+        client = RecordingClient(sqs, log)
+        client.receive_message(QueueUrl=url, MaxNumberOfMessages=10)
+        client.receive_message(QueueUrl=url, MaxNumberOfMessages=10)
+
+    [record] = list(read_capture(path))
+    assert sorted(m["Body"] for m in record.messages) == ["m0", "m1", "m2"]
+    assert record.queue_url == url
+
+
+def test_replay_keeps_gaps_scaled_by_speed_and_group_ids(tmp_path):
+    path = str(tmp_path / "capture.log")
+    with CaptureLog(path) as log:
+        log.append([_message(0, "a"), _message(1, "b")], received_at=100.0)
+        log.append([_message(2, "a")], received_at=104.0)
+        log.append([_message(3, "b")], received_at=110.0)
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="target.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    clock = FakeClock()
+
+    stats = Replayer(sqs, url, speed=2.0, clock=clock, sleep=clock.sleep).replay(path)
+
+    assert clock.sleeps == [2.0, 3.0]
+    assert (stats.receives, stats.messages, stats.sent, stats.failed) == (3, 4, 4, 0)
+    received = sqs.receive_message(
+        QueueUrl=url, MaxNumberOfMessages=10, AttributeNames=["All"]
+    )["Messages"]
+    groups = {m["Body"]: m["Attributes"]["MessageGroupId"] for m in received}
+    assert groups["body 0"] == "a" and groups["body 3"] == "b"
+
+
+def test_max_speed_replay_does_not_sleep_and_can_repeat(tmp_path):
+    path = str(tmp_path / "capture.log")
+    with CaptureLog(path) as log:
+        for i in range(25):
+            log.append([_message(i, "g")], received_at=float(i * 60))
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="bench.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    clock = FakeClock()
+
+    for _ in range(2):
+        stats = Replayer(sqs, url, speed=None, clock=clock, sleep=clock.sleep).replay(
+            path
+        )
+        assert stats.sent == 25
+
+    assert clock.sleeps == []
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=url, AttributeNames=["ApproximateNumberOfMessages"]
+    )["Attributes"]
+    assert attributes["ApproximateNumberOfMessages"] == "50"
+
+
+def test_fifo_replay_keeps_order_within_groups(tmp_path):
+    path = str(tmp_path / "capture.log")
+    with CaptureLog(path) as log:
+        for i in range(60):
+            log.append([_message(i, f"g{i % 3}")], received_at=float(i))
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="ordered.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+
+    Replayer(sqs, url, speed=None, senders=4).replay(path)
+
+    order = {}
+    while True:
+        messages = sqs.receive_message(
+            QueueUrl=url, MaxNumberOfMessages=10, AttributeNames=["All"]
+        ).get("Messages", [])
+        if not messages:
+            break
+        for message in messages:
+            group = message["Attributes"]["MessageGroupId"]
+            order.setdefault(group, []).append(int(message["Body"].split()[1]))
+            sqs.delete_message(QueueUrl=url, ReceiptHandle=message["ReceiptHandle"])
+    for group, seen in order.items():
+        assert seen == sorted(seen)
+    assert sum(len(seen) for seen in order.values()) == 60
+
+
+def test_max_speed_replay_reads_the_capture_only_as_fast_as_it_sends():
+    sent = 0
+    produced = 0
+    ahead = 0
+    lock = threading.Lock()
+
+    class SlowSQS:
+        def send_message_batch(self, QueueUrl, Entries):
+            nonlocal sent
+            time.sleep(0.001)
+            with lock:
+                sent += 1
+            return {"Successful": [{"Id": e["Id"]} for e in Entries]}
+
+    def records():
+        nonlocal produced, ahead
+        for i in range(200):
+            with lock:
+                ahead = max(ahead, produced - sent)
+            produced += 1
+            yield CapturedReceive(float(i), None, [_message(i)])
+
+    stats = Replayer(SlowSQS(), "https://queue", speed=None, senders=2).replay_records(
+        records()
+    )
+
+    assert stats.sent == 200
+    # Two queued per sender plus the ones being sent.
+    assert ahead <= 6
+
+
+def test_replay_counts_batches_lost_to_transport_errors():
+    class Unreachable:
+        def send_message_batch(self, QueueUrl, Entries):
+            raise EndpointConnectionError(endpoint_url=QueueUrl)
+
+    records = [CapturedReceive(float(i), None, [_message(i)]) for i in range(5)]
+    stats = Replayer(Unreachable(), "https://queue", speed=None).replay_records(records)
+
+    assert stats.sent == 0 and stats.failed == 5
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+from sqs_tools.clients import (
+    DEFAULT_POOL_CONNECTIONS,
+    ClientFactory,
+    LazyClient,
+    client_config,
+)
+
+
+def make_factory():
+    session = MagicMock()
+    session.region_name = "us-east-1"
+    session.client.side_effect = lambda *a, **k: MagicMock(config=k["config"])
+    return ClientFactory(session=session), session
+
+
+def test_client_config_sizes_pool_to_workers():
+    assert client_config().max_pool_connections == DEFAULT_POOL_CONNECTIONS
+    config = client_config(max_workers=200)
+    assert config.max_pool_connections == 200
+    assert config.tcp_keepalive is True
+    assert config.retries == {"mode": "standard", "max_attempts": 3}
+    # Must outlast a 20 second long poll.
+    assert config.read_timeout > 20
+
+
+def test_factory_caches_per_service_and_region():
+    factory, session = make_factory()
+
+    sqs = factory.get("sqs")
+    assert factory.get("sqs") is sqs
+    assert factory.get("sqs", region_name="us-east-1") is sqs
+    assert factory.get("sqs", region_name="eu-west-1") is not sqs
+    assert factory.get("s3") is not sqs
+    assert session.client.call_count == 3
+
+
+def test_factory_grows_pool_for_more_workers():
+    factory, session = make_factory()
+
+    small = factory.get("sqs", max_workers=4)
+    large = factory.get("sqs", max_workers=200)
+
+    assert large is not small
+    assert large.config.max_pool_connections == 200
+    # A smaller request reuses the bigger pool.
+    assert factory.get("sqs", max_workers=8) is large
+
+
+def test_factory_keeps_single_attempt_clients_apart():
+    factory, session = make_factory()
+
+    default = factory.get("sqs")
+    paced = factory.get("sqs", max_attempts=1)
+
+    assert paced is not default
+    assert paced.config.retries["max_attempts"] == 1
+    assert factory.get("sqs", max_attempts=1) is paced
+    assert factory.get("sqs") is default
+
+
+def test_lazy_client_defers_creation_until_first_use():
+    factory, session = make_factory()
+    sqs = LazyClient("sqs", max_workers=50, factory=factory)
+
+    assert session.client.call_count == 0
+    sqs.send_message(QueueUrl="q", MessageBody="x")
+    sqs.receive_message(QueueUrl="q")
+
+    assert session.client.call_count == 1
+    client = factory.get("sqs", max_workers=50)
+    client.send_message.assert_called_once_with(QueueUrl="q", MessageBody="x")
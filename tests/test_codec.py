@@ -0,0 +1,53 @@
+import pytest
+
+from sqs_tools.codec import CODEC_ATTRIBUTE, CodecError, MessageCodec, decode_message
+
+
+def _received(entry):
+    return {
+        "Body": entry["MessageBody"],
+        "MessageAttributes": entry["MessageAttributes"],
+    }
+
+
+@pytest.mark.parametrize("serializer", ["json", "text"])
+def test_round_trip_with_zlib(serializer):
+    codec = MessageCodec(serializer, compression="zlib", min_compress_bytes=0)
+    obj = {"id": 1, "name": "row" * 200} if serializer == "json" else "row," * 500
+    entry = codec.encode_entry(obj, Id="0")
+
+    assert entry["Id"] == "0"
+    assert (
+        entry["MessageAttributes"][CODEC_ATTRIBUTE]["StringValue"]
+        == f"{serializer}+zlib+b64"
+    )
+    assert len(entry["MessageBody"]) < 300
+    assert decode_message(_received(entry)) == obj
+
+
+def test_small_bodies_skip_compression():
+    codec = MessageCodec("json", compression="zlib", min_compress_bytes=512)
+    body, name = codec.encode({"a": 1})
+    assert (body, name) == ('{"a":1}', "json")
+
+
+def test_existing_attributes_are_kept():
+    codec = MessageCodec()
+    entry = codec.encode_entry(
+        [1, 2],
+        MessageAttributes={
+            "Attribute1": {"StringValue": "Value1", "DataType": "String"}
+        },
+    )
+    assert set(entry["MessageAttributes"]) == {"Attribute1", CODEC_ATTRIBUTE}
+
+
+def test_messages_without_codec_attribute_pass_through():
+    assert decode_message({"Body": "Hello, World!"}) == "Hello, World!"
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(CodecError):
+        MessageCodec("yaml")
+    with pytest.raises(CodecError):
+        MessageCodec(compression="lz4")
@@ -0,0 +1,262 @@
+import asyncio
+import threading
+
+from botocore.exceptions import EndpointConnectionError
+
+from sqs_tools.consumer import AsyncConsumer, InFlightBudget
+from sqs_tools.heartbeat import VisibilityHeartbeat
+from sqs_tools.idempotency import MemoryIdempotencyStore
+
+
+class FakeSQS:
+    """Hands out a fixed set of messages, then returns empty receives."""
+
+    def __init__(self, count, groups=None):
+        self.pending = [
+            {
+                "MessageId": str(i),
+                "ReceiptHandle": f"r-{i}",
+                "Body": f"Message {i}",
+                "Attributes": {"MessageGroupId": f"g{i % groups}"} if groups else {},
+            }
+            for i in range(count)
+        ]
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def receive_message(self, **kwargs):
+        with self.lock:
+            batch = self.pending[: kwargs["MaxNumberOfMessages"]]
+            del self.pending[: len(batch)]
+        return {"Messages": batch} if batch else {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        with self.lock:
+            self.deleted.extend(e["ReceiptHandle"] for e in Entries)
+        return {"Successful": [{"Id": e["Id"]} for e in Entries]}
+
+
+def _run_until_drained(consumer, sqs, expected):
+    async def main():
+        task = asyncio.create_task(consumer.run())
+        stats = consumer.stats
+        while stats.processed + stats.failed + stats.skipped < expected:
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    return asyncio.run(main())
+
+
+def test_consumer_processes_and_deletes_all_messages():
+    sqs = FakeSQS(45)
+    seen = []
+
+    async def handler(message):
+        seen.append(message["Body"])
+
+    consumer = AsyncConsumer(
+        sqs, "http://example.com/queue", handler, pollers=3, wait_time_seconds=0
+    )
+    stats = _run_until_drained(consumer, sqs, 45)
+
+    assert len(seen) == 45
+    assert stats.deleted == 45
+    assert sorted(sqs.deleted) == sorted(f"r-{i}" for i in range(45))
+
+
+def test_consumer_respects_in_flight_budget():
+    sqs = FakeSQS(30)
+    current = 0
+    peak = 0
+
+    async def handler(message):
+        nonlocal current, peak
+        current += 1
+        peak = max(peak, current)
+        await asyncio.sleep(0.01)
+        current -= 1
+
+    consumer = AsyncConsumer(
+        sqs,
+        "http://example.com/queue",
+        handler,
+        pollers=4,
+        max_in_flight=5,
+        wait_time_seconds=0,
+    )
+    _run_until_drained(consumer, sqs, 30)
+    assert peak <= 5
+
+
+def test_failed_messages_are_not_deleted():
+    sqs = FakeSQS(10)
+
+    def handler(message):
+        if message["MessageId"] == "3":
+            raise RuntimeError("boom")
+
+    consumer = AsyncConsumer(
+        sqs, "http://example.com/queue", handler, wait_time_seconds=0
+    )
+    stats = _run_until_drained(consumer, sqs, 10)
+
+    assert stats.failed == 1
+    assert "r-3" not in sqs.deleted
+    assert len(sqs.deleted) == 9
+
+
+def test_budget_grants_partial_slots():
+    async def main():
+        budget = InFlightBudget(4)
+        assert await budget.acquire(3) == 3
+        assert await budget.acquire(10) == 1
+        await budget.release(2)
+        assert budget.in_flight == 2
+
+    asyncio.run(main())
+
+
+def test_heartbeat_tracks_until_ack():
+    sqs = FakeSQS(12)
+    heartbeat = VisibilityHeartbeat(sqs, "http://example.com/queue", tick=60)
+    peak = 0
+
+    async def handler(message):
+        nonlocal peak
+        peak = max(peak, heartbeat.tracked)
+
+    consumer = AsyncConsumer(
+        sqs,
+        "http://example.com/queue",
+        handler,
+        wait_time_seconds=0,
+        heartbeat=heartbeat,
+    )
+    _run_until_drained(consumer, sqs, 12)
+    assert peak > 0
+    assert heartbeat.tracked == 0
+    assert not heartbeat.running
+
+
+def test_heartbeat_sets_the_receive_visibility_timeout():
+    sqs = FakeSQS(0)
+    heartbeat = VisibilityHeartbeat(sqs, "http://example.com/queue", 45)
+
+    consumer = AsyncConsumer(
+        sqs, "http://example.com/queue", print, heartbeat=heartbeat
+    )
+    explicit = AsyncConsumer(
+        sqs,
+        "http://example.com/queue",
+        print,
+        heartbeat=heartbeat,
+        visibility_timeout=120,
+    )
+
+    assert consumer._receive_kwargs(10)["VisibilityTimeout"] == 45
+    assert explicit._receive_kwargs(10)["VisibilityTimeout"] == 120
+
+
+def test_fifo_groups_run_in_order_and_failure_skips_rest_of_group():
+    sqs = FakeSQS(10, groups=2)
+    order = []
+
+    async def handler(message):
+        await asyncio.sleep(0.001 * (10 - int(message["MessageId"])))
+        if message["MessageId"] == "2":
+            raise RuntimeError("boom")
+        order.append(message["MessageId"])
+
+    consumer = AsyncConsumer(
+        sqs, "http://example.com/q.fifo", handler, pollers=1, wait_time_seconds=0
+    )
+    stats = _run_until_drained(consumer, sqs, 10)
+
+    # g0 = 0,2,4,6,8 stops at 2; g1 = 1,3,5,7,9 runs in order.
+    assert [m for m in order if int(m) % 2 == 1] == ["1", "3", "5", "7", "9"]
+    assert [m for m in order if int(m) % 2 == 0] == ["0"]
+    assert stats.skipped == 3
+    assert sorted(sqs.deleted) == sorted(f"r-{i}" for i in (0, 1, 3, 5, 7, 9))
+
+
+def test_idempotency_store_skips_redelivered_messages():
+    store = MemoryIdempotencyStore()
+    store.mark_done("3")
+    sqs = FakeSQS(5)
+    handled = []
+
+    consumer = AsyncConsumer(
+        sqs,
+        "http://example.com/queue",
+        handled.append,
+        wait_time_seconds=0,
+        idempotency=store,
+    )
+
+    async def main():
+        task = asyncio.create_task(consumer.run())
+        while consumer.stats.deleted < 5:
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    stats = asyncio.run(main())
+    assert sorted(m["MessageId"] for m in handled) == ["0", "1", "2", "4"]
+    assert stats.duplicates == 1
+    assert all(store.seen(str(i)) for i in range(5))
+
+
+def test_transient_connection_errors_do_not_stop_the_consumer():
+    class FlakySQS(FakeSQS):
+        def __init__(self, count):
+            super().__init__(count)
+            self.receive_errors = 1
+            self.delete_errors = 1
+
+        def receive_message(self, **kwargs):
+            if self.receive_errors:
+                self.receive_errors -= 1
+                raise EndpointConnectionError(endpoint_url="http://example.com")
+            return super().receive_message(**kwargs)
+
+        def delete_message_batch(self, QueueUrl, Entries):
+            if self.delete_errors:
+                self.delete_errors -= 1
+                raise EndpointConnectionError(endpoint_url="http://example.com")
+            return super().delete_message_batch(QueueUrl, Entries)
+
+    sqs = FlakySQS(20)
+    consumer = AsyncConsumer(
+        sqs, "http://example.com/queue", lambda m: None, wait_time_seconds=0
+    )
+    stats = _run_until_drained(consumer, sqs, 20)
+
+    assert stats.processed == 20
+    # The batch whose delete failed is left for redelivery; the rest is deleted.
+    assert 0 < stats.deleted < 20
+    assert stats.deleted == len(sqs.deleted)
+
+
+def test_idempotency_store_error_fails_the_message_and_frees_its_slot():
+    class LockedStore(MemoryIdempotencyStore):
+        def seen(self, key):
+            if key == "2":
+                raise RuntimeError("database is locked")
+            return super().seen(key)
+
+    sqs = FakeSQS(6, groups=1)
+    handled = []
+    consumer = AsyncConsumer(
+        sqs,
+        "http://example.com/queue.fifo",
+        handled.append,
+        wait_time_seconds=0,
+        max_in_flight=1,
+        idempotency=LockedStore(),
+    )
+    stats = _run_until_drained(consumer, sqs, 6)
+
+    assert stats.failed == 1
+    assert [m["MessageId"] for m in handled] == ["0", "1", "3", "4", "5"]
+    assert "r-2" not in sqs.deleted
@@ -0,0 +1,39 @@
+from sqs_tools.dedup import DedupWindow, deduplication_id_for
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deduplication_id_prefers_caller_key():
+    assert deduplication_id_for("body") == deduplication_id_for("body")
+    assert deduplication_id_for("body") != deduplication_id_for("other")
+    assert deduplication_id_for("a", key="job-1") == deduplication_id_for(
+        "b", key="job-1"
+    )
+    assert len(deduplication_id_for("x" * 10_000)) == 64
+
+
+def test_window_drops_repeats_until_expiry():
+    clock = FakeClock()
+    window = DedupWindow(window=300, clock=clock)
+    assert window.check_and_add("a")
+    assert not window.check_and_add("a")
+    clock.now = 301
+    assert window.check_and_add("a")
+    assert window.dropped == 1
+
+
+def test_window_is_bounded_and_forget_allows_retry():
+    window = DedupWindow(max_entries=2, clock=FakeClock())
+    for key in "abc":
+        window.check_and_add(key)
+    assert len(window) == 2
+    assert window.check_and_add("a")
+
+    window.forget("a")
+    assert window.check_and_add("a")
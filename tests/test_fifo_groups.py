@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from sqs_tools.fifo_groups import GroupBlockedError, GroupedExecutor, group_id_for
+
+
+def test_group_id_for_keys():
+    assert group_id_for(42) == "42"
+    assert group_id_for("case-7") == "case-7"
+    assert len(group_id_for("has spaces and ü")) == 64
+    assert group_id_for("doc-1", partitions=8) == group_id_for("doc-1", partitions=8)
+    assert {group_id_for(i, partitions=4) for i in range(100)} <= {
+        f"p{i}" for i in range(4)
+    }
+
+
+def test_order_is_kept_within_group_and_groups_overlap():
+    seen = {"a": [], "b": []}
+    running = set()
+    overlapped = threading.Event()
+    lock = threading.Lock()
+
+    def work(group, n):
+        with lock:
+            running.add(group)
+            if len(running) > 1:
+                overlapped.set()
+        time.sleep(0.005)
+        seen[group].append(n)
+        with lock:
+            running.discard(group)
+
+    with GroupedExecutor(max_workers=4) as executor:
+        for n in range(20):
+            executor.submit("a", work, "a", n)
+            executor.submit("b", work, "b", n)
+
+    assert seen["a"] == list(range(20))
+    assert seen["b"] == list(range(20))
+    assert overlapped.is_set()
+
+
+def test_failure_blocks_rest_of_group_only():
+    gate = threading.Event()
+
+    def fail():
+        gate.wait()
+        raise RuntimeError("boom")
+
+    with GroupedExecutor(max_workers=2) as executor:
+        first = executor.submit("a", fail)
+        blocked = executor.submit("a", lambda: "never")
+        other = executor.submit("b", lambda: "ok")
+        gate.set()
+
+    with pytest.raises(RuntimeError):
+        first.result()
+    with pytest.raises(GroupBlockedError):
+        blocked.result()
+    assert other.result() == "ok"
+    assert executor.active_groups == 0
@@ -0,0 +1,30 @@
+from unittest.mock import MagicMock, patch
+
+import fifoSQS
+
+
+def test_send_message_sets_group_and_dedup_ids():
+    mock_sqs = MagicMock()
+    mock_sqs.send_message.return_value = {"MessageId": "1"}
+    with patch.object(fifoSQS, "sqs", mock_sqs), patch.object(
+        fifoSQS, "dedup_window", fifoSQS.DedupWindow()
+    ):
+        fifoSQS.send_message(
+            "http://example.com/q.fifo", "Document 1", group_key="doc-1"
+        )
+        kwargs = mock_sqs.send_message.call_args.kwargs
+        assert kwargs["MessageGroupId"] == "doc-1"
+        assert kwargs["MessageDeduplicationId"] == fifoSQS.deduplication_id_for(
+            "Document 1"
+        )
+
+
+def test_duplicate_is_dropped_before_api_call():
+    mock_sqs = MagicMock()
+    mock_sqs.send_message.return_value = {"MessageId": "1"}
+    with patch.object(fifoSQS, "sqs", mock_sqs), patch.object(
+        fifoSQS, "dedup_window", fifoSQS.DedupWindow()
+    ):
+        fifoSQS.send_message("http://example.com/q.fifo", "same")
+        fifoSQS.send_message("http://example.com/q.fifo", "same")
+    assert mock_sqs.send_message.call_count == 1
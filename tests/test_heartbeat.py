@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock
+
+from sqs_tools.heartbeat import MAX_VISIBILITY_SECONDS, VisibilityHeartbeat
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _ok(QueueUrl, Entries):
+    return {"Successful": [{"Id": e["Id"]} for e in Entries]}
+
+
+def test_only_handles_inside_margin_are_extended_in_batches():
+    clock = FakeClock()
+    sqs = MagicMock()
+    sqs.change_message_visibility_batch.side_effect = _ok
+    hb = VisibilityHeartbeat(
+        sqs, "q", visibility_timeout=60, extend_margin=15, clock=clock
+    )
+    for i in range(25):
+        hb.track(f"h{i}")
+
+    clock.now = 30
+    assert hb.extend_due() == 0
+    clock.now = 50
+    assert hb.extend_due() == 25
+    assert [
+        len(c.kwargs["Entries"])
+        for c in sqs.change_message_visibility_batch.call_args_list
+    ] == [10, 10, 5]
+    # New deadline is 110, so nothing is due again until 95.
+    clock.now = 90
+    assert hb.extend_due() == 0
+
+
+def test_released_and_rejected_handles_stop_being_extended():
+    clock = FakeClock()
+    sqs = MagicMock()
+    sqs.change_message_visibility_batch.return_value = {
+        "Successful": [{"Id": "0"}],
+        "Failed": [{"Id": "1", "Code": "ReceiptHandleIsInvalid", "SenderFault": True}],
+    }
+    hb = VisibilityHeartbeat(
+        sqs, "q", visibility_timeout=60, extend_margin=15, clock=clock
+    )
+    hb.track_messages(
+        [{"ReceiptHandle": "a"}, {"ReceiptHandle": "b"}, {"ReceiptHandle": "c"}]
+    )
+    hb.release("c")
+
+    clock.now = 50
+    hb.extend_due()
+    assert hb.tracked == 1
+
+
+def test_extensions_stop_at_sqs_ceiling():
+    clock = FakeClock()
+    sqs = MagicMock()
+    sqs.change_message_visibility_batch.side_effect = _ok
+    hb = VisibilityHeartbeat(
+        sqs, "q", visibility_timeout=60, extend_margin=15, clock=clock
+    )
+    with hb.hold({"ReceiptHandle": "a"}):
+        clock.now = MAX_VISIBILITY_SECONDS - 10
+        hb._leases["a"].deadline = clock.now
+        hb.extend_due()
+        timeout = sqs.change_message_visibility_batch.call_args.kwargs["Entries"][0][
+            "VisibilityTimeout"
+        ]
+        assert timeout == 10
+    assert hb.tracked == 0
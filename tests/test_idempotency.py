@@ -0,0 +1,78 @@
+import pytest
+
+from sqs_tools.idempotency import (
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    SQLiteIdempotencyStore,
+    TieredIdempotencyStore,
+    body_hash_key,
+    idempotency_key,
+)
+
+
+def test_keys():
+    message = {"MessageId": "m-1", "Body": "hello"}
+    assert idempotency_key(message) == "m-1"
+    assert body_hash_key(message) == body_hash_key(
+        {"MessageId": "m-2", "Body": "hello"}
+    )
+
+
+def test_memory_store_is_lru_bounded():
+    store = MemoryIdempotencyStore(max_entries=2)
+    store.mark_done("a")
+    store.mark_done("b")
+    assert store.seen("a")
+    store.mark_done("c")
+    assert store.seen("a")
+    assert not store.seen("b")
+
+
+def test_memory_store_ttl():
+    now = [0.0]
+    store = MemoryIdempotencyStore(ttl=10, clock=lambda: now[0])
+    store.mark_done("a")
+    now[0] = 11
+    assert not store.seen("a")
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "processed.db")
+    store = SQLiteIdempotencyStore(path)
+    store.mark_done("a")
+    store.close()
+
+    reopened = SQLiteIdempotencyStore(path)
+    assert reopened.seen("a")
+    assert not reopened.seen("b")
+    reopened.close()
+
+
+def test_sqlite_prune(tmp_path):
+    now = [0.0]
+    store = SQLiteIdempotencyStore(str(tmp_path / "p.db"), ttl=10, clock=lambda: now[0])
+    store.mark_done("old")
+    now[0] = 20
+    store.mark_done("new")
+    assert store.prune() == 1
+    assert store.seen("new")
+
+
+def test_tiered_store_promotes_persistent_hits(tmp_path):
+    persistent = SQLiteIdempotencyStore(str(tmp_path / "p.db"))
+    persistent.mark_done("a")
+    store = TieredIdempotencyStore(persistent)
+    assert len(store.memory) == 0
+    assert store.seen("a")
+    assert len(store.memory) == 1
+    store.mark_done("b")
+    assert persistent.seen("b")
+
+
+def test_incomplete_store_cannot_be_created():
+    class SeenOnly(IdempotencyStore):
+        def seen(self, key):
+            return False
+
+    with pytest.raises(TypeError):
+        SeenOnly()
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+from sqs_tools.lambda_batch import (
+    message_from_record,
+    process_batch,
+    sqs_batch_handler,
+)
+
+FIFO_ARN = "arn:aws:sqs:us-east-1:123456789012:orders.fifo"
+STANDARD_ARN = "arn:aws:sqs:us-east-1:123456789012:orders"
+
+
+def _record(i, arn=STANDARD_ARN, group=None):
+    attributes = {"ApproximateReceiveCount": "1"}
+    if group is not None:
+        attributes["MessageGroupId"] = group
+    return {
+        "messageId": f"id-{i}",
+        "receiptHandle": f"r-{i}",
+        "body": f"body {i}",
+        "attributes": attributes,
+        "messageAttributes": {
+            "Kind": {"stringValue": "doc", "dataType": "String"},
+        },
+        "eventSourceARN": arn,
+    }
+
+
+class FakeContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_message_from_record_matches_receive_shape():
+    message = message_from_record(_record(1, group="g"))
+
+    assert message["MessageId"] == "id-1"
+    assert message["Body"] == "body 1"
+    assert message["Attributes"]["MessageGroupId"] == "g"
+    assert message["MessageAttributes"]["Kind"] == {
+        "DataType": "String",
+        "StringValue": "doc",
+    }
+
+
+def test_only_failed_records_are_reported():
+    def handler(message):
+        if message["MessageId"] in ("id-3", "id-7"):
+            raise ValueError("bad record")
+
+    event = {"Records": [_record(i) for i in range(10)]}
+
+    response = process_batch(event, handler)
+
+    assert response == {
+        "batchItemFailures": [{"itemIdentifier": "id-3"}, {"itemIdentifier": "id-7"}]
+    }
+
+
+def test_records_run_concurrently():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def handler(message):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    started = time.monotonic()
+    process_batch({"Records": [_record(i) for i in range(10)]}, handler)
+
+    assert peak > 1
+    assert time.monotonic() - started < 0.4
+
+
+def test_fifo_failure_fails_rest_of_its_group_only():
+    seen = []
+
+    def handler(message):
+        seen.append(message["MessageId"])
+        if message["MessageId"] == "id-1":
+            raise ValueError("bad record")
+
+    records = [_record(i, FIFO_ARN, group="a" if i < 4 else "b") for i in range(6)]
+
+    response = process_batch({"Records": records}, handler)
+
+    failed = [f["itemIdentifier"] for f in response["batchItemFailures"]]
+    assert failed == ["id-1", "id-2", "id-3"]
+    assert "id-2" not in seen and "id-3" not in seen
+    assert seen.index("id-4") < seen.index("id-5")
+
+
+def test_coroutine_handler_keeps_fifo_order():
+    seen = []
+
+    async def handler(message):
+        await asyncio.sleep(0.001)
+        seen.append(message["MessageId"])
+        if message["MessageId"] == "id-4":
+            raise ValueError("bad record")
+
+    records = [_record(i, FIFO_ARN, group=f"g{i % 2}") for i in range(8)]
+
+    response = process_batch({"Records": records}, handler)
+
+    failed = [f["itemIdentifier"] for f in response["batchItemFailures"]]
+    assert failed == ["id-4", "id-6"]
+    assert [i for i in seen if i in ("id-0", "id-2", "id-4")] == [
+        "id-0",
+        "id-2",
+        "id-4",
+    ]
+
+
+def test_records_past_the_deadline_are_reported_not_run():
+    seen = []
+
+    def handler(message):
+        seen.append(message["MessageId"])
+        time.sleep(0.3)
+
+    records = [_record(i, FIFO_ARN, group="g") for i in range(3)]
+
+    response = process_batch(
+        {"Records": records}, handler, FakeContext(1450), safety_ms=1000
+    )
+
+    # id-1 started in time but was still running; id-2 never started.
+    failed = [f["itemIdentifier"] for f in response["batchItemFailures"]]
+    assert failed == ["id-1", "id-2"]
+    time.sleep(0.4)
+    assert seen == ["id-0", "id-1"]
+
+
+def test_decorator_builds_lambda_entry_point():
+    @sqs_batch_handler(max_workers=2)
+    def lambda_handler(message):
+        if message["Body"] == "body 0":
+            raise ValueError("bad record")
+
+    response = lambda_handler({"Records": [_record(0), _record(1)]}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "id-0"}]}
+    assert lambda_handler.__name__ == "lambda_handler"
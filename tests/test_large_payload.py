@@ -0,0 +1,80 @@
+import io
+from unittest.mock import MagicMock
+
+from sqs_tools.codec import MessageCodec, decode_message
+from sqs_tools.large_payload import SIZE_ATTRIBUTE, ClaimCheck
+
+
+def _s3_store():
+    store = {}
+    s3 = MagicMock()
+    s3.put_object.side_effect = lambda Bucket, Key, Body: store.__setitem__(
+        (Bucket, Key), Body
+    )
+    s3.get_object.side_effect = lambda Bucket, Key: {
+        "Body": io.BytesIO(store[(Bucket, Key)])
+    }
+    return s3, store
+
+
+def test_small_bodies_are_sent_inline():
+    s3, _ = _s3_store()
+    claim_check = ClaimCheck(s3, "bucket", threshold=100)
+    params = {"QueueUrl": "q", "MessageBody": "small"}
+    assert claim_check.offload(params) is params
+    s3.put_object.assert_not_called()
+
+
+def test_large_body_round_trips_through_s3():
+    s3, store = _s3_store()
+    claim_check = ClaimCheck(s3, "bucket", threshold=100)
+    body = "x" * 500
+    sent = claim_check.offload({"QueueUrl": "q", "MessageBody": body})
+
+    assert len(sent["MessageBody"]) < 200
+    assert sent["MessageAttributes"][SIZE_ATTRIBUTE]["StringValue"] == "500"
+    assert len(store) == 1
+
+    message = {
+        "Body": sent["MessageBody"],
+        "MessageAttributes": sent["MessageAttributes"],
+    }
+    payload = claim_check.payload(message)
+    assert payload.offloaded
+    s3.get_object.assert_not_called()
+    assert payload.text() == body
+
+
+def test_wrapped_handler_sees_real_body_and_cleanup_deletes_object():
+    s3, _ = _s3_store()
+    claim_check = ClaimCheck(s3, "bucket", threshold=10)
+    sent = claim_check.offload({"MessageBody": "y" * 50})
+    message = {
+        "Body": sent["MessageBody"],
+        "MessageAttributes": sent["MessageAttributes"],
+    }
+    seen = []
+
+    claim_check.wrap_handler(lambda m: seen.append(m["Body"]))(message)
+    assert seen == ["y" * 50]
+
+    assert claim_check.cleanup([message, {"Body": "inline"}]) == 1
+    deleted = s3.delete_objects.call_args.kwargs["Delete"]["Objects"]
+    assert len(deleted) == 1
+
+
+def test_codec_tagged_pointers_decode_once_resolved():
+    s3, _ = _s3_store()
+    claim_check = ClaimCheck(s3, "bucket", threshold=50)
+    entry = MessageCodec("text", compression="zlib").encode_entry("z" * 5000)
+    sent = claim_check.offload(entry)
+    message = {
+        "Body": sent["MessageBody"],
+        "MessageAttributes": sent["MessageAttributes"],
+    }
+
+    # Unresolved, the pointer is handed back instead of failing to decompress.
+    assert decode_message(message) == sent["MessageBody"]
+    decoded = []
+    claim_check.wrap_handler(lambda m: decoded.append(decode_message(m)))(message)
+    assert decoded == ["z" * 5000]
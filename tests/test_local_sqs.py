@@ -0,0 +1,187 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+import regular
+from sqs_tools.consumer import AsyncConsumer
+from sqs_tools.local_sqs import LocalSQS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_send_receive_delete_round_trip():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="test")["QueueUrl"]
+    sqs.send_message(
+        QueueUrl=url,
+        MessageBody="hello",
+        MessageAttributes={
+            "Attribute1": {"StringValue": "Value1", "DataType": "String"}
+        },
+    )
+    messages = sqs.receive_message(
+        QueueUrl=url, MaxNumberOfMessages=10, MessageAttributeNames=["All"]
+    )["Messages"]
+    assert messages[0]["Body"] == "hello"
+    assert messages[0]["MessageAttributes"]["Attribute1"]["StringValue"] == "Value1"
+
+    response = sqs.delete_message_batch(
+        QueueUrl=url,
+        Entries=[
+            {"Id": "0", "ReceiptHandle": messages[0]["ReceiptHandle"]},
+            {"Id": "1", "ReceiptHandle": "bogus"},
+        ],
+    )
+    assert [s["Id"] for s in response["Successful"]] == ["0"]
+    assert response["Failed"][0]["Code"] == "ReceiptHandleIsInvalid"
+    assert (
+        sqs.get_queue_attributes(QueueUrl=url)["Attributes"][
+            "ApproximateNumberOfMessages"
+        ]
+        == "0"
+    )
+
+
+def test_visibility_timeout_and_redrive_to_dlq():
+    clock = FakeClock()
+    sqs = LocalSQS(clock=clock)
+    dlq = sqs.create_queue(QueueName="dlq")["QueueUrl"]
+    dlq_arn = sqs.get_queue_attributes(QueueUrl=dlq, AttributeNames=["QueueArn"])[
+        "Attributes"
+    ]["QueueArn"]
+    url = sqs.create_queue(
+        QueueName="work",
+        Attributes={
+            "VisibilityTimeout": "30",
+            "RedrivePolicy": json.dumps(
+                {"deadLetterTargetArn": dlq_arn, "maxReceiveCount": "2"}
+            ),
+        },
+    )["QueueUrl"]
+    sqs.send_message(QueueUrl=url, MessageBody="poison")
+
+    for attempt in (1, 2):
+        messages = sqs.receive_message(QueueUrl=url, AttributeNames=["All"])["Messages"]
+        assert messages[0]["Attributes"]["ApproximateReceiveCount"] == str(attempt)
+        assert sqs.receive_message(QueueUrl=url) == {}
+        clock.now += 31
+
+    assert sqs.receive_message(QueueUrl=url) == {}
+    assert sqs.receive_message(QueueUrl=dlq)["Messages"][0]["Body"] == "poison"
+
+
+def test_fifo_groups_lock_and_deduplicate():
+    sqs = LocalSQS()
+    with pytest.raises(ClientError):
+        sqs.create_queue(QueueName="orders", Attributes={"FifoQueue": "true"})
+    url = sqs.create_queue(
+        QueueName="orders.fifo",
+        Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true"},
+    )["QueueUrl"]
+    with pytest.raises(ClientError):
+        sqs.send_message(QueueUrl=url, MessageBody="no group")
+
+    for group, body in [("a", "a1"), ("a", "a2"), ("b", "b1"), ("a", "a1")]:
+        sqs.send_message(QueueUrl=url, MessageBody=body, MessageGroupId=group)
+
+    first = sqs.receive_message(
+        QueueUrl=url, MaxNumberOfMessages=1, AttributeNames=["All"]
+    )["Messages"]
+    assert first[0]["Body"] == "a1"
+    # Group a is locked while a1 is in flight, so only b is available.
+    second = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)["Messages"]
+    assert [m["Body"] for m in second] == ["b1"]
+
+    sqs.delete_message(QueueUrl=url, ReceiptHandle=first[0]["ReceiptHandle"])
+    third = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)["Messages"]
+    assert [m["Body"] for m in third] == ["a2"]
+
+
+def test_long_poll_wakes_on_send():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="poll")["QueueUrl"]
+    timer = threading.Timer(
+        0.05, sqs.send_message, kwargs={"QueueUrl": url, "MessageBody": "late"}
+    )
+    timer.start()
+    messages = sqs.receive_message(QueueUrl=url, WaitTimeSeconds=5)["Messages"]
+    assert messages[0]["Body"] == "late"
+
+
+def test_batch_limits():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="batch")["QueueUrl"]
+    with pytest.raises(ClientError):
+        sqs.send_message_batch(
+            QueueUrl=url,
+            Entries=[{"Id": str(i), "MessageBody": "x"} for i in range(11)],
+        )
+    with pytest.raises(ClientError):
+        sqs.send_message_batch(
+            QueueUrl=url,
+            Entries=[{"Id": "1", "MessageBody": "x"}, {"Id": "1", "MessageBody": "y"}],
+        )
+
+
+def test_drop_in_for_existing_script(monkeypatch, capfd):
+    monkeypatch.setattr(regular, "sqs", LocalSQS())
+    url = regular.create_queue("test")
+    regular.send_message(url, "Hello, World!")
+    messages = regular.receive_messages(url)
+    regular.delete_messages(url, messages)
+    out, _ = capfd.readouterr()
+    assert "deleted successfully" in out
+
+
+def test_consumer_drains_local_queue():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="bulk")["QueueUrl"]
+    for start in range(0, 500, 10):
+        sqs.send_message_batch(
+            QueueUrl=url,
+            Entries=[{"Id": str(i), "MessageBody": str(start + i)} for i in range(10)],
+        )
+    handled = []
+    consumer = AsyncConsumer(sqs, url, handled.append, pollers=4, wait_time_seconds=0)
+
+    async def main():
+        task = asyncio.create_task(consumer.run())
+        while consumer.stats.deleted < 500:
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    asyncio.run(main())
+    assert sorted(int(m["Body"]) for m in handled) == list(range(500))
+    assert (
+        sqs.get_queue_attributes(QueueUrl=url)["Attributes"][
+            "ApproximateNumberOfMessagesNotVisible"
+        ]
+        == "0"
+    )
+
+
+def test_call_counts_are_exact_under_concurrency():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="counted")["QueueUrl"]
+
+    def hammer():
+        for _ in range(2000):
+            sqs.get_queue_attributes(QueueUrl=url)
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sqs.calls["GetQueueAttributes"] == 16000
@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.metrics import Histogram, SQSMetrics
+
+
+class ThrottlingClient:
+    def send_message(self, **kwargs):
+        raise ClientError(
+            {
+                "Error": {"Code": "Throttling", "Message": "Rate exceeded"},
+                "ResponseMetadata": {"RetryAttempts": 2},
+            },
+            "SendMessage",
+        )
+
+
+def _queue():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="metrics")["QueueUrl"]
+    return local, url
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.99) == float("inf")
+
+
+def test_instrumented_client_counts_calls_entries_and_fill():
+    local, url = _queue()
+    metrics = SQSMetrics()
+    sqs = metrics.instrument(local)
+
+    sqs.send_message(QueueUrl=url, MessageBody="hello")
+    sqs.send_message_batch(
+        QueueUrl=url,
+        Entries=[{"Id": str(i), "MessageBody": "x" * 10} for i in range(4)],
+    )
+    messages = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)["Messages"]
+    sqs.delete_message_batch(
+        QueueUrl=url,
+        Entries=[
+            {"Id": str(i), "ReceiptHandle": m["ReceiptHandle"]}
+            for i, m in enumerate(messages)
+        ],
+    )
+
+    ops = metrics.snapshot()
+    assert ops["send_message"].calls == 1
+    assert ops["send_message"].bytes == 5
+    assert ops["send_message_batch"].entries == 4
+    assert ops["send_message_batch"].fill_ratio == pytest.approx(0.4)
+    assert ops["send_message_batch"].bytes == 40
+    assert ops["receive_message"].entries == 5
+    assert ops["receive_message"].fill_ratio == pytest.approx(0.5)
+    assert ops["delete_message_batch"].entries == 5
+    assert ops["send_message"].latency.count == 1
+    # Calls outside the instrumented set pass straight through.
+    assert "get_queue_attributes" not in ops
+    assert sqs.get_queue_attributes(QueueUrl=url, AttributeNames=["All"])
+
+
+def test_errors_throttles_and_retries_are_counted():
+    metrics = SQSMetrics()
+    sqs = metrics.instrument(ThrottlingClient())
+
+    with pytest.raises(ClientError):
+        sqs.send_message(QueueUrl="q", MessageBody="x")
+
+    op = metrics.snapshot()["send_message"]
+    assert (op.calls, op.errors, op.throttles, op.retries) == (1, 1, 1, 2)
+
+
+def test_transport_errors_are_counted_with_their_latency():
+    class Unreachable:
+        def receive_message(self, **kwargs):
+            raise EndpointConnectionError(endpoint_url="https://sqs")
+
+    metrics = SQSMetrics()
+    sqs = metrics.instrument(Unreachable())
+
+    with pytest.raises(EndpointConnectionError):
+        sqs.receive_message(QueueUrl="q")
+
+    op = metrics.snapshot()["receive_message"]
+    assert (op.calls, op.errors, op.throttles) == (1, 1, 0)
+    assert op.latency.count == 1
+
+
+def test_bytes_are_counted_in_utf8():
+    local, url = _queue()
+    metrics = SQSMetrics()
+    sqs = metrics.instrument(local)
+
+    sqs.send_message(QueueUrl=url, MessageBody="h\u00e9llo \u2603")
+    sqs.receive_message(QueueUrl=url)
+
+    ops = metrics.snapshot()
+    assert ops["send_message"].bytes == 10
+    assert ops["receive_message"].bytes == 10
+
+
+def test_timed_records_sync_and_async_handlers():
+    metrics = SQSMetrics()
+
+    @metrics.timed
+    def handle(message):
+        if message == "bad":
+            raise ValueError(message)
+
+    @metrics.timed
+    async def handle_async(message):
+        await asyncio.sleep(0)
+
+    handle("ok")
+    with pytest.raises(ValueError):
+        handle("bad")
+    assert asyncio.iscoroutinefunction(handle_async)
+    asyncio.run(handle_async("ok"))
+
+    assert metrics.handler.count == 3
+    assert metrics.handler_errors == 1
+
+
+def test_prometheus_text_format():
+    local, url = _queue()
+    metrics = SQSMetrics()
+    sqs = metrics.instrument(local)
+    sqs.send_message(QueueUrl=url, MessageBody="hello")
+
+    text = metrics.prometheus()
+
+    assert "# TYPE sqs_calls_total counter" in text
+    assert 'sqs_calls_total{operation="send_message"} 1' in text
+    assert 'sqs_request_seconds_bucket{operation="send_message",le="+Inf"} 1' in text
+    assert 'sqs_request_seconds_count{operation="send_message"} 1' in text
+    assert "sqs_handler_seconds_count 0" in text
+
+
+def test_emf_lines_report_changes_since_last_call():
+    local, url = _queue()
+    metrics = SQSMetrics(namespace="Test")
+    sqs = metrics.instrument(local)
+    for _ in range(3):
+        sqs.send_message(QueueUrl=url, MessageBody="hello")
+
+    [line] = metrics.emf({"Queue": "metrics"})
+    record = json.loads(line)
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "Test"
+    assert directive["Dimensions"] == [["Operation", "Queue"]]
+    assert record["Operation"] == "send_message"
+    assert record["Calls"] == 3
+    assert "LatencyAvg" in record
+
+    sqs.send_message(QueueUrl=url, MessageBody="hello")
+    [line] = metrics.emf()
+    assert json.loads(line)["Calls"] == 1
+    assert metrics.emf() == []
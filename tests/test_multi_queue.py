@@ -0,0 +1,142 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.multi_queue import (
+    MultiQueueConsumer,
+    QueueSpec,
+    WeightedQueueScheduler,
+)
+
+
+def test_busy_queues_share_receives_by_weight():
+    scheduler = WeightedQueueScheduler([QueueSpec("a", weight=3), QueueSpec("b")])
+    picks = Counter()
+    for _ in range(400):
+        state = scheduler.next(now=0.0)
+        picks[state.url] += 1
+        scheduler.record(state, 10, 10, now=0.0)
+
+    assert picks["a"] == 300
+    assert picks["b"] == 100
+
+
+def test_empty_queue_backs_off_and_loses_weight():
+    scheduler = WeightedQueueScheduler(
+        [QueueSpec("empty", weight=5), QueueSpec("busy")], min_backoff=1.0
+    )
+    picks = Counter()
+    now = 0.0
+    for _ in range(200):
+        state = scheduler.next(now)
+        picks[state.url] += 1
+        scheduler.record(state, 10, 0 if state.url == "empty" else 10, now)
+        now += 0.1
+
+    # 20 simulated seconds: backoff doubles 1, 2, 4, 8s, so ~5 polls of "empty".
+    assert picks["empty"] <= 6
+    assert scheduler.effective_weight(scheduler.queues[0]) < 1
+
+
+def test_wait_hint_when_everything_backs_off():
+    scheduler = WeightedQueueScheduler([QueueSpec("a")], min_backoff=2.0)
+    state = scheduler.next(0.0)
+    scheduler.record(state, 10, 0, 0.0)
+
+    assert scheduler.next(1.0) is None
+    assert scheduler.wait_hint(1.0) == pytest.approx(1.0)
+
+
+def test_invalid_weight_rejected():
+    with pytest.raises(ValueError):
+        WeightedQueueScheduler([QueueSpec("a", weight=0)])
+
+
+def _run(consumer, done):
+    async def main():
+        task = asyncio.create_task(consumer.run())
+        for _ in range(500):
+            if done():
+                break
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        return await task
+
+    return asyncio.run(main())
+
+
+def test_consumer_serves_all_queues_and_acks_on_the_right_one():
+    sqs = LocalSQS()
+    urgent = sqs.create_queue(QueueName="urgent")["QueueUrl"]
+    bulk = sqs.create_queue(
+        QueueName="bulk.fifo",
+        Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true"},
+    )["QueueUrl"]
+    for i in range(20):
+        sqs.send_message(QueueUrl=urgent, MessageBody=f"u{i}")
+        sqs.send_message(QueueUrl=bulk, MessageBody=f"b{i}", MessageGroupId="g")
+    seen = {"urgent": [], "bulk": []}
+
+    async def on_urgent(message):
+        seen["urgent"].append(message["Body"])
+
+    def on_bulk(message):
+        seen["bulk"].append(message["Body"])
+
+    consumer = MultiQueueConsumer(
+        sqs,
+        [
+            QueueSpec(urgent, weight=4, handler=on_urgent),
+            QueueSpec(bulk, handler=on_bulk),
+        ],
+        pollers=3,
+        wait_time_seconds=0,
+        min_backoff=0.05,
+    )
+    stats = _run(consumer, lambda: consumer.stats.deleted >= 40)
+
+    assert stats.deleted == 40
+    assert sorted(seen["urgent"]) == sorted(f"u{i}" for i in range(20))
+    # FIFO group order is kept across receives.
+    assert seen["bulk"] == [f"b{i}" for i in range(20)]
+    for url in (urgent, bulk):
+        attributes = sqs.get_queue_attributes(
+            QueueUrl=url,
+            AttributeNames=[
+                "ApproximateNumberOfMessages",
+                "ApproximateNumberOfMessagesNotVisible",
+            ],
+        )["Attributes"]
+        assert attributes["ApproximateNumberOfMessages"] == "0"
+        assert attributes["ApproximateNumberOfMessagesNotVisible"] == "0"
+    assert all(q["in_flight"] == 0 for q in consumer.queue_stats.values())
+
+
+def test_per_queue_concurrency_limit():
+    sqs = LocalSQS()
+    capped = sqs.create_queue(QueueName="capped")["QueueUrl"]
+    for i in range(12):
+        sqs.send_message(QueueUrl=capped, MessageBody=str(i))
+    current = peak = 0
+
+    async def handler(message):
+        nonlocal current, peak
+        current += 1
+        peak = max(peak, current)
+        await asyncio.sleep(0.01)
+        current -= 1
+
+    consumer = MultiQueueConsumer(
+        sqs,
+        [QueueSpec(capped, max_concurrency=2)],
+        handler,
+        pollers=4,
+        wait_time_seconds=0,
+        min_backoff=0.05,
+    )
+    stats = _run(consumer, lambda: consumer.stats.deleted >= 12)
+
+    assert stats.deleted == 12
+    assert peak <= 2
@@ -0,0 +1,82 @@
+import threading
+
+from botocore.exceptions import ClientError
+
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.operations import (
+    consume_loop,
+    delete_batch,
+    receive_batch,
+    send_batch_with_retry,
+    send_message_with_retry,
+)
+
+
+def _queue():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="operations")["QueueUrl"]
+    return local, url
+
+
+class ThrottleOnce:
+    def __init__(self, local):
+        self.local = local
+        self.throttled = False
+
+    def send_message(self, **kwargs):
+        if not self.throttled:
+            self.throttled = True
+            raise ClientError(
+                {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}},
+                "SendMessage",
+            )
+        return self.local.send_message(**kwargs)
+
+
+def test_single_send_retries_a_throttle():
+    local, url = _queue()
+
+    result = send_message_with_retry(ThrottleOnce(local), url, "hi", base_delay=0)
+
+    assert result.ok and result.attempts == 2
+    assert result.result["MessageId"]
+    assert [m["Body"] for m in receive_batch(local, url, 0)] == ["hi"]
+
+
+def test_batch_send_receive_and_delete_round_trip():
+    local, url = _queue()
+    attributes = {"Kind": {"StringValue": "doc", "DataType": "String"}}
+
+    sent = send_batch_with_retry(
+        local, url, ["a", "b", "c"], message_attributes=attributes
+    )
+    messages = receive_batch(local, url, 0)
+    deleted = delete_batch(local, url, messages)
+
+    assert sorted(sent) == ["0", "1", "2"] and all(r.ok for r in sent.values())
+    assert sorted(m["Body"] for m in messages) == ["a", "b", "c"]
+    assert all(m["MessageAttributes"] == attributes for m in messages)
+    assert set(deleted) == {m["MessageId"] for m in messages}
+    assert receive_batch(local, url, 0) == []
+
+
+def test_consume_loop_deletes_only_handled_messages():
+    local, url = _queue()
+    send_batch_with_retry(local, url, ["ok", "bad", "ok"])
+    stop = threading.Event()
+    seen = []
+
+    def handler(message):
+        seen.append(message["Body"])
+        if len(seen) == 3:
+            stop.set()
+        if message["Body"] == "bad":
+            raise ValueError("bad message")
+
+    consume_loop(local, url, handler, stop, wait_time_seconds=0, visibility_timeout=60)
+
+    assert sorted(seen) == ["bad", "ok", "ok"]
+    attributes = local.get_queue_attributes(
+        QueueUrl=url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+    )["Attributes"]
+    assert attributes["ApproximateNumberOfMessagesNotVisible"] == "1"
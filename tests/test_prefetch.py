@@ -0,0 +1,112 @@
+import threading
+import time
+
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.prefetch import Batch, PipelinedConsumer, PrefetchBuffer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def slow_receive(count, latency):
+    remaining = list(range(count))
+    lock = threading.Lock()
+
+    def receive():
+        time.sleep(latency)
+        with lock:
+            batch = remaining[:10]
+            del remaining[:10]
+        return [{"MessageId": str(i), "ReceiptHandle": str(i)} for i in batch]
+
+    return receive
+
+
+def test_buffer_hides_receive_latency_behind_processing():
+    with PrefetchBuffer(slow_receive(200, 0.02), max_depth=8) as buffer:
+        seen = 0
+        while seen < 200:
+            batch = buffer.get(timeout=1)
+            time.sleep(0.01)  # handler time per batch, half the receive latency
+            seen += len(batch)
+            buffer.task_done(batch)
+
+    assert buffer.depth >= 3
+    # Without prefetching the worker would wait 20 x 20ms; now it only waits
+    # for the first receive and while the depth ramps up.
+    assert buffer.stats.idle_seconds < 0.15
+
+
+def test_depth_is_capped_by_visibility_timeout():
+    buffer = PrefetchBuffer(lambda: [], visibility_timeout=10, max_depth=50)
+    buffer._receive_time = 20.0
+    buffer._batch_time = 1.0
+
+    with buffer._cond:
+        buffer._resize()
+
+    # Half the 10s timeout, minus one batch of work, at 1s per batch.
+    assert buffer.depth == 4
+
+
+def test_stale_batches_are_dropped_not_handed_out():
+    clock = FakeClock()
+    buffer = PrefetchBuffer(lambda: [], visibility_timeout=30, clock=clock)
+    buffer._buffer.append(Batch([{"MessageId": "old"}], received_at=0.0))
+    buffer._buffer.append(Batch([{"MessageId": "new"}], received_at=25.0))
+    clock.now = 31.0
+
+    batch = buffer.get(timeout=0)
+
+    assert [m["MessageId"] for m in batch] == ["new"]
+    assert buffer.stats.expired == 1
+
+
+def test_get_returns_none_once_stopped_and_drained():
+    buffer = PrefetchBuffer(lambda: [])
+    buffer.start()
+    buffer.stop()
+
+    assert buffer.get() is None
+
+
+def test_pipelined_consumer_processes_and_deletes_everything():
+    sqs = LocalSQS()
+    url = sqs.create_queue(QueueName="pipeline")["QueueUrl"]
+    for i in range(55):
+        sqs.send_message(QueueUrl=url, MessageBody=str(i))
+    seen = []
+    lock = threading.Lock()
+
+    def handler(message):
+        if message["Body"] == "13":
+            raise ValueError("bad message")
+        with lock:
+            seen.append(message["Body"])
+
+    # Long polls keep idle fetchers from spinning on the local queue's lock while
+    # the last acks are deleted.
+    consumer = PipelinedConsumer(sqs, url, handler, workers=3, wait_time_seconds=1)
+    thread = threading.Thread(target=consumer.run)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while consumer.stats.deleted < 54 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    consumer.stop()
+    thread.join()
+
+    assert sorted(seen, key=int) == [str(i) for i in range(55) if i != 13]
+    assert consumer.stats.failed == 1
+    assert consumer.stats.deleted == 54
+    # The failed message is still on the queue, waiting for its timeout.
+    assert (
+        sqs.get_queue_attributes(
+            QueueUrl=url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+        )["Attributes"]["ApproximateNumberOfMessagesNotVisible"]
+        == "1"
+    )
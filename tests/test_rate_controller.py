@@ -0,0 +1,79 @@
+import pytest
+
+from sqs_tools.rate_controller import AdaptiveRateController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _controller(clock, **kwargs):
+    kwargs.setdefault("pace_before_throttle", True)
+    return AdaptiveRateController(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_acquire_paces_to_rate():
+    clock = FakeClock()
+    ctrl = _controller(clock, initial_rate=100, burst_seconds=0.1)
+    for _ in range(11):
+        ctrl.acquire(10)
+    # 10 tokens of burst, then 100 more at 100/s.
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_throttle_halves_once_per_cooldown():
+    clock = FakeClock()
+    ctrl = _controller(clock, initial_rate=400, decrease_cooldown=1.0)
+    for _ in range(50):
+        ctrl.on_throttle()
+    assert ctrl.rate == 200
+    assert ctrl.throttles == 50
+    clock.now += 1.0
+    ctrl.on_throttle()
+    assert ctrl.rate == 100
+
+
+def test_success_increases_additively_up_to_max():
+    clock = FakeClock()
+    ctrl = _controller(
+        clock, initial_rate=100, max_rate=180, increase_step=50, increase_interval=1.0
+    )
+    ctrl.on_success()
+    assert ctrl.rate == 100
+    for _ in range(3):
+        clock.now += 1.0
+        ctrl.on_success()
+    assert ctrl.rate == 180
+
+
+def test_unthrottled_sends_are_not_paced_until_the_first_throttle():
+    clock = FakeClock()
+    ctrl = _controller(clock, initial_rate=300, pace_before_throttle=False)
+    for _ in range(100):
+        assert ctrl.acquire(10) == 0
+        clock.now += 0.001
+        ctrl.on_success()
+    assert clock.slept == []
+    # Measured at 10,000 msg/s, so pacing starts at half of that.
+    ctrl.on_throttle()
+    assert ctrl.pacing
+    assert ctrl.rate == pytest.approx(5000)
+    ctrl.acquire(50)
+    assert clock.slept == [pytest.approx(0.01)]
+
+
+def test_rate_never_drops_below_min():
+    clock = FakeClock()
+    ctrl = _controller(clock, initial_rate=20, min_rate=10, decrease_cooldown=0)
+    for _ in range(5):
+        ctrl.on_throttle()
+    assert ctrl.rate == 10
@@ -0,0 +1,127 @@
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.redrive import DLQRedriver, message_filter, redrive
+
+
+def make_queues(fifo=False):
+    sqs = LocalSQS()
+    suffix = ".fifo" if fifo else ""
+    attributes = {"FifoQueue": "true"} if fifo else {}
+    dlq = sqs.create_queue(QueueName="dlq" + suffix, Attributes=attributes)
+    source = sqs.create_queue(QueueName="source" + suffix, Attributes=attributes)
+    return sqs, dlq["QueueUrl"], source["QueueUrl"]
+
+
+def drain(sqs, url):
+    messages = []
+    while True:
+        batch = sqs.receive_message(
+            QueueUrl=url,
+            MaxNumberOfMessages=10,
+            AttributeNames=["All"],
+            MessageAttributeNames=["All"],
+        ).get("Messages", [])
+        if not batch:
+            return messages
+        messages.extend(batch)
+        for message in batch:
+            sqs.delete_message(QueueUrl=url, ReceiptHandle=message["ReceiptHandle"])
+
+
+def test_message_filter_checks_attributes_and_body():
+    match = message_filter({"Kind": "order"}, body_pattern=r"timeout \d+")
+    order = {"StringValue": "order", "DataType": "String"}
+
+    assert match({"Body": "timeout 30", "MessageAttributes": {"Kind": order}})
+    assert not match({"Body": "timeout", "MessageAttributes": {"Kind": order}})
+    assert not match({"Body": "timeout 30"})
+    assert message_filter()({"Body": "anything"})
+
+
+def test_redrive_moves_matching_messages_back():
+    sqs, dlq, source = make_queues()
+    for i in range(45):
+        sqs.send_message(
+            QueueUrl=dlq,
+            MessageBody=f"{'bad' if i % 3 == 0 else 'good'} {i}",
+            MessageAttributes={"Attempt": {"StringValue": "3", "DataType": "String"}},
+        )
+
+    stats = redrive(
+        sqs,
+        dlq,
+        source,
+        match=message_filter(body_pattern="^bad"),
+        pollers=4,
+        wait_time_seconds=0,
+        progress_interval=3600,
+    )
+
+    assert stats.received == 45
+    assert stats.matched == stats.redriven == stats.deleted == 15
+    moved = drain(sqs, source)
+    assert sorted(m["Body"] for m in moved) == sorted(
+        f"bad {i}" for i in range(0, 45, 3)
+    )
+    assert moved[0]["MessageAttributes"]["Attempt"]["StringValue"] == "3"
+    # Non-matching messages are still on the DLQ once their timeout passes.
+    assert (
+        sqs.get_queue_attributes(
+            QueueUrl=dlq, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+        )["Attributes"]["ApproximateNumberOfMessagesNotVisible"]
+        == "30"
+    )
+
+
+def test_dry_run_only_counts():
+    sqs, dlq, source = make_queues()
+    for i in range(12):
+        sqs.send_message(QueueUrl=dlq, MessageBody=str(i))
+
+    stats = DLQRedriver(
+        sqs, dlq, dry_run=True, pollers=2, wait_time_seconds=0, progress_interval=3600
+    ).run()
+
+    assert stats.received == stats.matched == stats.redriven == 12
+    assert stats.deleted == 0
+    assert "SendMessageBatch" not in sqs.calls
+    assert drain(sqs, source) == []
+    # Counting must not hide the DLQ.
+    assert len(drain(sqs, dlq)) == 12
+
+
+def test_fifo_redrive_keeps_group_ids():
+    sqs, dlq, source = make_queues(fifo=True)
+    for i in range(6):
+        sqs.send_message(
+            QueueUrl=dlq,
+            MessageBody=f"doc {i}",
+            MessageGroupId=f"g{i % 2}",
+            MessageDeduplicationId=str(i),
+        )
+
+    stats = redrive(
+        sqs, dlq, source, pollers=2, wait_time_seconds=0, progress_interval=3600
+    )
+
+    assert stats.redriven == 6
+    moved = drain(sqs, source)
+    groups = {m["Body"]: m["Attributes"]["MessageGroupId"] for m in moved}
+    assert groups == {f"doc {i}": f"g{i % 2}" for i in range(6)}
+
+
+def test_limit_caps_received_messages():
+    sqs, dlq, source = make_queues()
+    for i in range(30):
+        sqs.send_message(QueueUrl=dlq, MessageBody=str(i))
+
+    stats = redrive(
+        sqs,
+        dlq,
+        source,
+        limit=15,
+        pollers=3,
+        wait_time_seconds=0,
+        progress_interval=3600,
+    )
+
+    assert stats.received == 15
@@ -0,0 +1,203 @@
+import json
+import threading
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from sqs_tools.local_sqs import LocalSQS
+from sqs_tools.router import RoutingTable, StatusRouter, route_status_changes
+
+
+def _drain(sqs, url):
+    bodies = []
+    while True:
+        messages = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10).get(
+            "Messages", []
+        )
+        if not messages:
+            return bodies
+        for message in messages:
+            bodies.append(json.loads(message["Body"]))
+            sqs.delete_message(QueueUrl=url, ReceiptHandle=message["ReceiptHandle"])
+
+
+class CountingSQS:
+    """LocalSQS that counts batch calls and how many overlap."""
+
+    def __init__(self, local, fail_document=None):
+        self.local = local
+        self.fail_document = fail_document
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def send_message_batch(self, QueueUrl, Entries):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            failed = [
+                e
+                for e in Entries
+                if json.loads(e["MessageBody"])["document_id"] == self.fail_document
+            ]
+            if failed and len(failed) == len(Entries):
+                raise ClientError(
+                    {"Error": {"Code": "InvalidParameterValue", "Message": "no"}},
+                    "SendMessageBatch",
+                )
+            ok = [e for e in Entries if e not in failed]
+            response = self.local.send_message_batch(QueueUrl=QueueUrl, Entries=ok)
+            response.setdefault("Failed", []).extend(
+                {"Id": e["Id"], "Code": "InvalidParameterValue", "SenderFault": True}
+                for e in failed
+            )
+            return response
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_routing_table_lookup_and_default():
+    table = RoutingTable(
+        {"APPROVED": "q-approved", "rejected": ["q-rejected", "q-audit"]},
+        default="q-other",
+    )
+
+    assert table.lookup("approved") == ("q-approved",)
+    assert table.lookup("REJECTED") == ("q-rejected", "q-audit")
+    assert table.lookup("pending") == ("q-other",)
+    assert table.lookup(None) == ("q-other",)
+    assert table.destinations == ["q-approved", "q-audit", "q-other", "q-rejected"]
+
+
+def test_router_batches_per_destination_and_sends_in_parallel():
+    local = LocalSQS()
+    approved = local.create_queue(QueueName="approved")["QueueUrl"]
+    rejected = local.create_queue(QueueName="rejected")["QueueUrl"]
+    sqs = CountingSQS(local)
+    records = [
+        {"document_id": i, "status": "approved" if i % 4 else "rejected"}
+        for i in range(1000)
+    ]
+
+    result = StatusRouter(
+        sqs, RoutingTable({"approved": approved, "rejected": rejected})
+    ).route(records)
+
+    assert result.sent == 1000
+    assert result.failures == []
+    assert sqs.calls == result.batches == 100
+    assert sqs.peak > 1
+    assert len(_drain(local, approved)) == 750
+    assert len(_drain(local, rejected)) == 250
+
+
+def test_unrouted_records_are_counted_not_sent():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="approved")["QueueUrl"]
+
+    result = route_status_changes(
+        local,
+        [{"document_id": 1, "status": "approved"}, {"document_id": 2, "status": "x"}],
+        {"approved": url},
+    )
+
+    assert (result.records, result.sent, result.unrouted) == (2, 1, 1)
+
+
+def test_fifo_destination_keeps_document_order():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="status.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    records = [
+        {"document_id": i % 5, "status": "approved", "seq": i} for i in range(200)
+    ]
+
+    result = StatusRouter(local, RoutingTable({"approved": url})).route(records)
+
+    assert result.sent == 200
+    seen = {}
+    for body in _drain(local, url):
+        seen.setdefault(body["document_id"], []).append(body["seq"])
+    assert all(seqs == sorted(seqs) for seqs in seen.values())
+    assert sum(len(seqs) for seqs in seen.values()) == 200
+
+
+def test_failed_fifo_change_blocks_later_changes_of_that_document():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="status.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    sqs = CountingSQS(local, fail_document=3)
+    records = [{"document_id": i % 4, "status": "done", "seq": i} for i in range(40)]
+
+    result = StatusRouter(sqs, RoutingTable({"done": url}), max_workers=1).route(
+        records
+    )
+
+    codes = {f.code for f in result.failures}
+    failed_docs = {f.record["document_id"] for f in result.failures}
+    assert failed_docs == {3}
+    assert codes == {"InvalidParameterValue", "GroupBlocked"}
+    assert len(result.failures) == 10
+    assert result.sent == 30
+
+
+def test_fifo_batches_carry_one_change_per_document():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="status.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    batches = []
+
+    class RecordingSQS:
+        def send_message_batch(self, QueueUrl, Entries):
+            batches.append([e["MessageGroupId"] for e in Entries])
+            return local.send_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+    records = [{"document_id": i % 3, "status": "done", "seq": i} for i in range(30)]
+    result = StatusRouter(RecordingSQS(), RoutingTable({"done": url})).route(records)
+
+    assert result.sent == 30
+    assert all(len(set(groups)) == len(groups) for groups in batches)
+
+
+def test_fifo_dedup_ids_are_per_change_not_per_body():
+    local = LocalSQS()
+    url = local.create_queue(QueueName="status.fifo", Attributes={"FifoQueue": "true"})[
+        "QueueUrl"
+    ]
+    router = StatusRouter(local, RoutingTable({"done": url}))
+    # The same document flips back and forth, so two bodies repeat.
+    flips = [
+        {"document_id": 1, "status": "done", "to": state}
+        for state in ("open", "closed", "open", "closed")
+    ]
+    changes = [
+        {"document_id": 2, "status": "done", "change_id": "c1"},
+        {"document_id": 2, "status": "done", "change_id": "c2"},
+    ]
+
+    assert router.route(flips + changes).sent == 6
+    assert len(_drain(local, url)) == 6
+    # Routing the same records again inside the window is deduplicated.
+    assert router.route(flips + changes).sent == 6
+    assert _drain(local, url) == []
+
+
+def test_connection_errors_are_reported_as_failures():
+    class Unreachable:
+        def send_message_batch(self, QueueUrl, Entries):
+            raise EndpointConnectionError(endpoint_url=QueueUrl)
+
+    records = [{"document_id": str(i), "status": "done"} for i in range(25)]
+    result = StatusRouter(Unreachable(), RoutingTable({"done": "https://q"})).route(
+        records
+    )
+
+    assert result.sent == 0
+    assert len(result.failures) == 25
+    assert {f.code for f in result.failures} == {"EndpointConnectionError"}
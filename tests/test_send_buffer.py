@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from sqs_tools.send_buffer import BatchEntryError, SendBuffer
+
+
+def _ok_batch(QueueUrl, Entries):
+    return {
+        "Successful": [
+            {"Id": e["Id"], "MessageId": f"m-{e['MessageBody']}"} for e in Entries
+        ]
+    }
+
+
+def test_full_batches_are_sent_together():
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = _ok_batch
+    with SendBuffer(sqs, "http://example.com/queue", linger=10) as buf:
+        futures = [buf.send(str(i)) for i in range(25)]
+        results = [f.result(timeout=5) for f in futures[:20]]
+    assert [r["MessageId"] for r in results] == [f"m-{i}" for i in range(20)]
+    assert futures[-1].result()["MessageId"] == "m-24"
+    sizes = sorted(
+        len(c.kwargs["Entries"]) for c in sqs.send_message_batch.call_args_list
+    )
+    assert sizes == [5, 10, 10]
+
+
+def test_linger_flushes_partial_batch():
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = _ok_batch
+    with SendBuffer(sqs, "http://example.com/queue", linger=0.01) as buf:
+        future = buf.send("hello")
+        assert future.result(timeout=2)["MessageId"] == "m-hello"
+        assert sqs.send_message_batch.call_count == 1
+
+
+def test_payload_limit_splits_batches():
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = _ok_batch
+    with SendBuffer(
+        sqs, "http://example.com/queue", linger=10, max_batch_bytes=100
+    ) as buf:
+        for i in range(3):
+            buf.send(str(i) * 40)
+    assert sqs.send_message_batch.call_count == 2
+
+
+def test_failed_entry_raises_through_its_future():
+    sqs = MagicMock()
+    sqs.send_message_batch.return_value = {
+        "Successful": [{"Id": "0", "MessageId": "m-0"}],
+        "Failed": [{"Id": "1", "Code": "InvalidMessageContents", "SenderFault": True}],
+    }
+    with SendBuffer(sqs, "http://example.com/queue", linger=0.01) as buf:
+        ok, bad = buf.send("a"), buf.send("b")
+        buf.flush()
+    assert ok.result()["MessageId"] == "m-0"
+    with pytest.raises(BatchEntryError):
+        bad.result()
+
+
+def test_oversized_message_is_rejected_without_api_call():
+    sqs = MagicMock()
+    with SendBuffer(sqs, "http://example.com/queue", max_batch_bytes=10) as buf:
+        future = buf.send("x" * 11)
+    with pytest.raises(ValueError):
+        future.result()
+    sqs.send_message_batch.assert_not_called()
@@ -0,0 +1,95 @@
+import json
+import threading
+from unittest.mock import MagicMock
+
+import sendbatch
+from sqs_tools.rate_controller import AdaptiveRateController
+
+
+def test_iter_batches_is_lazy():
+    def records():
+        for i in range(25):
+            yield i
+
+    batches = sendbatch.iter_batches(records(), 10)
+    assert next(batches) == list(range(10))
+    assert [len(b) for b in batches] == [10, 5]
+
+
+def test_iter_csv_records_reads_in_chunks(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text("id,name\n" + "".join(f"{i},row{i}\n" for i in range(7)))
+    records = list(sendbatch.iter_csv_records(csv_path, chunk_rows=3))
+    assert len(records) == 7
+    assert json.loads(records[6]) == {"id": 6, "name": "row6"}
+
+
+def test_send_batches_bounds_pending_window():
+    lock = threading.Lock()
+    produced = 0
+    sent = 0
+    ahead = 0
+
+    def batches():
+        nonlocal produced
+        for batch in sendbatch.iter_batches((str(i) for i in range(1000)), 10):
+            produced += 1
+            yield batch
+
+    def send_message_batch(QueueUrl, Entries):
+        nonlocal sent, ahead
+        with lock:
+            ahead = max(ahead, produced - sent)
+            sent += 1
+        return {"Successful": [{"Id": e["Id"]} for e in Entries]}
+
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = send_message_batch
+    progress = sendbatch.send_batches(
+        sqs,
+        "http://example.com/queue",
+        batches(),
+        max_workers=4,
+        max_pending=4,
+        rate_controller=AdaptiveRateController(initial_rate=30_000),
+    )
+
+    assert progress.records == 1000
+    assert progress.batches == 100
+    assert progress.failed_batches == 0
+    # The generator is never pulled more than the window ahead of the senders.
+    assert ahead <= 5
+
+
+def test_main_streams_csv(tmp_path, monkeypatch):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text("id\n" + "".join(f"{i}\n" for i in range(23)))
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = lambda QueueUrl, Entries: {
+        "Successful": Entries
+    }
+    monkeypatch.setattr(sendbatch, "get_client", lambda *a, **k: sqs)
+
+    progress = sendbatch.main(
+        csv_path, "http://example.com/queue", chunk_rows=5, max_workers=2
+    )
+    assert progress.records == 23
+    assert sqs.send_message_batch.call_count == 3
+
+
+def test_throttled_batch_slows_shared_controller(monkeypatch):
+    from botocore.exceptions import ClientError
+
+    throttle = ClientError({"Error": {"Code": "Throttling"}}, "SendMessageBatch")
+    sqs = MagicMock()
+    sqs.send_message_batch.side_effect = [throttle, {"Successful": []}]
+    sleeps = []
+    monkeypatch.setattr(sendbatch.time, "sleep", sleeps.append)
+    ctrl = AdaptiveRateController(initial_rate=1000)
+
+    sendbatch.send_batch_with_retry(
+        sqs, "http://example.com/queue", ["a"], rate_controller=ctrl
+    )
+
+    assert ctrl.rate == 500
+    assert all(s >= 0 for s in sleeps)
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from functools import partial
+
+from sqs_tools import supervisor
+from sqs_tools.supervisor import ConsumerSupervisor, available_cpus
+
+
+class FakeSQS:
+    """Per-process client: hands out `count` messages, then empty receives."""
+
+    def __init__(self, count, crash_marker=None):
+        self.remaining = count
+        self.crash_marker = crash_marker
+        self.lock = threading.Lock()
+
+    def receive_message(self, **kwargs):
+        if self.crash_marker and not os.path.exists(self.crash_marker):
+            open(self.crash_marker, "w").close()
+            os._exit(3)
+        with self.lock:
+            n = min(self.remaining, kwargs["MaxNumberOfMessages"])
+            self.remaining -= n
+        if not n:
+            time.sleep(0.01)
+            return {}
+        return {
+            "Messages": [
+                {"MessageId": str(i), "ReceiptHandle": str(i), "Body": "x"}
+                for i in range(n)
+            ]
+        }
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        return {"Successful": [{"Id": e["Id"]} for e in Entries]}
+
+
+def handle(message):
+    return sum(range(1000))
+
+
+def run_until(sup, predicate, timeout=20):
+    thread = threading.Thread(target=sup.run)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    sup.stop()
+    thread.join()
+
+
+def make_supervisor(factory, **kwargs):
+    return ConsumerSupervisor(
+        "http://example.com/queue",
+        handle,
+        client_factory=factory,
+        consumer_kwargs={"pollers": 2, "wait_time_seconds": 0},
+        stats_interval=0.05,
+        mp_context="fork",
+        **kwargs,
+    )
+
+
+def test_available_cpus_respects_cgroup_quota(monkeypatch):
+    monkeypatch.setattr(supervisor.os, "sched_getaffinity", lambda pid: set(range(8)))
+    monkeypatch.setattr(supervisor, "_cgroup_cpu_quota", lambda: 2.5)
+    assert available_cpus() == 3
+    monkeypatch.setattr(supervisor, "_cgroup_cpu_quota", lambda: None)
+    assert available_cpus() == 8
+
+
+def test_workers_process_in_parallel_and_stats_aggregate():
+    sup = make_supervisor(partial(FakeSQS, 50), processes=3)
+
+    run_until(sup, lambda: sup.stats.processed >= 150)
+
+    assert sup.stats.processed == 150
+    assert sup.stats.deleted == 150
+    assert sup.restarts == 0
+    assert sup.workers == []
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    marker = str(tmp_path / "crashed")
+    sup = make_supervisor(
+        partial(FakeSQS, 20, crash_marker=marker), processes=1, restart_delay=0.01
+    )
+
+    run_until(sup, lambda: sup.stats.processed >= 20)
+
+    assert os.path.exists(marker)
+    assert sup.restarts == 1
+    assert sup.stats.processed == 20